@@ -0,0 +1,327 @@
+import asyncio
+import functools
+import os
+import socket
+import time
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urlparse
+
+import aiohttp
+
+import http_client
+import metrics
+import scraper
+import warc_store
+from charset_resolver import decode_body
+from config import CRAWLER_CONFIG, HTTP_CONFIG, USE_PLAYWRIGHT_PATTERNS
+from db import get_pool
+from link_extractor import parse_document
+from models import (
+    ScrapedPage,
+    get_unprocessed_pages,
+    mark_pages_as_processed,
+    release_pages,
+)
+from politeness import HostScheduler
+from robots_handler import RobotsUnreachable, check_robots_rules
+
+
+class AsyncCrawler:
+    """1つのイベントループで多数のページを並行取得するクローラー
+
+    HTTP は aiohttp で非同期に取得し、DB 操作（確保・保存・robots.txt 確認）は
+    専用スレッドプールで共有接続プールを使って実行する。
+    同時処理数は全体（concurrency）とホストごと（per_host）の両方で制限する。
+    crawl-delay の間隔が空いていないホストの行は待たずに手放し、間隔が空くまで確保しない。
+    """
+
+    def __init__(
+        self,
+        user_agent="MyScraperBot",
+        concurrency=200,
+        per_host=8,
+        db_threads=8,
+        worker_id=None,
+        batch_size=None,
+    ):
+        self.user_agent = user_agent
+        self.concurrency = max(1, int(concurrency))
+        self.per_host = max(1, int(per_host))
+        self.db_threads = max(1, int(db_threads))
+        self.worker_id = worker_id or f"{socket.gethostname()}:{os.getpid()}:async"
+        self._host_limits = {}
+        self._scheduler = HostScheduler()  # crawl-delay 用
+        self.batch_size = max(1, int(batch_size or CRAWLER_CONFIG["batch_size"]))
+        self._executor = None
+        self._completed = []  # 処理済みへの更新待ち (id または url, エラー)
+        self._released = []  # 処理せずに手放す行 (id または url)
+
+    async def run(self):
+        """未処理ページがなくなるまでクロールする"""
+        # robots.txt の確認中に取得処理が接続をもう1本使うため2倍確保する
+        pool = get_pool()
+        if pool.pool_size < self.db_threads * 2:
+            pool.resize(self.db_threads * 2)
+        self._executor = ThreadPoolExecutor(max_workers=self.db_threads)
+        self._completed = []
+        self._released = []
+        connector = aiohttp.TCPConnector(
+            limit=self.concurrency, limit_per_host=self.per_host
+        )
+        timeout = client_timeout()
+        tasks = set()
+        try:
+            async with aiohttp.ClientSession(
+                connector=connector, timeout=timeout
+            ) as session:
+                while True:
+                    await self._flush_completed()
+                    free = self.concurrency - len(tasks)
+                    if free <= 0:
+                        await asyncio.wait(
+                            set(tasks), return_when=asyncio.FIRST_COMPLETED
+                        )
+                        continue
+                    # crawl-delay 待ちのホストと robots.txt を確認できないホストの
+                    # 行は、取得できる時刻まで確保しない
+                    busy = self._scheduler.busy_hosts()
+                    rows = await self._db(
+                        functools.partial(
+                            get_unprocessed_pages,
+                            min(free, self.batch_size),
+                            self.worker_id,
+                            CRAWLER_CONFIG["claim_timeout"],
+                            skip_hosts=busy,
+                        )
+                    )
+                    if not rows:
+                        # crawl-delay 待ちのホストの行が残っているかもしれない
+                        # （robots.txt を確認できないホストの行は未処理のまま残す）
+                        waiting = set(busy) - self._scheduler.postponed_hosts()
+                        if not tasks and not waiting:
+                            break
+                        wait = min(
+                            [self._scheduler.wait_time(host) for host in waiting]
+                            + [CRAWLER_CONFIG["idle_wait"]]
+                        )
+                        if not tasks:
+                            await asyncio.sleep(wait)
+                            continue
+                        # 処理中のページが新しいリンクを追加するかもしれない
+                        await asyncio.wait(
+                            set(tasks),
+                            timeout=wait,
+                            return_when=asyncio.FIRST_COMPLETED,
+                        )
+                        continue
+                    for row in rows:
+                        task = asyncio.create_task(self._crawl(session, row))
+                        tasks.add(task)
+                        task.add_done_callback(tasks.discard)
+        finally:
+            if tasks:
+                await asyncio.gather(*tasks, return_exceptions=True)
+            await self._flush_completed()
+            self._executor.shutdown(wait=True)
+
+    async def fetch(self, session, row) -> ScrapedPage:
+        """1ページを取得して ScrapedPage を返す（失敗時は error_message を設定）"""
+        url = (row.get("url") or "").strip()
+        referrer = row.get("referrer")
+        method = (row.get("method") or "GET").upper()
+        if method != "POST" and any(pat in url for pat in USE_PLAYWRIGHT_PATTERNS):
+            # 動的ページは従来の Playwright 経路をスレッドで実行
+            loop = asyncio.get_running_loop()
+            return await loop.run_in_executor(None, scraper.scrape_page, url, referrer)
+
+        headers = {"Referer": referrer} if referrer else {}
+        # 304 の応答では POST でも保存済みの検証子を引き継ぐ
+        etag, last_modified = row.get("etag"), row.get("last_modified")
+        try:
+            if method == "POST":
+                request = session.post(
+                    url, data=row.get("payload") or {}, headers=headers
+                )
+            else:
+                headers.update(scraper.conditional_headers(etag, last_modified))
+                request = session.get(url, headers=headers)
+            started = time.perf_counter()
+            async with request as response:
+                if response.status == 304:
+                    # 保存済みの内容が最新なので本文の読み込み・解析をしない
+                    return ScrapedPage(
+                        url=url,
+                        referrer=referrer,
+                        status_code=304,
+                        etag=response.headers.get("ETag") or etag,
+                        last_modified=response.headers.get("Last-Modified")
+                        or last_modified,
+                    )
+                response.raise_for_status()
+                try:
+                    handler = scraper.content_handler(
+                        response.status, response.headers.get("Content-Type")
+                    )
+                except scraper.SkipContent as e:
+                    return scraper.skipped_page(url, referrer, response.status, e)
+                body = await self._read_body(response)
+                scraper.observe_fetch(url, started)
+                status_code = response.status
+                content_type = response.headers.get("Content-Type")
+                validators = {
+                    "etag": response.headers.get("ETag"),
+                    "last_modified": response.headers.get("Last-Modified"),
+                }
+                reason = response.reason
+                response_headers = response.headers
+                version = f"HTTP/{response.version.major}.{response.version.minor}"
+            # 文字コード判定・本文の抽出はイベントループの外で行う
+            if handler is not None:
+                content = (
+                    await self._cpu(handler, url, content_type, body.content) or ""
+                )
+            else:
+                content = await self._cpu(
+                    decode_body, body.content, content_type, urlparse(url).netloc
+                )
+        except Exception as e:
+            return ScrapedPage(
+                url=url,
+                referrer=referrer,
+                content="",
+                error_message=str(e) or type(e).__name__,
+            )
+
+        warc_location = None
+        if warc_store.enabled():
+            # ファイルへの追記（gzip 圧縮を含む）はイベントループの外で行う
+            warc_location = await self._db(
+                warc_store.archive_response,
+                url,
+                status_code,
+                reason,
+                response_headers,
+                body.content,
+                version,
+            )
+        # 大きなページの解析で他の取得が止まらないようにする
+        document = await self._cpu(parse_document, content, url)
+        if method == "POST":
+            title = document.title or ""
+        else:
+            title = document.title or urlparse(url).netloc
+        return ScrapedPage(
+            url=url,
+            referrer=referrer,
+            title=title,
+            content=content,
+            status_code=status_code,
+            hash_value=body.sha256,
+            error_message=scraper.body_error(body),
+            method=method,
+            payload=row.get("payload"),
+            document=document,
+            warc_location=warc_location,
+            body_size=len(body.content),
+            truncated=body.truncated,
+            **validators,
+        )
+
+    @staticmethod
+    async def _read_body(response):
+        """本文をチャンクごとに上限まで読む（上限の扱いは http_client.BodyReader）"""
+        reader = http_client.BodyReader(content_length=response.content_length)
+        # チャンクの到着を待つ間も期限を過ぎたら打ち切る
+        remaining = None
+        if reader.deadline is not None:
+            remaining = max(0.0, reader.deadline - time.monotonic())
+        try:
+            async with asyncio.timeout(remaining):
+                async for chunk in response.content.iter_chunked(
+                    HTTP_CONFIG["chunk_size"]
+                ):
+                    if not reader.feed(chunk):
+                        break
+        except TimeoutError as e:
+            raise reader.timed_out() from e
+        return reader.result()
+
+    async def _crawl(self, session, row):
+        url = row["url"]
+        key = row.get("id") or url
+        try:
+            host = urlparse(url).netloc
+            async with self._host_limit(host):
+                try:
+                    allowed, delay = await self._db(
+                        check_robots_rules, url, self.user_agent
+                    )
+                except RobotsUnreachable as e:
+                    # 処理済みにせず手放し、再取得の時刻まで後回しにする
+                    print(f"[WARN] {url} を後回しにします: {e}")
+                    self._scheduler.postpone(host, e.retry_after)
+                    self._released.append(key)
+                    return
+                if not allowed:
+                    metrics.PAGES.labels("blocked").inc()
+                    print(f"Skipping {url} (blocked by robots.txt)")
+                    self._completed.append((key, "Blocked by robots.txt"))
+                    return
+                # 確保した行と同時取得の枠を持ったまま crawl-delay を待たない
+                if self._scheduler.try_reserve(host, delay) > 0:
+                    self._released.append(key)
+                    return
+                page = await self.fetch(session, row)
+            await self._db(scraper.save_page_and_links, page)
+            self._completed.append((key, page.error_message))
+        except Exception as e:
+            print(f"[ERROR] {url} の処理に失敗: {e}")
+            self._completed.append((key, str(e)))
+
+    async def _flush_completed(self):
+        """処理を終えたページをまとめて処理済みにし、後回しにした行を手放す"""
+        if self._released:
+            released, self._released = self._released, []
+            await self._db(release_pages, released)
+        if not self._completed:
+            return
+        completed, self._completed = self._completed, []
+        keys = [key for key, _ in completed]
+        errors = [error for _, error in completed]
+        await self._db(mark_pages_as_processed, keys, errors)
+
+    def _host_limit(self, host):
+        if host not in self._host_limits:
+            self._host_limits[host] = asyncio.Semaphore(self.per_host)
+        return self._host_limits[host]
+
+    async def _db(self, func, *args):
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._executor, func, *args)
+
+    @staticmethod
+    async def _cpu(func, *args):
+        """CPU を使う処理を既定のスレッドプールで実行する（DB 用のスレッドは使わない）"""
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(None, func, *args)
+
+
+def client_timeout() -> aiohttp.ClientTimeout:
+    """同期エンジン（requests）と同じ制限の aiohttp のタイムアウト
+
+    接続と1回の受信待ちは HTTP_CONFIG["timeout"] 秒まで。本文の受信全体は
+    _read_body が max_download_seconds で打ち切るので、total は設けない。
+    """
+    timeout = HTTP_CONFIG["timeout"]
+    return aiohttp.ClientTimeout(total=None, sock_connect=timeout, sock_read=timeout)
+
+
+def run_async_crawl(user_agent="MyScraperBot", concurrency=None, per_host=None):
+    """非同期エンジンでクロールを実行"""
+    crawler = AsyncCrawler(
+        user_agent=user_agent,
+        concurrency=concurrency or CRAWLER_CONFIG["async_concurrency"],
+        per_host=per_host or CRAWLER_CONFIG["async_per_host"],
+        db_threads=CRAWLER_CONFIG["async_db_threads"],
+    )
+    asyncio.run(crawler.run())
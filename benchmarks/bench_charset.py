@@ -0,0 +1,87 @@
+"""文字コード判定の1ページあたりのCPU時間を計測する（apparent_encoding / 段階的判定）
+
+python benchmarks/bench_charset.py --pages 60 --kib 100
+"""
+
+import argparse
+import os
+import sys
+import time
+
+from charset_normalizer import from_bytes
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from charset_resolver import CharsetResolver  # noqa: E402
+
+JA_PARAGRAPH = (
+    "<p>本日は晴天なり。東京都の天気は晴れ、最高気温は二十五度の見込みです。"
+    "カタカナやＡＢＣ、記号「」も含みます。</p>\n"
+)
+EN_PARAGRAPH = (
+    "<p>The quick brown fox jumps over the lazy dog. "
+    "Weather in London: cloudy, high of 18 degrees.</p>\n"
+)
+
+
+def make_corpus(pages, kib):
+    """日本語・英語のページを文字コードと宣言の有無を変えて作る"""
+    variants = [
+        # (ホスト, 本文, 文字コード, Content-Type の charset, meta の charset)
+        ("ja-header", JA_PARAGRAPH, "shift_jis", "Shift_JIS", None),
+        ("ja-meta", JA_PARAGRAPH, "euc_jp", None, "EUC-JP"),
+        ("ja-utf8", JA_PARAGRAPH, "utf-8", None, None),
+        ("ja-none", JA_PARAGRAPH, "shift_jis", None, None),
+        ("en-header", EN_PARAGRAPH, "utf-8", "utf-8", None),
+        ("en-none", EN_PARAGRAPH, "ascii", None, None),
+    ]
+    corpus = []
+    for i in range(pages):
+        host, paragraph, encoding, header, meta = variants[i % len(variants)]
+        head = f'<meta charset="{meta}">' if meta else ""
+        repeat = kib * 1024 // len(paragraph.encode(encoding))
+        html = f"<html><head>{head}<title>{i}</title></head><body>"
+        html += paragraph * repeat + "</body></html>"
+        content_type = f"text/html; charset={header}" if header else "text/html"
+        corpus.append((host, html.encode(encoding), content_type, html))
+    return corpus
+
+
+def apparent_encoding(body, content_type, host):
+    """変更前: requests の apparent_encoding と同じ統計的推定を毎回行う"""
+    best = from_bytes(body).best()
+    return body.decode(best.encoding if best else "utf-8", errors="replace")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--pages", type=int, default=60)
+    parser.add_argument("--kib", type=int, default=100)
+    args = parser.parse_args()
+
+    corpus = make_corpus(args.pages, args.kib)
+    resolver = CharsetResolver()
+
+    def tiered(body, content_type, host):
+        encoding = resolver.resolve(body, content_type, host)
+        return body.decode(encoding, errors="replace")
+
+    print(f"pages={args.pages} size={args.kib} KiB/page")
+    results = {}
+    for name, decode in (("apparent_encoding", apparent_encoding), ("tiered", tiered)):
+        start = time.process_time()
+        mismatches = 0
+        for host, body, content_type, html in corpus:
+            if decode(body, content_type, host) != html:
+                mismatches += 1
+        per_page = (time.process_time() - start) / len(corpus)
+        results[name] = per_page
+        print(
+            f"{name:<18} cpu={per_page * 1000:8.2f} ms/page"
+            f"  wrong decode={mismatches}/{len(corpus)}"
+        )
+    print(f"speedup: {results['apparent_encoding'] / results['tiered']:.1f}x")
+
+
+if __name__ == "__main__":
+    main()
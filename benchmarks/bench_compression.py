@@ -0,0 +1,76 @@
+"""保存する本文の圧縮率と1ページあたりの圧縮・展開時間を計測する
+
+python benchmarks/bench_compression.py --pages 50 --kib 100
+"""
+
+import argparse
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from content_store import compress_content, decompress_content, zstandard  # noqa: E402
+
+WORDS = (
+    "天気 東京 大阪 ニュース 記事 更新 お知らせ 製品 価格 会社 情報 サービス"
+    " weather news article update product price company service about contact"
+).split()
+
+
+def make_page(rng, kib):
+    """ナビゲーション・リンク・段落が繰り返される典型的なHTMLを作る"""
+    nav = "".join(
+        f'<li><a href="/category/{i}" class="nav-item">{rng.choice(WORDS)}</a></li>'
+        for i in range(30)
+    )
+    title = rng.choice(WORDS)
+    parts = [f"<html><head><title>{title}</title></head><body>"]
+    parts.append(f'<ul class="nav">{nav}</ul>')
+    size = 0
+    while size < kib * 1024:
+        words = " ".join(rng.choice(WORDS) for _ in range(40))
+        href = f"/article/{rng.randrange(100000)}"
+        heading = f'<h2><a href="{href}">{words[:30]}</a></h2>'
+        part = f'<div class="entry">{heading}<p>{words}</p></div>\n'
+        parts.append(part)
+        size += len(part.encode("utf-8"))
+    parts.append("</body></html>")
+    return "".join(parts).encode("utf-8")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--pages", type=int, default=50)
+    parser.add_argument("--kib", type=int, default=100)
+    args = parser.parse_args()
+
+    rng = random.Random(0)
+    pages = [make_page(rng, args.kib) for _ in range(args.pages)]
+    raw = sum(len(page) for page in pages)
+    settings = [("zlib", 1), ("zlib", 6), ("zlib", 9)]
+    if zstandard is not None:
+        settings += [("zstd", 3), ("zstd", 19)]
+    else:
+        print("zstandard が未インストールのため zstd は計測しません")
+
+    print(f"pages={args.pages} size={args.kib} KiB/page")
+    for compression, level in settings:
+        start = time.process_time()
+        bodies = [compress_content(page, compression, level) for page in pages]
+        compress = (time.process_time() - start) / len(pages)
+        start = time.process_time()
+        for body in bodies:
+            decompress_content(body)
+        decompress = (time.process_time() - start) / len(pages)
+        stored = sum(len(body) for body in bodies)
+        print(
+            f"{compression}-{level:<3} ratio={raw / stored:5.1f}x"
+            f"  compress={compress * 1000:6.2f} ms/page"
+            f"  decompress={decompress * 1000:6.2f} ms/page"
+        )
+
+
+if __name__ == "__main__":
+    main()
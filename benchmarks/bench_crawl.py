@@ -0,0 +1,425 @@
+"""合成サイトをクロールして処理速度・レイテンシ・DBクエリ数・メモリを計測するベンチマーク
+
+ネットワークと実DBは使わない。別プロセスのローカルHTTPサーバーが、ページ数・
+リンク数・ページサイズ・応答の遅延・robots.txt を指定した木構造のサイトを返す。
+DBはクエリを実行せずに数えるダミー接続で、取得待ちのURL（未処理ページの確保と
+リンクの登録）と robots.txt のルール（robots_rules）だけをメモリ上で扱う。
+それ以外は scraper.process_pages（または非同期エンジン）の実際の処理をそのまま
+通す。合成サイトは HTTP だけなので、robots.txt は https ではなく http で取得する。
+結果は JSON で出力する。
+
+    python benchmarks/bench_crawl.py --pages 500 --fanout 8 --workers 8
+    python benchmarks/bench_crawl.py --engine async --latency-ms 20 --output a.json
+"""
+
+import argparse
+import asyncio
+import datetime
+import json
+import multiprocessing
+import os
+import platform
+import resource
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from unittest.mock import patch
+from urllib.parse import urlparse
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import db  # noqa: E402
+import http_client  # noqa: E402
+import metrics  # noqa: E402
+import robots_handler  # noqa: E402
+import scraper  # noqa: E402
+from async_engine import AsyncCrawler  # noqa: E402
+from config import HTTP_CONFIG  # noqa: E402
+
+ROBOTS_TXT = b"User-agent: *\nDisallow: /private/\n"
+
+
+# --- 合成サイト --------------------------------------------------------------
+
+
+def page_path(page_id, fanout):
+    """ページ番号のパス。子は親のパスの下に置く（/ → /1/ → /1/9/）"""
+    parts = []
+    while page_id:
+        parts.append(str(page_id))
+        page_id = (page_id - 1) // fanout
+    return "/" + "".join(f"{part}/" for part in reversed(parts))
+
+
+def make_page(page_id, pages, fanout, page_bytes, robots):
+    """ページ番号 page_id の HTML（子ページへのリンクと埋め草で page_bytes にする）"""
+    path = page_path(page_id, fanout)
+    first = page_id * fanout + 1
+    children = range(first, min(first + fanout, pages))
+    links = [f'<a href="{page_path(c, fanout)}">page {c}</a>' for c in children]
+    # 親・トップへのリンク（配下ではないので登録されない）
+    links.append('<a href="/">top</a><a href="../">up</a>')
+    if robots and page_id == 0:
+        links.append('<a href="/private/">private</a>')
+    head = (
+        f"<html><head><title>page {page_id}</title></head><body>"
+        f"<h1>{path}</h1>{''.join(links)}"
+    ).encode("utf-8")
+    filler = b"<p>" + b"lorem ipsum dolor sit amet " * 8 + b"</p>\n"
+    count = max(0, page_bytes - len(head)) // len(filler) + 1
+    return head + filler * count + b"</body></html>"
+
+
+class SiteHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    # ヘッダーと本文を別々に送るので、keep-alive の接続で Nagle と遅延 ACK が
+    # 重なって1応答ごとに約40ms待たされないようにする
+    disable_nagle_algorithm = True
+    site = {}
+
+    def do_GET(self):
+        site = self.site
+        if site["latency"]:
+            time.sleep(site["latency"])
+        if self.path == "/robots.txt":
+            body = ROBOTS_TXT if site["robots"] else b""
+            status = 200 if site["robots"] else 404
+            return self._reply(status, "text/plain", body)
+        segments = [s for s in self.path.split("?")[0].split("/") if s]
+        page_id = int(segments[-1]) if segments and segments[-1].isdigit() else 0
+        if segments and not segments[-1].isdigit():
+            return self._reply(404, "text/html", b"not found")
+        body = make_page(
+            page_id, site["pages"], site["fanout"], site["page_bytes"], site["robots"]
+        )
+        self._reply(200, "text/html; charset=utf-8", body)
+
+    def _reply(self, status, content_type, body):
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+def serve_site(site, ready):
+    SiteHandler.site = site
+    httpd = ThreadingHTTPServer(("127.0.0.1", 0), SiteHandler)
+    httpd.daemon_threads = True
+    ready.put(httpd.server_address[1])
+    httpd.serve_forever()
+
+
+# --- DB の代わり -------------------------------------------------------------
+
+
+class FakeDatabase:
+    """クエリを数え、取得待ちのURLと robots.txt のルールだけをメモリで扱う DB の代わり"""
+
+    def __init__(self, latency=0.0):
+        self.latency = latency
+        self.lock = threading.Lock()
+        self.connects = 0
+        self.queries = 0
+        self.rows = []  # 取得待ち (id, url, referrer)
+        self.claimed = {}  # id -> 確保済みの (id, url, referrer)
+        self.known = set()
+        self.robots = {}  # (domain, user_agent) -> robots_rules の行
+
+    def add(self, url, referrer=None) -> bool:
+        with self.lock:
+            if url in self.known:
+                return False
+            self.known.add(url)
+            self.rows.append((len(self.known), url, referrer))
+            return True
+
+    def claim(self, limit, skip_hosts=()):
+        with self.lock:
+            rows = [
+                row for row in self.rows if urlparse(row[1]).netloc not in skip_hosts
+            ]
+            rows = rows[:limit]
+            claimed = {row[0] for row in rows}
+            self.rows = [row for row in self.rows if row[0] not in claimed]
+            self.claimed.update((row[0], row) for row in rows)
+        return [
+            {"id": id_, "url": url, "referrer": ref, "method": "GET", "payload": None}
+            for id_, url, ref in rows
+        ]
+
+    def release(self, ids):
+        """release_pages で手放された行を取得待ちに戻す"""
+        with self.lock:
+            self.rows.extend(
+                self.claimed.pop(id_) for id_ in ids if id_ in self.claimed
+            )
+
+    def store_robots(self, sql, params):
+        """robots_handler の INSERT / UPDATE を robots_rules の行に反映する"""
+        with self.lock:
+            if sql.lstrip().startswith("UPDATE"):
+                # 304: 有効期限だけ延ばす（params は (expires_at, domain, user_agent)）
+                row = self.robots.get((params[1], params[2]))
+                if row is not None:
+                    row.update(expires_at=params[0], fail_count=0)
+            elif "rule_groups" in sql:
+                domain, user_agent, disallow, allow, groups, delay = params[:6]
+                self.robots[(domain, user_agent)] = {
+                    "disallow": disallow,
+                    "allow": allow,
+                    "rule_groups": groups,
+                    "crawl_delay": delay,
+                    "etag": params[6],
+                    "last_modified": params[7],
+                    "fail_count": 0,
+                    "expires_at": params[9],
+                }
+            else:
+                # 取得失敗: 以前のルールは残し、期限と失敗回数だけ更新する
+                # （以前のルールがなければ全体を不許可として記録する）
+                domain, user_agent, _, expires_at, fail_count = params
+                row = self.robots.setdefault(
+                    (domain, user_agent),
+                    {
+                        "disallow": "/",
+                        "allow": "",
+                        "rule_groups": None,
+                        "crawl_delay": None,
+                        "etag": None,
+                        "last_modified": None,
+                    },
+                )
+                row.update(expires_at=expires_at, fail_count=fail_count)
+
+    def load_robots(self, params, unexpired):
+        """SELECT ... FROM robots_rules の結果（ttl_seconds を付ける）"""
+        with self.lock:
+            row = self.robots.get(tuple(params))
+            if row is None:
+                return []
+            now = datetime.datetime.now(datetime.UTC)
+            ttl = int((row["expires_at"] - now).total_seconds())
+            if unexpired and ttl <= 0:
+                return []
+            return [dict(row, ttl_seconds=ttl)]
+
+    def connect(self, **kwargs):
+        with self.lock:
+            self.connects += 1
+        return FakeConnection(self)
+
+
+class FakeCursor:
+    def __init__(self, database):
+        self.database = database
+        self.rowcount = 0
+        self._rows = []
+
+    def execute(self, sql, params=None):
+        database = self.database
+        with database.lock:
+            database.queries += 1
+        if database.latency:
+            time.sleep(database.latency)
+        self.rowcount, self._rows = 1, []
+        if "FOR UPDATE SKIP LOCKED" in sql:
+            # get_unprocessed_pages の確保（params は (claim_timeout, *skip_hosts, limit)）
+            self._rows = database.claim(params[-1], params[1:-1])
+        elif "SET claimed_by = NULL" in sql:
+            # release_pages（バッチの行はすべて id を持つ）
+            database.release(params)
+        elif "(url, referrer, fetched_at, title, processed, method, payload)" in sql:
+            # save_links_to_db の一括登録（1行7列）
+            self.rowcount = sum(
+                database.add(params[i], params[i + 1]) for i in range(0, len(params), 7)
+            )
+        elif sql.lstrip().startswith("SELECT COUNT(*)"):
+            self._rows = [(len(database.rows),)]
+        elif "robots_rules" in sql:
+            if sql.lstrip().startswith("SELECT"):
+                self._rows = database.load_robots(params, "expires_at >" in sql)
+            else:
+                database.store_robots(sql, params)
+
+    def executemany(self, sql, seq):
+        self.execute(sql)
+
+    def fetchone(self):
+        return self._rows[0] if self._rows else None
+
+    def fetchall(self):
+        return self._rows
+
+    def close(self):
+        pass
+
+
+class FakeConnection:
+    def __init__(self, database):
+        self.database = database
+
+    def cursor(self, **kwargs):
+        return FakeCursor(self.database)
+
+    def start_transaction(self, **kwargs):
+        pass
+
+    def ping(self, **kwargs):
+        pass
+
+    def commit(self):
+        pass
+
+    def rollback(self):
+        pass
+
+    def close(self):
+        pass
+
+
+# --- 計測 --------------------------------------------------------------------
+
+
+def percentile(values, q):
+    if not values:
+        return 0.0
+    values = sorted(values)
+    index = min(len(values) - 1, max(0, round(q / 100 * len(values)) - 1))
+    return values[index]
+
+
+def peak_rss_bytes():
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux は KiB、macOS はバイト
+    return peak if platform.system() == "Darwin" else peak * 1024
+
+
+def crawl(args, base_url, database):
+    """合成サイトをクロールし、ページごとの処理時間（秒）のリストを返す"""
+    latencies = []
+    lock = threading.Lock()
+
+    def record(started):
+        elapsed = time.perf_counter() - started
+        with lock:
+            latencies.append(elapsed)
+
+    real_crawl_claimed_page = scraper.crawl_claimed_page
+    real_download_robots_txt = robots_handler.download_robots_txt
+    real_async_crawl = AsyncCrawler._crawl
+
+    def timed_crawl_claimed_page(row, user_agent):
+        started = time.perf_counter()
+        try:
+            return real_crawl_claimed_page(row, user_agent)
+        finally:
+            record(started)
+
+    def download_robots_txt(robots_url, *args):
+        # robots_handler は https で取得するが、合成サイトは http だけ
+        return real_download_robots_txt(robots_url.replace("https:", "http:", 1), *args)
+
+    async def timed_async_crawl(self, session, row):
+        started = time.perf_counter()
+        try:
+            return await real_async_crawl(self, session, row)
+        finally:
+            record(started)
+
+    database.add(f"{base_url}/")
+    with (
+        patch("mysql.connector.connect", database.connect),
+        patch.object(scraper, "crawl_claimed_page", timed_crawl_claimed_page),
+        patch.object(AsyncCrawler, "_crawl", timed_async_crawl),
+        patch.object(robots_handler, "download_robots_txt", download_robots_txt),
+        patch.dict(HTTP_CONFIG, pool_maxsize=max(HTTP_CONFIG["pool_maxsize"], 64)),
+        patch("builtins.print"),
+    ):
+        db.close_pool()
+        http_client.close()
+        try:
+            if args.engine == "async":
+                crawler = AsyncCrawler(
+                    user_agent="BenchBot",
+                    concurrency=args.concurrency,
+                    per_host=args.per_host,
+                    db_threads=args.workers,
+                )
+                asyncio.run(crawler.run())
+            else:
+                scraper.process_pages(user_agent="BenchBot", workers=args.workers)
+        finally:
+            db.close_pool()
+            http_client.close()
+    return latencies
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--pages", type=int, default=500, help="サイトのページ数")
+    parser.add_argument("--fanout", type=int, default=8, help="1ページの子リンク数")
+    parser.add_argument("--page-kib", type=float, default=20, help="ページサイズ")
+    parser.add_argument("--latency-ms", type=float, default=0, help="応答の遅延")
+    parser.add_argument("--db-latency-ms", type=float, default=0, help="クエリの遅延")
+    parser.add_argument(
+        "--no-robots", action="store_true", help="robots.txt を返さない（404）"
+    )
+    parser.add_argument("--engine", choices=["sync", "async"], default="sync")
+    parser.add_argument("--workers", type=int, default=4)
+    parser.add_argument("--concurrency", type=int, default=50)
+    parser.add_argument("--per-host", type=int, default=16)
+    parser.add_argument("--output", help="結果の JSON を書き出すファイル")
+    args = parser.parse_args()
+
+    site = {
+        "pages": args.pages,
+        "fanout": args.fanout,
+        "page_bytes": int(args.page_kib * 1024),
+        "latency": args.latency_ms / 1000,
+        "robots": not args.no_robots,
+    }
+    ready = multiprocessing.Queue()
+    server = multiprocessing.Process(target=serve_site, args=(site, ready), daemon=True)
+    server.start()
+    try:
+        base_url = f"http://127.0.0.1:{ready.get(timeout=10)}"
+        database = FakeDatabase(args.db_latency_ms / 1000)
+        rss_before = peak_rss_bytes()
+        start = time.perf_counter()
+        latencies = crawl(args, base_url, database)
+        elapsed = time.perf_counter() - start
+    finally:
+        server.terminate()
+        server.join()
+
+    pages = len(latencies)
+    result = {
+        "config": {key: value for key, value in vars(args).items() if key != "output"},
+        "python": platform.python_version(),
+        "pages": pages,
+        # robots.txt で除外したページ（/private/。--no-robots なら 0）
+        "blocked_pages": int(metrics.PAGES.labels("blocked").value),
+        "elapsed_seconds": round(elapsed, 3),
+        "pages_per_second": round(pages / elapsed, 2) if elapsed else 0.0,
+        "latency_ms": {
+            "p50": round(percentile(latencies, 50) * 1000, 3),
+            "p99": round(percentile(latencies, 99) * 1000, 3),
+        },
+        "db_queries_per_page": round(database.queries / pages, 2) if pages else 0.0,
+        "db_connects_per_page": round(database.connects / pages, 3) if pages else 0.0,
+        "peak_rss_mib": round(max(peak_rss_bytes(), rss_before) / 2**20, 1),
+    }
+    text = json.dumps(result, ensure_ascii=False, indent=2)
+    print(text)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            f.write(text + "\n")
+
+
+if __name__ == "__main__":
+    main()
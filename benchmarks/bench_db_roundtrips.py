@@ -0,0 +1,147 @@
+"""1ページ処理あたりの DB 接続数・往復数を計測するベンチマーク
+
+実DBは使わず、接続確立とクエリ実行（COMMIT / ROLLBACK を含む）の回数を
+数えるダミー接続を使う。
+接続プールあり/なし（毎回接続して閉じる従来動作）を比較する。
+
+    python benchmarks/bench_db_roundtrips.py --pages 200 --links 20
+"""
+
+import argparse
+import os
+import sys
+import time
+from unittest.mock import patch
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import db  # noqa: E402
+import scraper  # noqa: E402
+from models import ScrapedPage  # noqa: E402
+
+# 接続確立（TCP + 認証）とクエリ1往復の想定レイテンシ（秒）
+HANDSHAKE_COST = 0.003
+QUERY_COST = 0.0003
+
+
+class Counter:
+    def __init__(self):
+        self.connects = 0
+        self.queries = 0
+
+
+class FakeCursor:
+    def __init__(self, connection):
+        self.connection = connection
+        self.counter = connection.counter
+        self.rowcount = 0
+
+    def execute(self, sql, params=None):
+        self.counter.queries += 1
+        self.connection.in_transaction = True
+
+    def executemany(self, sql, seq):
+        self.execute(sql)
+
+    def fetchone(self):
+        return None
+
+    def fetchall(self):
+        return []
+
+    def close(self):
+        pass
+
+
+class FakeConnection:
+    """COMMIT / ROLLBACK も1往復として数える（autocommit なしの MySQL と同じく
+    最初のクエリでトランザクションが始まる）"""
+
+    def __init__(self, counter):
+        self.counter = counter
+        self.in_transaction = False
+
+    def cursor(self, **kwargs):
+        return FakeCursor(self)
+
+    def commit(self):
+        self.counter.queries += 1
+        self.in_transaction = False
+
+    def rollback(self):
+        self.counter.queries += 1
+        self.in_transaction = False
+
+    def close(self):
+        pass
+
+
+def make_html(n_links):
+    links = "".join(f'<a href="c{i}">link {i}</a>' for i in range(n_links))
+    return f"<html><head><title>t</title></head><body>{links}</body></html>"
+
+
+def run(pages, n_links, pooled):
+    counter = Counter()
+    html = make_html(n_links)
+
+    def fake_connect(**kwargs):
+        counter.connects += 1
+        return FakeConnection(counter)
+
+    def fake_scrape(url, referrer=None):
+        return ScrapedPage(url=url, title="t", content=html, status_code=200)
+
+    db.close_pool()
+    patches = [
+        patch("mysql.connector.connect", fake_connect),
+        patch.object(scraper, "scrape_page", fake_scrape),
+    ]
+    if not pooled:
+        # 従来動作: 返却せずに毎回閉じる
+        patches.append(patch.object(db.ConnectionPool, "release", _discard))
+    for p in patches:
+        p.start()
+    try:
+        for i in range(pages):
+            scraper.process_single_page(
+                {"url": f"https://example.org/p/{i}/"}, "BenchBot"
+            )
+    finally:
+        for p in reversed(patches):
+            p.stop()
+        db.close_pool()
+    return counter
+
+
+def _discard(self, raw):
+    self._discard(raw)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--pages", type=int, default=200)
+    parser.add_argument("--links", type=int, default=20)
+    args = parser.parse_args()
+
+    # robots.txt の実取得は行わない
+    with patch("robots_handler.fetch_and_store_robots"), patch("builtins.print"):
+        results = {
+            label: run(args.pages, args.links, pooled)
+            for label, pooled in (("no pool", False), ("pool", True))
+        }
+
+    print(f"pages={args.pages} links/page={args.links}")
+    for label, c in results.items():
+        est = c.connects * HANDSHAKE_COST + c.queries * QUERY_COST
+        print(
+            f"{label:8s} connects/page={c.connects / args.pages:7.2f}"
+            f"  queries/page={c.queries / args.pages:7.2f}"
+            f"  est. DB time/page={est / args.pages * 1000:7.2f} ms"
+        )
+
+
+if __name__ == "__main__":
+    start = time.perf_counter()
+    main()
+    print(f"elapsed {time.perf_counter() - start:.2f}s")
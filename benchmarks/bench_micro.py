@@ -0,0 +1,237 @@
+"""ページ・リンクごとに呼ばれる関数の1回あたりの時間とメモリを計測する
+
+固定のコーパス（小さい記事 / 約1MBのページ / リンクの多いハブページ / 壊れたマークアップ）
+に対して、クロール中に実際に通る extract_links・parse_document(...).title・
+normalize_url・is_under_base と、本文を受信しながらの SHA-256 計算
+（http_client.BodyReader.feed）を実行し、ns/op と1回あたりのメモリを表示する。CPython には確保回数の累計を取る
+手段がないため、メモリは tracemalloc で測る1回あたりの一時的な確保量の最大値
+（peak）と、呼び出し後も残るメモリブロック数（retained）で示す。
+
+    python benchmarks/bench_micro.py
+    python benchmarks/bench_micro.py --only hub --json micro.json
+"""
+
+import argparse
+import gc
+import json
+import os
+import random
+import sys
+import time
+import tracemalloc
+from urllib.parse import urljoin
+
+from bs4 import BeautifulSoup
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from config import HTTP_CONFIG  # noqa: E402
+from http_client import BodyReader  # noqa: E402
+from link_extractor import (  # noqa: E402
+    HTML_PARSER,
+    extract_links,
+    is_under_base,
+    normalize_url,
+    parse_document,
+)
+
+BASE_URL = "https://www.example.com/docs/"
+PARAGRAPH = (
+    "<p>本日は晴天なり。The quick brown fox jumps over the lazy dog. "
+    "東京都の天気は晴れ、最高気温は二十五度の見込みです。</p>\n"
+)
+
+
+def _href(rng, i):
+    """同一サイト配下・配下外・外部・相対・クエリ付きなどを混ぜたリンク先"""
+    kind = i % 6
+    if kind == 0:
+        return f"section/{i}/page-{i}.html?ref=top&utm_source=x"
+    if kind == 1:
+        return f"/docs/topic-{rng.randrange(10**6)}/"
+    if kind == 2:
+        return f"https://other.example.org/{i}"
+    if kind == 3:
+        return f"../blog/{i}#comments"
+    if kind == 4:
+        return f"https://www.example.com/docs/a/b/c/{i}.html"
+    return f"images/photo-{i}.jpg"
+
+
+def _links(rng, count):
+    return "\n".join(
+        f'<li><a href="{_href(rng, i)}">項目 {i} <img src="i{i}.png" alt="画像{i}"></a>'
+        for i in range(count)
+    )
+
+
+def make_corpus():
+    """計測に使う HTML（毎回同じ内容になるよう乱数の種を固定する）"""
+    rng = random.Random(20240101)
+    head = "<!DOCTYPE html><html><head><meta charset='utf-8'><title>{}</title></head>"
+    small = (
+        head.format("小さい記事")
+        + "<body><article>"
+        + PARAGRAPH * 20
+        + f"<ul>{_links(rng, 20)}</ul></article></body></html>"
+    )
+    large_body = []
+    for i in range(1500):
+        large_body.append(PARAGRAPH * 4)
+        large_body.append(f'<a href="{_href(rng, i)}">続き {i}</a>')
+    large = (
+        head.format("大きいページ") + "<body>" + "".join(large_body) + "</body></html>"
+    )
+    hub = head.format("リンク集") + f"<body><ul>{_links(rng, 5000)}</ul></body></html>"
+    malformed = (
+        "<html><head><title>壊れた<b>マークアップ</title><body>"
+        + "".join(
+            f"<div><p>段落 {i} &nbsp &amp; &bogus; <a href={_href(rng, i)}>未閉じ"
+            f"<a href='{_href(rng, i + 1)}'>入れ子</a></span></td>"
+            for i in range(400)
+        )
+        + "<table><tr><td>閉じていない表"
+    )
+    return {"small": small, "large": large, "hub": hub, "malformed": malformed}
+
+
+def _urls(html):
+    """ページ内のリンクを絶対URLにしたもの（normalize_url・is_under_base の入力）"""
+    soup = BeautifulSoup(html, HTML_PARSER)
+    return [urljoin(BASE_URL, a["href"]) for a in soup.find_all("a", href=True)]
+
+
+def _cases(html):
+    """(関数名, 1回の呼び出しで処理する件数, 呼び出す関数)"""
+    soup = BeautifulSoup(html, HTML_PARSER)
+    urls = _urls(html)
+    body = html.encode("utf-8")
+    chunk_size = HTTP_CONFIG["chunk_size"]
+    chunks = []
+    for start in range(0, len(body), chunk_size):
+        end = start + chunk_size
+        chunks.append(body[start:end])
+
+    def links():
+        return extract_links(soup, BASE_URL)
+
+    def title():
+        # 取得したページは1回だけ解析し、タイトルは ParsedDocument から取る
+        return parse_document(html, BASE_URL).title
+
+    def normalize():
+        for url in urls:
+            normalize_url(url)
+
+    def under_base():
+        for url in urls:
+            is_under_base(url, BASE_URL)
+
+    def hashing():
+        # 本文のハッシュは受信したバイト列をチャンクごとに読みながら計算する
+        reader = BodyReader(max_bytes=0, max_seconds=0)
+        for chunk in chunks:
+            reader.feed(chunk)
+        return reader.result()
+
+    return [
+        ("extract_links", 1, links),
+        ("parse+title", 1, title),
+        ("normalize_url", max(1, len(urls)), normalize),
+        ("is_under_base", max(1, len(urls)), under_base),
+        ("body_sha256", 1, hashing),
+    ]
+
+
+def time_per_call(func, min_time, repeat):
+    """min_time 秒以上かかる回数を求め、repeat 回のうち最速の1回あたりの秒数を返す"""
+    number = 1
+    while True:
+        start = time.perf_counter()
+        for _ in range(number):
+            func()
+        elapsed = time.perf_counter() - start
+        if elapsed >= min_time:
+            break
+        number *= 2 if elapsed == 0 else max(2, int(min_time / elapsed) + 1)
+    best = elapsed / number
+    for _ in range(repeat - 1):
+        start = time.perf_counter()
+        for _ in range(number):
+            func()
+        best = min(best, (time.perf_counter() - start) / number)
+    return best
+
+
+def memory_per_call(func, calls=5):
+    """(1回あたりの一時的な確保量の最大値[バイト], 呼び出し後に残るブロック数) を返す"""
+    func()  # 初回だけのキャッシュなどを除く
+    gc.collect()
+    blocks = sys.getallocatedblocks()
+    for _ in range(calls):
+        func()
+    gc.collect()
+    retained = (sys.getallocatedblocks() - blocks) / calls
+    tracemalloc.start()
+    try:
+        base = tracemalloc.get_traced_memory()[0]
+        tracemalloc.reset_peak()
+        func()
+        peak = tracemalloc.get_traced_memory()[1] - base
+    finally:
+        tracemalloc.stop()
+    return peak, retained
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument(
+        "--only", help="このコーパスだけを計測（small/large/hub/malformed）"
+    )
+    parser.add_argument("--min-time", type=float, default=0.2, help="1計測の最小秒数")
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--json", help="結果の JSON を書き出すファイル")
+    args = parser.parse_args()
+
+    corpus = make_corpus()
+    if args.only:
+        corpus = {args.only: corpus[args.only]}
+    results = []
+    print(f"parser={HTML_PARSER}")
+    print(
+        f"{'corpus':10s} {'function':14s} {'items':>6s} {'ns/op':>14s}"
+        f" {'peak KiB/call':>14s} {'retained':>9s}"
+    )
+    for name, html in corpus.items():
+        size = len(html.encode("utf-8"))
+        for func_name, items, func in _cases(html):
+            seconds = time_per_call(func, args.min_time, args.repeat)
+            peak, retained = memory_per_call(func)
+            ns_per_op = seconds / items * 1e9
+            results.append(
+                {
+                    "corpus": name,
+                    "bytes": size,
+                    "function": func_name,
+                    "items_per_call": items,
+                    "ns_per_op": round(ns_per_op, 1),
+                    "peak_bytes_per_call": peak,
+                    "retained_blocks_per_call": round(retained, 1),
+                }
+            )
+            print(
+                f"{name:10s} {func_name:14s} {items:6d} {ns_per_op:14,.0f}"
+                f" {peak / 1024:14,.1f} {retained:9.1f}"
+            )
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(
+                {"parser": HTML_PARSER, "results": results},
+                f,
+                ensure_ascii=False,
+                indent=2,
+            )
+
+
+if __name__ == "__main__":
+    main()
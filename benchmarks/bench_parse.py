@@ -0,0 +1,72 @@
+"""大きなHTMLの1ページあたりの解析時間を計測する（従来の複数回解析 / 1回解析）
+
+python benchmarks/bench_parse.py --links 5000 --repeat 5
+"""
+
+import argparse
+import os
+import sys
+import time
+
+from bs4 import BeautifulSoup
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from link_extractor import HTML_PARSER, extract_links, parse_document  # noqa: E402
+
+BASE_URL = "https://www.example.com/docs/"
+
+
+def make_html(links):
+    rows = "\n".join(
+        f'<li><a href="section/{i}/page-{i}.html?ref=top">項目 {i} の説明'
+        f'<img src="i{i}.png" alt="画像{i}"></a>'
+        f"<p>本文テキスト {i} " + "あいうえお" * 10 + "</p></li>"
+        for i in range(links)
+    )
+    return (
+        "<!DOCTYPE html><html><head><title>ベンチマーク用ページ</title></head>"
+        f"<body><ul>{rows}</ul></body></html>"
+    )
+
+
+def old_pipeline(html):
+    """変更前: タイトル取得とリンク抽出でそれぞれ html.parser で解析"""
+    title = BeautifulSoup(html, "html.parser").title.string
+    links = extract_links(BeautifulSoup(html, "html.parser"), BASE_URL)
+    return title, links
+
+
+def new_pipeline(html):
+    """変更後: 1回だけ解析した文書からタイトルとリンクを取り出す"""
+    document = parse_document(html, BASE_URL)
+    return document.title, document.links
+
+
+def measure(func, html, repeat):
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = func(html)
+        best = min(best, time.perf_counter() - start)
+    return best, result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--links", type=int, default=5000)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    html = make_html(args.links)
+    print(f"html={len(html.encode('utf-8')) / 1024:.0f} KiB links={args.links}")
+    old_time, old_result = measure(old_pipeline, html, args.repeat)
+    new_time, new_result = measure(new_pipeline, html, args.repeat)
+    assert old_result == new_result, "解析結果が一致しません"
+    print(f"before (html.parser x2): {old_time * 1000:8.1f} ms/page")
+    print(f"after  ({HTML_PARSER} x1): {new_time * 1000:8.1f} ms/page")
+    print(f"speedup: {old_time / new_time:.2f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,148 @@
+import queue
+import threading
+from concurrent.futures import Future
+
+from playwright.sync_api import sync_playwright  # type: ignore
+
+from config import BROWSER_POOL_CONFIG
+
+
+class BrowserPool:
+    """起動済みの Chromium を使い回して動的ページを描画するプール
+
+    Playwright の同期APIは起動したスレッドからしか使えないため、
+    描画用スレッドを max_pages 本まで立て、それぞれがブラウザを1つ保持する。
+    ページごとに新しいコンテキストを作るので Cookie などは持ち越さない。
+    pages_per_browser ページ描画するか、ブラウザが落ちたら起動し直す。
+    """
+
+    def __init__(self, max_pages=2, pages_per_browser=100, headless=True):
+        self.max_pages = max(1, int(max_pages))
+        self.pages_per_browser = max(1, int(pages_per_browser))
+        self.headless = headless
+        self.launches = 0  # ブラウザの起動回数
+        self.rendered = 0  # 描画したページ数
+        self._jobs = queue.Queue()
+        self._lock = threading.Lock()
+        self._threads = []
+        self._busy = 0  # 受け付けて描画が終わっていないページ数
+        self._closed = False
+
+    def render(self, url, referrer=None):
+        """ページを描画して (HTML, タイトル) を返す"""
+        future = Future()
+        with self._lock:
+            if self._closed:
+                raise RuntimeError("ブラウザプールは閉じられています")
+            self._busy += 1
+            threads = len(self._threads)
+            if self._busy > threads and threads < self.max_pages:
+                thread = threading.Thread(
+                    target=self._run, name="browser-pool", daemon=True
+                )
+                self._threads.append(thread)
+                thread.start()
+            self._jobs.put((url, referrer, future))
+        return future.result()
+
+    def _run(self):
+        manager = None
+        playwright = None
+        browser = None
+        used = 0
+        try:
+            while True:
+                job = self._jobs.get()
+                if job is None:
+                    return
+                url, referrer, future = job
+                try:
+                    if playwright is None:
+                        starting = sync_playwright()
+                        playwright = starting.__enter__()
+                        manager = starting
+                    if browser is not None and (
+                        used >= self.pages_per_browser or not _is_connected(browser)
+                    ):
+                        _close_quietly(browser)
+                        browser = None
+                    if browser is None:
+                        browser = playwright.chromium.launch(headless=self.headless)
+                        used = 0
+                        with self._lock:
+                            self.launches += 1
+                    used += 1
+                    future.set_result(self._render_page(browser, url, referrer))
+                    with self._lock:
+                        self.rendered += 1
+                except Exception as e:
+                    future.set_exception(e)
+                    if browser is not None and not _is_connected(browser):
+                        # クラッシュしたブラウザは次のページで起動し直す
+                        _close_quietly(browser)
+                        browser = None
+                finally:
+                    with self._lock:
+                        self._busy -= 1
+        finally:
+            if browser is not None:
+                _close_quietly(browser)
+            if manager is not None:
+                manager.__exit__(None, None, None)
+
+    @staticmethod
+    def _render_page(browser, url, referrer):
+        headers = {"Referer": referrer} if referrer else {}
+        context = browser.new_context(extra_http_headers=headers)
+        try:
+            page = context.new_page()
+            page.goto(url, wait_until="networkidle")
+            return page.content(), page.title()
+        finally:
+            context.close()
+
+    def close(self):
+        """描画用スレッドを止めてブラウザを閉じる"""
+        with self._lock:
+            if self._closed:
+                return
+            self._closed = True
+            threads = list(self._threads)
+        for _ in threads:
+            self._jobs.put(None)
+        for thread in threads:
+            thread.join()
+
+
+def _is_connected(browser):
+    is_connected = getattr(browser, "is_connected", None)
+    return is_connected() if is_connected else True
+
+
+def _close_quietly(browser):
+    try:
+        browser.close()
+    except Exception:
+        pass
+
+
+_browser_pool = None
+_browser_pool_lock = threading.Lock()
+
+
+def get_browser_pool() -> BrowserPool:
+    """モジュール共有のブラウザプールを返す（初回呼び出し時に生成）"""
+    global _browser_pool
+    with _browser_pool_lock:
+        if _browser_pool is None:
+            _browser_pool = BrowserPool(**BROWSER_POOL_CONFIG)
+        return _browser_pool
+
+
+def close_browser_pool():
+    """共有ブラウザプールを閉じる（次回の get_browser_pool で作り直される）"""
+    global _browser_pool
+    with _browser_pool_lock:
+        pool, _browser_pool = _browser_pool, None
+    if pool is not None:
+        pool.close()
@@ -0,0 +1,252 @@
+import argparse
+import mmap
+import os
+import threading
+from collections import namedtuple
+from datetime import datetime
+from urllib.parse import urlsplit
+
+import warc_store
+from config import STORAGE_CONFIG
+
+CDX_HEADER = b" CDX N b a m s k S V g\n"
+
+# N: 検索キー, b: 取得日時, a: URL, m: MIMEタイプ, s: ステータス,
+# k: 本文の SHA-1（Base32）, S: レコードの長さ, V: オフセット, g: WARC ファイル名
+CdxEntry = namedtuple(
+    "CdxEntry", "urlkey timestamp url mime status digest length offset filename"
+)
+
+
+def surt_key(url: str) -> str:
+    """URL を CDX の検索キー（SURT 形式）にする
+
+    "https://www.Example.com/a?b=1" → "com,example)/a?b=1"。スキーム・先頭の
+    "www."・既定のポート・ホスト名の大文字小文字は区別しない。
+    """
+    parts = urlsplit(url.strip())
+    host = (parts.hostname or "").lower()
+    if host.startswith("www."):
+        host = host[4:]
+    key = ",".join(reversed(host.split(".")))
+    if parts.port and parts.port not in (80, 443):
+        key += f":{parts.port}"
+    key += ")" + (parts.path or "/")
+    if parts.query:
+        key += "?" + parts.query
+    return key.replace(" ", "%20")
+
+
+def _format_line(name, offset, length, record) -> bytes:
+    warc_headers, status, http_headers, _ = record
+    url = warc_headers.get("warc-target-uri", "")
+    timestamp = "".join(ch for ch in warc_headers.get("warc-date", "") if ch.isdigit())
+    mime = (http_headers.get("content-type") or "").split(";")[0].strip() or "-"
+    digest = warc_headers.get("warc-payload-digest", "-").removeprefix("sha1:")
+    fields = [surt_key(url), timestamp, url.replace(" ", "%20"), mime, str(status)]
+    fields += [digest, str(length), str(offset), name]
+    return (" ".join(fields) + "\n").encode("utf-8")
+
+
+def _sort_key(line: bytes):
+    """キー・取得日時の順。同じ秒の取得は書き込み順（ファイル名・オフセット）にする"""
+    fields = line.split(b" ")
+    return fields[0], fields[1], fields[8], int(fields[7])
+
+
+def build_index(warc_dir=None, output=None) -> int:
+    """warc_dir の WARC ファイルを走査して、キー順に並べた CDX 索引を作る
+
+    response レコードだけを索引に入れ、書き出した件数を返す。索引は一時ファイルに
+    書いてから置き換えるので、読み出し中のプロセスは古い索引を使い続けられる。
+    """
+    warc_dir = warc_dir or STORAGE_CONFIG["warc_dir"]
+    output = output or STORAGE_CONFIG["cdx_path"]
+    reader = warc_store.ArchiveReader(warc_dir)
+    lines = []
+    try:
+        for name in sorted(os.listdir(warc_dir)):
+            if not name.endswith(".warc.gz"):
+                continue
+            for offset, length, record in reader.iter_records(name):
+                if record[1] is not None:
+                    lines.append(_format_line(name, offset, length, record))
+    finally:
+        reader.close()
+    lines.sort(key=_sort_key)
+    tmp = f"{output}.tmp"
+    with open(tmp, "wb") as f:
+        f.write(CDX_HEADER)
+        f.writelines(lines)
+    os.replace(tmp, output)
+    return len(lines)
+
+
+def _parse_line(line: bytes) -> CdxEntry:
+    key, timestamp, url, mime, status, digest, length, offset, name = line.decode(
+        "utf-8"
+    ).split(" ")
+    return CdxEntry(
+        key, timestamp, url, mime, int(status), digest, int(length), int(offset), name
+    )
+
+
+class CdxIndex:
+    """キー順の CDX 索引を mmap して二分探索する
+
+    索引全体をメモリに読み込まず、1回の検索は O(log n) 行の比較で済む。
+    同じキーの行は取得日時順（同じ秒なら書き込み順）に並ぶので、最後の行が最新の取得になる。
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self._file = open(path, "rb")
+        size = os.fstat(self._file.fileno()).st_size
+        self._mm = (
+            mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ) if size else b""
+        )
+        self._start = (
+            len(CDX_HEADER) if self._mm[: len(CDX_HEADER)] == CDX_HEADER else 0
+        )
+
+    def _line_end(self, pos):
+        end = self._mm.find(b"\n", pos)
+        return len(self._mm) if end < 0 else end
+
+    def _bisect(self, key: bytes):
+        """キーが key 以上の最初の行の先頭位置を返す"""
+        lo, hi = self._start, len(self._mm)
+        while lo < hi:
+            mid = (lo + hi) // 2
+            start = max(self._mm.rfind(b"\n", lo, mid) + 1, lo)
+            end = self._line_end(start)
+            if self._mm[start:end].split(b" ", 1)[0] < key:
+                lo = end + 1
+            else:
+                hi = start
+        return lo
+
+    def _scan(self, pos, match):
+        """pos から match(キー) が真の行を順に返す"""
+        while pos < len(self._mm):
+            end = self._line_end(pos)
+            line = self._mm[pos:end]
+            if not match(line.split(b" ", 1)[0]):
+                return
+            yield _parse_line(line)
+            pos = end + 1
+
+    def captures(self, url):
+        """URL の取得記録を古い順に返す"""
+        key = surt_key(url).encode("utf-8")
+        return list(self._scan(self._bisect(key), key.__eq__))
+
+    def lookup(self, url):
+        """URL の最新の取得記録を返す（なければ None）"""
+        captures = self.captures(url)
+        return captures[-1] if captures else None
+
+    def iter_prefix(self, prefix=""):
+        """キーが prefix で始まる記録をキー順に返す（"com,example)" でホスト単位）"""
+        prefix = prefix.encode("utf-8")
+        return self._scan(self._bisect(prefix), lambda key: key.startswith(prefix))
+
+    def __iter__(self):
+        return self._scan(self._start, lambda key: True)
+
+    def close(self):
+        if isinstance(self._mm, mmap.mmap):
+            self._mm.close()
+        self._file.close()
+
+
+_index = None
+_index_stat = None
+_index_lock = threading.Lock()
+
+
+def get_archive_index():
+    """STORAGE_CONFIG["cdx_path"] の索引を返す（作り直されていれば開き直す）
+
+    索引をまだ作っていなければ None を返す。作り直す前の索引は、使用中の
+    スレッドがあるかもしれないので閉じずに手放す（参照がなくなれば閉じる）。
+    """
+    global _index, _index_stat
+    path = STORAGE_CONFIG["cdx_path"]
+    try:
+        stat = os.stat(path)
+    except FileNotFoundError:
+        return None
+    key = (path, stat.st_ino, stat.st_mtime_ns, stat.st_size)
+    with _index_lock:
+        if _index is None or _index_stat != key:
+            _index, _index_stat = CdxIndex(path), key
+        return _index
+
+
+def close_archive_index():
+    global _index, _index_stat
+    with _index_lock:
+        index, _index, _index_stat = _index, None, None
+    if index is not None:
+        index.close()
+
+
+def load_page(entry: CdxEntry) -> dict:
+    """索引の記録から WARC のレコードを読み、ページの辞書にする"""
+    record = warc_store.get_archive_reader().read_record(
+        entry.filename, entry.offset, entry.length
+    )
+    return {
+        "url": entry.url,
+        "fetched_at": datetime.strptime(entry.timestamp, "%Y%m%d%H%M%S"),
+        "status_code": entry.status,
+        "content": warc_store.decode_record(record),
+        "digest": entry.digest,
+        "warc_file": entry.filename,
+        "warc_offset": entry.offset,
+        "warc_length": entry.length,
+    }
+
+
+def get_archived_page(url):
+    """DBを使わずに、索引と WARC から URL の最新のページを返す（なければ None）"""
+    index = get_archive_index()
+    entry = index.lookup(url) if index is not None else None
+    return load_page(entry) if entry else None
+
+
+def iter_archived_pages(prefix=""):
+    """キーが prefix で始まるページをキー順にすべて返す"""
+    index = get_archive_index()
+    if index is None:
+        return
+    for entry in index.iter_prefix(prefix):
+        yield load_page(entry)
+
+
+def main():
+    """WARC ファイルから CDX 索引を作る / 索引から URL のページを引く"""
+    parser = argparse.ArgumentParser(description=main.__doc__)
+    commands = parser.add_subparsers(dest="command", required=True)
+    build = commands.add_parser("build", help="warc_dir の WARC から索引を作る")
+    build.add_argument("--warc-dir", default=STORAGE_CONFIG["warc_dir"])
+    build.add_argument("--output", default=STORAGE_CONFIG["cdx_path"])
+    get = commands.add_parser("get", help="URL の最新のページを表示する")
+    get.add_argument("url")
+    args = parser.parse_args()
+
+    if args.command == "build":
+        count = build_index(args.warc_dir, args.output)
+        print(f"{args.output}: {count} 件")
+        return
+    page = get_archived_page(args.url)
+    if page is None:
+        print(f"{args.url} は索引にありません")
+        return
+    print(f"{page['url']} ({page['status_code']}, {page['fetched_at']})")
+    print(page["content"])
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,155 @@
+import codecs
+import re
+import threading
+from collections import OrderedDict
+
+from charset_normalizer import from_bytes
+
+# <meta charset> を探す範囲（HTML仕様でも先頭1024バイト以内に書くことになっている）
+SNIFF_BYTES = 4096
+# 文字コードを覚えておくホスト数
+HOST_CACHE_SIZE = 10000
+
+_CONTENT_TYPE_CHARSET = re.compile(r"charset\s*=\s*[\"']?([\w.:-]+)", re.I)
+_META_CHARSET = re.compile(
+    rb"<meta[^>]+charset\s*=\s*[\"']?\s*([\w.:-]+)", re.I
+)  # <meta charset="x"> と <meta http-equiv=... content="...; charset=x"> の両方
+_XML_ENCODING = re.compile(rb"<\?xml[^>]+encoding\s*=\s*[\"']([\w.:-]+)", re.I)
+_BOMS = (
+    (codecs.BOM_UTF8, "utf-8-sig"),
+    (codecs.BOM_UTF16_LE, "utf-16"),
+    (codecs.BOM_UTF16_BE, "utf-16"),
+)
+# 宣言どおりに読むと化けるラベルを、ブラウザと同じく上位互換の文字コードで読む
+_ALIASES = {
+    "shift_jis": "cp932",
+    "windows_31j": "cp932",
+    "iso8859_1": "cp1252",
+    "ascii": "cp1252",
+    "gb2312": "gb18030",
+    "gbk": "gb18030",
+}
+
+
+def normalize_encoding(label):
+    """文字コード名を Python のコーデック名にそろえる（不明なら None）"""
+    if not label:
+        return None
+    name = label.strip().strip("\"'").lower().replace("-", "_")
+    if name in _ALIASES:
+        return _ALIASES[name]
+    try:
+        name = codecs.lookup(name).name.replace("-", "_")
+    except LookupError:
+        return None
+    return _ALIASES.get(name, name)
+
+
+def charset_from_content_type(content_type):
+    """Content-Type ヘッダーの charset を返す（指定がなければ None）"""
+    if not content_type:
+        return None
+    match = _CONTENT_TYPE_CHARSET.search(content_type)
+    return normalize_encoding(match.group(1)) if match else None
+
+
+def charset_from_bom(body: bytes):
+    for bom, encoding in _BOMS:
+        if body.startswith(bom):
+            return encoding
+    return None
+
+
+def sniff_meta_charset(body: bytes):
+    """先頭の <meta charset> / XML宣言から文字コードを返す"""
+    head = body[:SNIFF_BYTES]
+    match = _META_CHARSET.search(head) or _XML_ENCODING.search(head)
+    if not match:
+        return None
+    encoding = normalize_encoding(match.group(1).decode("ascii", "ignore"))
+    # UTF-16 の宣言は ASCII 互換のバイト列では誤りなので無視する
+    if encoding and encoding.startswith("utf_16"):
+        return None
+    return encoding
+
+
+def detect_charset(body: bytes):
+    """統計的に文字コードを推定（requests の apparent_encoding と同じ方法）"""
+    best = from_bytes(body).best()
+    return normalize_encoding(best.encoding) if best else None
+
+
+def _decodes(body: bytes, encoding) -> bool:
+    try:
+        body.decode(encoding)
+    except (UnicodeDecodeError, LookupError):
+        return False
+    return True
+
+
+class CharsetResolver:
+    """レスポンスの文字コードを安い方法から順に決める
+
+    1. Content-Type の charset
+    2. BOM
+    3. 先頭 SNIFF_BYTES バイト内の <meta charset> / XML宣言
+    4. UTF-8 としてそのまま読めるか
+    5. 同じホストで前回推定した文字コード（そのまま読める場合）
+    6. 統計的な推定（本文全体を走査するため最後の手段）
+
+    6 で推定した文字コードはホストごとに覚えておき、次のページでは推定を省く。
+    """
+
+    def __init__(self, host_cache_size=HOST_CACHE_SIZE):
+        self.host_cache_size = host_cache_size
+        self._hosts = OrderedDict()
+        self._lock = threading.Lock()
+
+    def resolve(self, body: bytes, content_type=None, host=None) -> str:
+        encoding = (
+            charset_from_content_type(content_type)
+            or charset_from_bom(body)
+            or sniff_meta_charset(body)
+        )
+        if encoding:
+            return encoding
+        if _decodes(body, "utf-8"):
+            return "utf_8"
+        remembered = self._remembered(host)
+        if remembered and _decodes(body, remembered):
+            return remembered
+        encoding = detect_charset(body) or "utf_8"
+        self._remember(host, encoding)
+        return encoding
+
+    def _remembered(self, host):
+        if not host:
+            return None
+        with self._lock:
+            encoding = self._hosts.get(host)
+            if encoding:
+                self._hosts.move_to_end(host)
+            return encoding
+
+    def _remember(self, host, encoding):
+        if not host:
+            return
+        with self._lock:
+            self._hosts[host] = encoding
+            self._hosts.move_to_end(host)
+            while len(self._hosts) > self.host_cache_size:
+                self._hosts.popitem(last=False)
+
+
+_resolver = CharsetResolver()
+
+
+def resolve_encoding(body: bytes, content_type=None, host=None) -> str:
+    """モジュール共有の CharsetResolver で文字コードを決める"""
+    return _resolver.resolve(body or b"", content_type, host)
+
+
+def decode_body(body: bytes, content_type=None, host=None) -> str:
+    """レスポンス本文を文字列に変換"""
+    body = body or b""
+    return body.decode(resolve_encoding(body, content_type, host), errors="replace")
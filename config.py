@@ -7,3 +7,109 @@ DB_CONFIG = {
 
 # Playwrightを使うURLパターン
 USE_PLAYWRIGHT_PATTERNS = ["example.com", "/dynamic/"]
+
+# DB接続プールの設定
+DB_POOL_CONFIG = {
+    "pool_size": 5,  # プールが保持する最大接続数
+    "timeout": 30,  # 空き接続を待つ最大秒数
+    "ping_interval": 60,  # この秒数以上アイドルだった接続は使用前に疎通確認
+    "reconnect_attempts": 3,  # 接続・再接続の試行回数
+    "reconnect_delay": 1,  # 再接続の間隔（秒）
+}
+
+# クローラーの設定
+CRAWLER_CONFIG = {
+    "workers": 1,  # 並列ワーカー数（--workers で上書き）
+    "batch_size": 10,  # 1回の確保・完了更新でまとめて扱うページ数
+    "claim_timeout": 600,  # この秒数を過ぎた確保は放棄されたとみなす
+    "idle_wait": 1.0,  # 他ワーカーの処理中にキューが空のときの待機秒数
+    "async_concurrency": 200,  # 非同期エンジンの全体の同時取得数
+    "async_per_host": 8,  # 非同期エンジンのホストごとの同時取得数
+    "async_db_threads": 8,  # 非同期エンジンでDB操作に使うスレッド数
+}
+
+# HTTP取得（GET/POST）の接続プールの設定
+HTTP_CONFIG = {
+    "pool_connections": 100,  # 接続を保持するホスト数
+    # 1ホストあたりに保持する接続数（--workers 以上にすると接続を使い回せる）
+    "pool_maxsize": 10,
+    "pool_block": False,  # True なら1ホストの同時接続数を pool_maxsize までに制限
+    "timeout": 10,  # リクエストのタイムアウト秒数
+    # 本文の受信の上限（超えたら "truncate": 上限までで切り詰める / "abort": 打ち切る）
+    "max_body_bytes": 10 * 1024 * 1024,
+    "max_download_seconds": 30,  # 本文の受信にかける最大秒数（超えたら打ち切る）
+    "on_oversize": "truncate",
+    "chunk_size": 65536,  # 本文を読むチャンクのバイト数
+}
+
+# 動的ページ（Playwright）用ブラウザプールの設定
+BROWSER_POOL_CONFIG = {
+    "max_pages": 2,  # 同時に描画するページ数（= 起動しておくブラウザ数）
+    "pages_per_browser": 100,  # このページ数を描画したらブラウザを起動し直す
+    "headless": True,
+}
+
+# robots.txt のルールのキャッシュ設定
+ROBOTS_CONFIG = {
+    "cache_size": 10000,  # プロセス内に保持する (ドメイン, User-Agent) の数
+    "max_ttl": 86400,  # キャッシュの最大有効秒数（通常は DB の expires_at まで）
+    "negative_ttl": 600,  # robots.txt を取得できなかったドメインを覚えておく秒数
+    "min_ttl": 300,  # Cache-Control: max-age が短くてもこの秒数は再取得しない
+    "timeout": 10,  # robots.txt の取得にかける最大秒数
+    "max_bytes": 512000,  # robots.txt として読む最大バイト数（超えた分は無視）
+    "backoff_base": 60,  # 5xx・接続エラー時の再取得間隔（失敗ごとに2倍）
+}
+
+# ページ本文の保存の設定
+STORAGE_CONFIG = {
+    # 本文を page_contents にハッシュをキーとして1回だけ保存する（同一の本文を共有）
+    "dedup": True,
+    "known_hashes": 100000,  # 保存済みとして覚えておくハッシュの数（INSERT を省く）
+    # page_contents の本文の圧縮形式: "zlib" / "zstd"（要 zstandard）/ None（圧縮しない）
+    "compression": "zlib",
+    "compression_level": 6,  # zlib は 1〜9、zstd は 1〜22（None なら既定値）
+    # 本文の保存先: "db"（page_contents）/ "warc"（WARC ファイルに追記し、DBには位置だけ保存）
+    "backend": "db",
+    "warc_dir": "warc",  # WARC ファイルを置くディレクトリ
+    "warc_prefix": "scrape",  # WARC ファイル名の先頭
+    "warc_max_bytes": 1024**3,  # このサイズを超えたら次のファイルに切り替える
+    "cdx_path": "warc/index.cdx",  # WARC の CDX 索引（python cdx_index.py build で作成）
+}
+
+# HTML/XML 以外のページを取得しない設定
+CONTENT_FILTER_CONFIG = {
+    "enabled": True,
+    # リンクを登録するときに除外する拡張子（空白区切り。ハンドラーを登録した種類は除外しない）
+    "skip_extensions": [
+        ".jpg .jpeg .png .gif .webp .svg .ico .bmp .tif .tiff",  # 画像
+        ".pdf .doc .docx .xls .xlsx .ppt .pptx",  # 文書
+        ".zip .gz .tgz .bz2 .xz .7z .rar .tar .exe .dmg .iso .apk .msi",  # アーカイブ
+        ".mp3 .mp4 .m4a .wav .ogg .flac .avi .mov .wmv .webm .mkv",  # 音声・動画
+        ".woff .woff2 .ttf .otf .eot .css .js",  # フォント・スタイル・スクリプト
+    ],
+    # 本文を読む Content-Type（"+xml" で終わる RSS / Atom なども読む）
+    "markup_types": [
+        "text/html",
+        "application/xhtml+xml",
+        "text/xml",
+        "application/xml",
+    ],
+}
+
+# /metrics（Prometheus のテキスト形式）の設定
+METRICS_CONFIG = {
+    "port": None,  # /metrics を返すポート（None なら起動しない。--metrics-port で上書き）
+    "host": "127.0.0.1",
+    "max_label_sets": 1000,  # 1メトリクスのラベルの組み合わせの上限（超えたら "other"）
+    "frontier_interval": 15,  # 未処理件数をDBに問い合わせる間隔（秒）
+    "rate_window": 60,  # scrape_pages_per_second を求める直近の秒数
+}
+
+# 既出URLフィルタ（ブルームフィルタ）の設定
+URL_FILTER_CONFIG = {
+    "enabled": True,
+    "capacity": 10_000_000,  # 想定するURL数（超えると誤判定率が上がる）
+    # 誤判定率。既出と判定したURLはDBで確かめるので、上げるとその問い合わせが増える
+    "error_rate": 0.001,
+    "path": "seen_urls.bloom",  # 保存先（None なら保存しない）
+}
@@ -0,0 +1,84 @@
+import mimetypes
+import os
+import threading
+from urllib.parse import urlparse
+
+from config import CONTENT_FILTER_CONFIG
+
+_handlers = {}
+_handlers_lock = threading.Lock()
+
+
+def enabled() -> bool:
+    return bool(CONTENT_FILTER_CONFIG["enabled"])
+
+
+def media_type(content_type) -> str:
+    """Content-Type ヘッダーから "text/html" のようなメディアタイプだけを返す"""
+    return (content_type or "").split(";")[0].strip().lower()
+
+
+def register_handler(mime_type, handler):
+    """HTML/XML 以外のメディアタイプを処理するハンドラーを登録する
+
+    handler(url, content_type, body: bytes) は保存する本文の文字列を返す
+    （None なら本文なしで保存する）。登録した種類は本文を上限まで受信して渡し、
+    その拡張子のリンクも除外しない。
+    """
+    with _handlers_lock:
+        _handlers[media_type(mime_type)] = handler
+
+
+def unregister_handler(mime_type):
+    with _handlers_lock:
+        _handlers.pop(media_type(mime_type), None)
+
+
+def get_handler(content_type):
+    """メディアタイプに登録したハンドラーを返す（なければ None）"""
+    with _handlers_lock:
+        return _handlers.get(media_type(content_type))
+
+
+def is_markup(content_type) -> bool:
+    """本文を読んで HTML/XML として解析する Content-Type か
+
+    Content-Type がないレスポンスは中身から判断するため読む。
+    """
+    if not enabled():
+        return True
+    mime = media_type(content_type)
+    if not mime:
+        return True
+    return mime in CONTENT_FILTER_CONFIG["markup_types"] or mime.endswith("+xml")
+
+
+_extensions = (None, frozenset())
+
+
+def _skip_extensions():
+    """skip_extensions を集合にする（設定が置き換えられたときだけ作り直す）"""
+    global _extensions
+    groups = CONTENT_FILTER_CONFIG["skip_extensions"]
+    if _extensions[0] is not groups:
+        exts = frozenset(ext.lower() for group in groups for ext in group.split())
+        _extensions = (groups, exts)
+    return _extensions[1]
+
+
+def is_skipped_url(url) -> bool:
+    """拡張子から明らかに HTML でないと分かるURLか（リンクの登録時に除外する）"""
+    if not enabled():
+        return False
+    path = urlparse(url).path
+    ext = os.path.splitext(path)[1].lower()
+    if not ext or ext not in _skip_extensions():
+        return False
+    guessed, _ = mimetypes.guess_type(path)
+    return get_handler(guessed) is None
+
+
+def skip_message(content_type) -> str:
+    """本文を読まずにスキップしたページの error_message"""
+    mime = media_type(content_type) or "不明"
+    return f"HTML/XML 以外の Content-Type のため本文を取得しません: {mime}"
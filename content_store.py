@@ -0,0 +1,205 @@
+import hashlib
+import threading
+import zlib
+from collections import OrderedDict
+from datetime import datetime
+
+import warc_store
+from config import STORAGE_CONFIG
+
+try:
+    import zstandard
+except ImportError:  # zstd を使わなければ不要
+    zstandard = None
+
+# page_contents.body の先頭1バイトで圧縮形式を表す
+FORMAT_RAW = b"r"  # 非圧縮の UTF-8
+FORMAT_ZLIB = b"z"
+FORMAT_ZSTD = b"s"
+
+
+class _Stats:
+    """保存しようとした本文と、実際に page_contents に書き込んだ本文の集計"""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.pages = 0
+        self.bytes = 0
+        self.stored_pages = 0
+        self.stored_bytes = 0
+        self.written_bytes = 0  # 実際に書き込んだ（圧縮後の）バイト数
+
+    def count(self, size, stored, written=0):
+        with self.lock:
+            self.pages += 1
+            self.bytes += size
+            if stored:
+                self.stored_pages += 1
+                self.stored_bytes += size
+                self.written_bytes += written
+
+
+class _KnownHashes:
+    """page_contents に保存済みと確認できたハッシュ（最近使ったものから max_entries 件）"""
+
+    def __init__(self, max_entries):
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        self._hashes = OrderedDict()
+
+    def __contains__(self, key):
+        with self._lock:
+            if key not in self._hashes:
+                return False
+            self._hashes.move_to_end(key)
+            return True
+
+    def add(self, key):
+        with self._lock:
+            self._hashes[key] = None
+            self._hashes.move_to_end(key)
+            while len(self._hashes) > self.max_entries:
+                self._hashes.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._hashes.clear()
+
+
+_stats = _Stats()
+_known = _KnownHashes(STORAGE_CONFIG["known_hashes"])
+
+
+def dedup_enabled() -> bool:
+    return bool(STORAGE_CONFIG["dedup"])
+
+
+def content_hash(encoded: bytes) -> bytes:
+    """page_contents のキー（UTF-8 の本文の SHA-256）"""
+    return hashlib.sha256(encoded).digest()
+
+
+def _zstd():
+    if zstandard is None:
+        raise RuntimeError(
+            "zstd で圧縮・展開するには zstandard をインストールしてください"
+        )
+    return zstandard
+
+
+def compress_content(encoded: bytes, compression=None, level=None) -> bytes | None:
+    """UTF-8 の本文を先頭に形式マーカーを付けて圧縮する
+
+    compression / level を省略すると STORAGE_CONFIG の値を使う。
+    圧縮しない設定なら None を返す（本文は content 列に文字列のまま保存する）。
+    """
+    if compression is None:
+        compression = STORAGE_CONFIG["compression"]
+    if level is None:
+        level = STORAGE_CONFIG["compression_level"]
+    if not compression:
+        return None
+    if compression == "zlib":
+        return FORMAT_ZLIB + zlib.compress(encoded, -1 if level is None else level)
+    if compression == "zstd":
+        cctx = _zstd().ZstdCompressor(level=3 if level is None else level)
+        return FORMAT_ZSTD + cctx.compress(encoded)
+    raise ValueError(f"未対応の圧縮形式: {compression}")
+
+
+def decompress_content(body) -> str:
+    """compress_content で保存した body を本文の文字列に戻す"""
+    body = bytes(body)
+    marker, data = body[:1], body[1:]
+    if marker == FORMAT_ZLIB:
+        data = zlib.decompress(data)
+    elif marker == FORMAT_ZSTD:
+        data = _zstd().ZstdDecompressor().decompress(data)
+    elif marker != FORMAT_RAW:
+        raise ValueError(f"未対応の本文の形式: {marker!r}")
+    return data.decode("utf-8")
+
+
+def decode_row(row):
+    """page_contents を結合して読んだ行の本文を content に入れる
+
+    WARC に保存した行はそのレコードを、圧縮した行は content_body を展開して使う。
+    圧縮せずに保存した行（body が NULL）は content をそのまま使う。
+    """
+    if row is None:
+        return None
+    body = row.pop("content_body", None)
+    if row.get("warc_file"):
+        row["content"] = warc_store.read_content(
+            row["warc_file"], row["warc_offset"], row["warc_length"]
+        )
+    elif body is not None:
+        row["content"] = decompress_content(body)
+    return row
+
+
+def store_content(cursor, content: str, encoded: bytes | None = None) -> bytes:
+    """本文を page_contents に保存し、scraped_pages.content_hash に入れるキーを返す
+
+    同じハッシュの本文がすでにあれば書き換えない（INSERT IGNORE）。このプロセスで
+    保存を確認したハッシュは問い合わせもしない。呼び出し側はコミット後に
+    mark_stored(key) を呼ぶ（ロールバックされた本文を保存済みと誤認しないため）。
+    STORAGE_CONFIG["compression"] を指定すると、本文は圧縮して body に書き込む。
+    """
+    if encoded is None:
+        encoded = content.encode("utf-8", errors="ignore")
+    key = content_hash(encoded)
+    if key in _known:
+        _stats.count(len(encoded), stored=False)
+        return key
+    body = compress_content(encoded)
+    text = content if body is None else None
+    cursor.execute(
+        "INSERT IGNORE INTO page_contents (`hash`, content, body, size, created_at)"
+        " VALUES (%s, %s, %s, %s, %s)",
+        (key, text, body, len(encoded), datetime.now()),
+    )
+    written = len(encoded) if body is None else len(body)
+    _stats.count(len(encoded), stored=cursor.rowcount == 1, written=written)
+    return key
+
+
+def mark_stored(key: bytes):
+    """コミット済みのハッシュを覚え、次回から INSERT を省く"""
+    _known.add(key)
+
+
+def forget_stored():
+    """page_contents を削除したときに、保存済みとして覚えたハッシュを捨てる"""
+    _known.clear()
+
+
+def get_stats() -> dict:
+    """今回の実行で保存した本文の件数・バイト数と重複排除率を返す
+
+    dedup_ratio は保存しようとした本文のバイト数のうち、既存の本文と同一で
+    書き込まずに済んだ割合。compression_ratio は新規保存した本文の
+    圧縮前のバイト数 / 書き込んだバイト数。
+    """
+    with _stats.lock:
+        pages, size = _stats.pages, _stats.bytes
+        stored_pages, stored_bytes = _stats.stored_pages, _stats.stored_bytes
+        written_bytes = _stats.written_bytes
+    return {
+        "pages": pages,
+        "stored_pages": stored_pages,
+        "bytes": size,
+        "stored_bytes": stored_bytes,
+        "written_bytes": written_bytes,
+        "dedup_ratio": (size - stored_bytes) / size if size else 0.0,
+        "compression_ratio": stored_bytes / written_bytes if written_bytes else 1.0,
+    }
+
+
+def reset_stats():
+    with _stats.lock:
+        _stats.pages = 0
+        _stats.bytes = 0
+        _stats.stored_pages = 0
+        _stats.stored_bytes = 0
+        _stats.written_bytes = 0
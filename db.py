@@ -0,0 +1,185 @@
+import threading
+import time
+from collections import deque
+
+import mysql.connector
+from mysql.connector import errors
+from config import DB_CONFIG, DB_POOL_CONFIG
+
+
+class PooledConnection:
+    """プールから貸し出した接続
+
+    close() を呼ぶと物理接続は閉じずにプールへ返却する。
+    それ以外の属性は元の接続へそのまま委譲する。
+    """
+
+    def __init__(self, pool, raw):
+        self._pool = pool
+        self._raw = raw
+
+    def __getattr__(self, name):
+        return getattr(self._raw, name)
+
+    def close(self):
+        if self._raw is None:
+            return
+        raw, self._raw = self._raw, None
+        self._pool.release(raw)
+
+
+class ConnectionPool:
+    """スレッドセーフな MySQL 接続プール"""
+
+    def __init__(
+        self,
+        db_config,
+        pool_size=5,
+        timeout=30,
+        ping_interval=60,
+        reconnect_attempts=3,
+        reconnect_delay=1,
+    ):
+        if pool_size < 1:
+            raise ValueError("pool_size は1以上を指定してください")
+        self.db_config = db_config
+        self.pool_size = pool_size
+        self.timeout = timeout
+        self.ping_interval = ping_interval
+        self.reconnect_attempts = max(1, reconnect_attempts)
+        self.reconnect_delay = reconnect_delay
+        self._idle = deque()  # (接続, 返却時刻)
+        self._size = 0  # 貸し出し中 + アイドルの物理接続数
+        self._cond = threading.Condition()
+
+    def get_connection(self) -> PooledConnection:
+        """空き接続を貸し出す。空きがなければ新規接続するか返却を待つ"""
+        deadline = time.monotonic() + self.timeout
+        with self._cond:
+            while True:
+                if self._idle:
+                    raw, last_used = self._idle.pop()
+                    break
+                if self._size < self.pool_size:
+                    self._size += 1
+                    raw, last_used = None, None
+                    break
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    raise errors.PoolError(
+                        f"空き接続がありません (pool_size={self.pool_size})"
+                    )
+                self._cond.wait(remaining)
+
+        try:
+            if raw is None:
+                raw = self._connect()
+            elif time.monotonic() - last_used >= self.ping_interval:
+                raw = self._ensure_alive(raw)
+        except Exception:
+            self._forget()
+            raise
+        return PooledConnection(self, raw)
+
+    def resize(self, pool_size):
+        """最大接続数を変更する（縮小時は返却された接続から順に閉じる）"""
+        if pool_size < 1:
+            raise ValueError("pool_size は1以上を指定してください")
+        with self._cond:
+            self.pool_size = pool_size
+            excess = []
+            while self._idle and self._size - len(excess) > pool_size:
+                excess.append(self._idle.popleft()[0])
+            self._cond.notify_all()
+        for raw in excess:
+            self._discard(raw)
+
+    def release(self, raw):
+        """接続をプールへ戻す。状態をリセットできない接続は破棄する"""
+        try:
+            # 読み取りスナップショットや未コミットの変更を持ち越さない。
+            # ROLLBACK も1往復かかるので、トランザクション中のときだけ送る
+            if raw.in_transaction:
+                raw.rollback()
+        except Exception:
+            self._discard(raw)
+            return
+        with self._cond:
+            if self._size <= self.pool_size:
+                self._idle.append((raw, time.monotonic()))
+                self._cond.notify()
+                return
+        self._discard(raw)
+
+    def close_all(self):
+        """アイドル中の接続をすべて閉じる"""
+        with self._cond:
+            idle = list(self._idle)
+            self._idle.clear()
+        for raw, _ in idle:
+            self._discard(raw)
+
+    def _connect(self):
+        """新しい物理接続を確立（接続エラー時は再試行）"""
+        for attempt in range(1, self.reconnect_attempts + 1):
+            try:
+                return mysql.connector.connect(**self.db_config)
+            except (errors.InterfaceError, errors.OperationalError):
+                if attempt == self.reconnect_attempts:
+                    raise
+                time.sleep(self.reconnect_delay)
+
+    def _ensure_alive(self, raw):
+        """疎通確認し、切れていれば再接続する。再接続できなければ作り直す"""
+        try:
+            raw.ping(
+                reconnect=True,
+                attempts=self.reconnect_attempts,
+                delay=self.reconnect_delay,
+            )
+            return raw
+        except errors.Error:
+            try:
+                raw.close()
+            except Exception:
+                pass
+            return self._connect()
+
+    def _discard(self, raw):
+        try:
+            raw.close()
+        except Exception:
+            pass
+        self._forget()
+
+    def _forget(self):
+        with self._cond:
+            self._size -= 1
+            self._cond.notify()
+
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def get_pool() -> ConnectionPool:
+    """モジュール共有の接続プールを返す（初回呼び出し時に生成）"""
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = ConnectionPool(DB_CONFIG, **DB_POOL_CONFIG)
+        return _pool
+
+
+def get_connection() -> PooledConnection:
+    """共有プールから接続を1つ借りる。使用後は close() で返却する"""
+    return get_pool().get_connection()
+
+
+def close_pool():
+    """共有プールを閉じる（次回の get_connection で作り直される）"""
+    global _pool
+    with _pool_lock:
+        pool, _pool = _pool, None
+    if pool is not None:
+        pool.close_all()
@@ -1,13 +1,16 @@
-from urllib.robotparser import RobotFileParser
 from urllib.parse import urlparse
 
 import requests
 from bs4 import BeautifulSoup
-import mysql.connector
-from datetime import datetime, timedelta, UTC
+import mysql.connector  # noqa: F401 (テストから参照)
+from datetime import datetime
 from urllib.parse import urljoin
 import hashlib
-from config import DB_CONFIG
+from db import get_connection
+
+# robots.txt の取得・保存は robots_handler に一本化している（時間・サイズの上限、
+# 条件付き取得、失敗時の再取得間隔を含む）。従来の import 先として残す。
+from robots_handler import fetch_and_store_robots  # noqa: F401
 
 
 def extract_links(soup, base_url):
@@ -74,7 +77,7 @@ def get_hash(text):
 
 
 def save_to_mysql(data):
-    conn = mysql.connector.connect(**DB_CONFIG)
+    conn = get_connection()
     cursor = conn.cursor()
     sql = """
         INSERT INTO scraped_pages (
@@ -107,51 +110,6 @@ def save_to_mysql(data):
     conn.close()
 
 
-# robots.txtを取得してDBに保存する関数
-def fetch_and_store_robots(domain, user_agent="MyScraperBot"):
-    robots_url = f"https://{domain}/robots.txt"
-    rp = RobotFileParser()
-    rp.set_url(robots_url)
-    try:
-        rp.read()
-        disallow = "\n".join(rp.disallow_all if rp.disallow_all else [])
-        allow = "\n".join(rp.allow_all if rp.allow_all else [])
-        delay = rp.crawl_delay(user_agent)
-
-        now = datetime.now(UTC)
-        expires = now + timedelta(hours=24)
-
-        # DB保存（UPSERT）
-        conn = mysql.connector.connect(**DB_CONFIG)
-        cursor = conn.cursor()
-        cursor.execute(
-            """
-            INSERT INTO robots_rules (
-                domain,
-                user_agent,
-                disallow,
-                allow,
-                crawl_delay,
-                fetched_at,
-                expires_at
-            )
-            VALUES (%s, %s, %s, %s, %s, %s, %s)
-            ON DUPLICATE KEY UPDATE
-                disallow = VALUES(disallow),
-                allow = VALUES(allow),
-                crawl_delay = VALUES(crawl_delay),
-                fetched_at = VALUES(fetched_at),
-                expires_at = VALUES(expires_at)
-        """,
-            (domain, user_agent, disallow, allow, delay, now, expires),
-        )
-        conn.commit()
-        cursor.close()
-        conn.close()
-    except Exception as e:
-        print(f"robots.txt fetch failed for {domain}: {e}")
-
-
 # robots.txtのルールに基づいてURLが取得可能か確認する関数
 def can_fetch_from_db(path, rules_row):
     disallowed = rules_row["disallow"].split("\n") if rules_row["disallow"] else []
@@ -0,0 +1,264 @@
+import hashlib
+import socket
+import threading
+import time
+from collections import namedtuple
+
+import requests
+import urllib3
+from requests.adapters import HTTPAdapter
+from urllib3.connectionpool import HTTPConnectionPool, HTTPSConnectionPool
+from urllib3.exceptions import DecodeError, ProtocolError, ReadTimeoutError
+
+import metrics
+from config import HTTP_CONFIG
+
+# content: 受信した本文（上限まで）, sha256: 本文の SHA-256（16進）,
+# truncated: 上限を超えたため切り詰めたか
+Body = namedtuple("Body", ["content", "sha256", "truncated"])
+
+
+class DownloadLimitExceeded(Exception):
+    """本文が max_body_bytes を超えた、または max_download_seconds 以内に読み終わらなかった"""
+
+
+class _Stats:
+    """リクエスト数と新規接続数（TCP/TLS ハンドシェイク数）の集計"""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.requests = 0
+        self.connections = 0
+
+    def count_request(self):
+        with self.lock:
+            self.requests += 1
+
+    def count_connection(self):
+        with self.lock:
+            self.connections += 1
+
+
+_stats = _Stats()
+metrics.Counter("scrape_http_requests_total", "GET/POST のリクエスト数").set_function(
+    lambda: _stats.requests
+)
+metrics.Counter(
+    "scrape_http_connections_total", "新規接続（TCP/TLS ハンドシェイク）の数"
+).set_function(lambda: _stats.connections)
+
+
+class _CountingHTTPConnectionPool(HTTPConnectionPool):
+    def _new_conn(self):
+        _stats.count_connection()
+        return super()._new_conn()
+
+
+class _CountingHTTPSConnectionPool(HTTPSConnectionPool):
+    def _new_conn(self):
+        _stats.count_connection()
+        return super()._new_conn()
+
+
+class PooledAdapter(HTTPAdapter):
+    """ホストごとに接続を保持し、新規接続の数を数えるアダプタ
+
+    pool_connections は保持するホスト数、pool_maxsize は1ホストあたりの接続数。
+    urllib3 の接続プールはスレッドセーフなので、複数のセッションで共有できる。
+    """
+
+    def init_poolmanager(self, *args, **kwargs):
+        super().init_poolmanager(*args, **kwargs)
+        self.poolmanager.pool_classes_by_scheme = {
+            "http": _CountingHTTPConnectionPool,
+            "https": _CountingHTTPSConnectionPool,
+        }
+
+
+_adapter = None
+_adapter_lock = threading.Lock()
+_local = threading.local()
+
+
+def _get_adapter():
+    global _adapter
+    with _adapter_lock:
+        if _adapter is None:
+            _adapter = PooledAdapter(
+                pool_connections=HTTP_CONFIG["pool_connections"],
+                pool_maxsize=HTTP_CONFIG["pool_maxsize"],
+                pool_block=HTTP_CONFIG["pool_block"],
+            )
+        return _adapter
+
+
+def get_session() -> requests.Session:
+    """呼び出し元スレッド用のセッションを返す
+
+    Cookie などのセッション状態はスレッドごとに分け、
+    接続プール（アダプタ）は全スレッドで共有して keep-alive 接続を使い回す。
+    """
+    session = getattr(_local, "session", None)
+    if session is None:
+        session = requests.Session()
+        adapter = _get_adapter()
+        session.mount("http://", adapter)
+        session.mount("https://", adapter)
+        _local.session = session
+    return session
+
+
+def get(url, **kwargs) -> requests.Response:
+    """共有接続プールを使って GET する（requests.get と同じ引数）"""
+    kwargs.setdefault("timeout", HTTP_CONFIG["timeout"])
+    _stats.count_request()
+    return get_session().get(url, **kwargs)
+
+
+def post(url, **kwargs) -> requests.Response:
+    """共有接続プールを使って POST する（requests.post と同じ引数）"""
+    kwargs.setdefault("timeout", HTTP_CONFIG["timeout"])
+    _stats.count_request()
+    return get_session().post(url, **kwargs)
+
+
+class BodyReader:
+    """受信したチャンクを上限まで溜め、読みながら SHA-256 を計算する
+
+    チャンクは展開済み（Content-Encoding を解いた後）の本文なので、圧縮爆弾も
+    展開後のサイズで止まる。上限を超えたら on_oversize が "truncate" なら
+    上限までで読むのをやめ、"abort" なら DownloadLimitExceeded を送出する。
+    時間切れは常に DownloadLimitExceeded。省略した値は HTTP_CONFIG を使う。
+    """
+
+    def __init__(
+        self, max_bytes=None, max_seconds=None, on_oversize=None, content_length=None
+    ):
+        self.max_bytes = (
+            HTTP_CONFIG["max_body_bytes"] if max_bytes is None else max_bytes
+        )
+        self.max_seconds = (
+            HTTP_CONFIG["max_download_seconds"] if max_seconds is None else max_seconds
+        )
+        self.on_oversize = on_oversize or HTTP_CONFIG["on_oversize"]
+        self.deadline = (
+            time.monotonic() + self.max_seconds if self.max_seconds else None
+        )
+        self.truncated = False
+        self._body = bytearray()
+        self._sha256 = hashlib.sha256()
+        if (
+            self.on_oversize == "abort"
+            and self.max_bytes
+            and content_length
+            and int(content_length) > self.max_bytes
+        ):
+            # 読み始める前に Content-Length で分かるなら受信しない
+            raise self._too_large()
+
+    def _too_large(self):
+        return DownloadLimitExceeded(
+            f"本文が上限の {self.max_bytes} バイトを超えました"
+        )
+
+    def feed(self, chunk: bytes) -> bool:
+        """チャンクを追加し、続けて読むなら True を返す"""
+        if self.deadline is not None and time.monotonic() > self.deadline:
+            raise self.timed_out()
+        if self.max_bytes and len(self._body) + len(chunk) > self.max_bytes:
+            if self.on_oversize != "truncate":
+                raise self._too_large()
+            end = self.max_bytes - len(self._body)
+            chunk = chunk[:end]
+            self.truncated = True
+        self._body += chunk
+        self._sha256.update(chunk)
+        return not self.truncated
+
+    def timed_out(self):
+        return DownloadLimitExceeded(
+            f"本文の受信が {self.max_seconds} 秒以内に終わりませんでした"
+        )
+
+    def result(self) -> Body:
+        body, self._body = bytes(self._body), bytearray()
+        metrics.DOWNLOADED_BYTES.inc(len(body))
+        return Body(body, self._sha256.hexdigest(), self.truncated)
+
+
+def iter_body(response, deadline=None, chunk_size=None, timeout_error=None):
+    """stream=True で受け取ったレスポンスの本文を展開しながら少しずつ返す
+
+    iter_content は chunk_size が溜まるまで戻らないため、1バイトずつ送ってくる
+    サーバーでは期限を確かめられない。届いた分だけ返す read1 で読み、ソケットの
+    タイムアウトを期限（time.monotonic() の値）までの残り時間に縮めるので、
+    期限を過ぎたら timeout_error（省略時は DownloadLimitExceeded）を送出する。
+    requests のレスポンスでないもの（テストのダミーなど）は iter_content で読む。
+    """
+    chunk_size = chunk_size or HTTP_CONFIG["chunk_size"]
+    raw = getattr(response, "raw", None)
+    if not isinstance(raw, urllib3.HTTPResponse):
+        yield from response.iter_content(chunk_size=chunk_size)
+        return
+    timeout_error = timeout_error or DownloadLimitExceeded(
+        "本文の受信が期限までに終わりませんでした"
+    )
+    sock = getattr(raw.connection, "sock", None)
+    read_timeout = sock.gettimeout() if sock is not None else None
+    while True:
+        if deadline is not None:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                raise timeout_error
+            if sock is not None:
+                sock.settimeout(
+                    remaining if read_timeout is None else min(remaining, read_timeout)
+                )
+        try:
+            chunk = raw.read1(chunk_size, decode_content=True)
+        except (ReadTimeoutError, socket.timeout) as e:
+            if deadline is not None and time.monotonic() >= deadline:
+                raise timeout_error from e
+            raise requests.exceptions.ConnectionError(e) from e
+        # iter_content と同じく requests の例外にする
+        except ProtocolError as e:
+            raise requests.exceptions.ChunkedEncodingError(e) from e
+        except DecodeError as e:
+            raise requests.exceptions.ContentDecodingError(e) from e
+        if not chunk:
+            return
+        yield chunk
+
+
+def read_body(response, **limits) -> Body:
+    """stream=True で受け取ったレスポンスの本文を上限まで読む（limits は BodyReader の引数）"""
+    reader = BodyReader(content_length=response.headers.get("Content-Length"), **limits)
+    for chunk in iter_body(response, reader.deadline, timeout_error=reader.timed_out()):
+        if not reader.feed(chunk):
+            break
+    return reader.result()
+
+
+def get_stats() -> dict:
+    """リクエスト数・新規接続数と1ページあたりのハンドシェイク数を返す"""
+    with _stats.lock:
+        requests_count = _stats.requests
+        connections = _stats.connections
+    return {
+        "requests": requests_count,
+        "connections": connections,
+        "handshakes_per_page": connections / requests_count if requests_count else 0.0,
+    }
+
+
+def reset_stats():
+    with _stats.lock:
+        _stats.requests = 0
+        _stats.connections = 0
+
+
+def close():
+    """保持している keep-alive 接続をすべて閉じる（プールは再利用できる）"""
+    with _adapter_lock:
+        if _adapter is not None:
+            _adapter.close()
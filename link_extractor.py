@@ -1,6 +1,17 @@
+from functools import cached_property
 from urllib.parse import urlparse, urljoin
 from bs4 import BeautifulSoup
 
+from content_filter import is_skipped_url
+from metrics import PARSE_SECONDS
+
+try:
+    import lxml  # noqa: F401
+
+    HTML_PARSER = "lxml"
+except ImportError:  # lxml がなければ標準のパーサーを使う
+    HTML_PARSER = "html.parser"
+
 
 def is_under_base(url, base_url):
     """URLがベースURL配下かどうかをチェック"""
@@ -22,6 +33,9 @@ def extract_links(soup: BeautifulSoup, base_url: str) -> list[tuple[str, str]]:
         # 外部リンクやベースURL配下でないリンクはスキップ
         if not is_under_base(full_url, base_url):
             continue
+        # 画像・PDF・アーカイブなど拡張子から HTML でないと分かるリンクは登録しない
+        if is_skipped_url(full_url):
+            continue
 
         text = a_tag.get_text(strip=True)
 
@@ -45,19 +59,48 @@ def normalize_url(url):
     return f"{parsed.scheme}://{parsed.netloc}{parsed.path}"
 
 
-def extract_title(html_content):
-    """HTMLからタイトルを抽出"""
+class ParsedDocument:
+    """1回だけ解析した文書
 
-    try:
+    タイトル・リンク・本文テキストは最初に参照したときに取り出して保持する。
+    取得から保存・リンク抽出までこのオブジェクトを共有し、同じ内容を再解析しない。
+    """
 
-        soup = BeautifulSoup(html_content, "html.parser")
+    def __init__(self, content, base_url=None):
+        content = content or ""
+        self.base_url = base_url
+        if content.lstrip().startswith("<?xml"):
+            self.soup = BeautifulSoup(content, features="xml")
+        else:
+            self.soup = BeautifulSoup(content, HTML_PARSER)
 
-        if soup.title and soup.title.string:
+    @cached_property
+    def title(self):
+        title = self.soup.title
+        if title and title.string:
+            return title.string.strip()
+        return None
 
-            return soup.title.string.strip()
+    @cached_property
+    def links(self) -> list[tuple[str, str]]:
+        if not self.base_url:
+            return []
+        return extract_links(self.soup, self.base_url)
+
+    @cached_property
+    def text(self) -> str:
+        return " ".join(self.soup.get_text(" ").split())
 
-    except Exception:
 
-        pass
+def parse_document(content, base_url=None) -> ParsedDocument:
+    """HTML/XML を解析して ParsedDocument を返す"""
+    with PARSE_SECONDS.time():
+        return ParsedDocument(content, base_url)
 
-    return None
+
+def extract_title(html_content):
+    """HTMLからタイトルを抽出"""
+    try:
+        return parse_document(html_content).title
+    except Exception:
+        return None
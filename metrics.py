@@ -0,0 +1,426 @@
+import functools
+import inspect
+import math
+import threading
+import time
+from bisect import bisect_left
+from collections import deque
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from config import METRICS_CONFIG
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+# 取得・解析・DB操作の秒数向けのバケット（上限。+Inf は自動で付ける）
+DEFAULT_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+# ラベルの組み合わせがこの数を超えたら、以降の新しい値は "other" にまとめる
+OTHER = "other"
+
+
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_value(value) -> str:
+    value = float(value)
+    if math.isnan(value):
+        return "NaN"
+    if math.isinf(value):
+        return "+Inf" if value > 0 else "-Inf"
+    return str(int(value)) if value.is_integer() else repr(value)
+
+
+def _labels_text(names, values, extra=()) -> str:
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    pairs += [f'{name}="{_escape(value)}"' for name, value in extra]
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+class _Metric:
+    """メトリクスの共通部分（ラベルの値ごとの子を持つ）
+
+    子の作成だけをロックし、値の更新は子ごとのロックで行う。ラベルの組み合わせは
+    max_label_sets までで、それを超えた新しい値は "other" にまとめる
+    （ホスト名のような値で時系列が際限なく増えないようにする）。
+    """
+
+    type_name = ""
+
+    def __init__(self, name, documentation, labelnames=(), registry=None):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self.max_label_sets = METRICS_CONFIG["max_label_sets"]
+        self._children = {}
+        self._lock = threading.Lock()
+        self._function = None
+        if not self.labelnames:
+            self._children[()] = self._new_child()
+        (REGISTRY if registry is None else registry).register(self)
+
+    def _new_child(self):
+        raise NotImplementedError
+
+    def labels(self, *values):
+        """ラベルの値（labelnames の順）に対応する子を返す"""
+        key = tuple(str(value) for value in values)
+        child = self._children.get(key)
+        if child is not None:
+            return child
+        if len(key) != len(self.labelnames):
+            raise ValueError(f"{self.name}: ラベルは {self.labelnames} です")
+        with self._lock:
+            child = self._children.get(key)
+            if child is None:
+                if len(self._children) >= self.max_label_sets:
+                    key = (OTHER,) * len(self.labelnames)
+                    child = self._children.get(key)
+                if child is None:
+                    child = self._children[key] = self._new_child()
+            return child
+
+    def set_function(self, func):
+        """値を持たず、出力するたびに func() の値を使う（ラベルなしのメトリクス用）"""
+        self._function = func
+
+    def _samples(self):
+        """(サフィックス, ラベルの値, 追加のラベル, 値) を返す"""
+        if self._function is not None:
+            try:
+                value = float(self._function())
+            except Exception:
+                value = math.nan  # DB に届かないなどで値が取れない
+            return [("", (), (), value)]
+        with self._lock:
+            children = list(self._children.items())
+        samples = []
+        for values, child in children:
+            for suffix, extra, value in child.samples():
+                samples.append((suffix, values, extra, value))
+        return samples
+
+    def expose(self) -> str:
+        lines = [
+            f"# HELP {self.name} {_escape(self.documentation)}",
+            f"# TYPE {self.name} {self.type_name}",
+        ]
+        for suffix, values, extra, value in self._samples():
+            labels = _labels_text(self.labelnames, values, extra)
+            lines.append(f"{self.name}{suffix}{labels} {_format_value(value)}")
+        return "\n".join(lines) + "\n"
+
+
+class _Value:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.value = 0.0
+
+    def inc(self, amount=1):
+        with self._lock:
+            self.value += amount
+
+    def set(self, value):
+        with self._lock:
+            self.value = value
+
+    def samples(self):
+        return [("", (), self.value)]
+
+
+class Counter(_Metric):
+    """単調に増える値（取得したバイト数・ページ数など）"""
+
+    type_name = "counter"
+
+    def _new_child(self):
+        return _Value()
+
+    def inc(self, amount=1):
+        if amount < 0:
+            raise ValueError("Counter は減らせません")
+        self._children[()].inc(amount)
+
+
+class Gauge(_Metric):
+    """増減する値（未処理のページ数など）"""
+
+    type_name = "gauge"
+
+    def _new_child(self):
+        return _Value()
+
+    def set(self, value):
+        self._children[()].set(value)
+
+    def inc(self, amount=1):
+        self._children[()].inc(amount)
+
+    def dec(self, amount=1):
+        self._children[()].inc(-amount)
+
+
+class _HistogramValue:
+    def __init__(self, buckets):
+        self._lock = threading.Lock()
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)  # 最後は +Inf
+        self.sum = 0.0
+
+    def observe(self, value):
+        index = bisect_left(self.buckets, value)
+        with self._lock:
+            self.counts[index] += 1
+            self.sum += value
+
+    def time(self):
+        return _Timer(self)
+
+    def samples(self):
+        with self._lock:
+            counts, total = list(self.counts), self.sum
+        samples = []
+        cumulative = 0
+        for bound, count in zip(self.buckets + (math.inf,), counts):
+            cumulative += count
+            samples.append(("_bucket", (("le", _format_value(bound)),), cumulative))
+        samples.append(("_sum", (), total))
+        samples.append(("_count", (), cumulative))
+        return samples
+
+
+class _Timer:
+    """with ブロックの経過秒数を observe する"""
+
+    def __init__(self, target):
+        self._target = target
+
+    def __enter__(self):
+        self._start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self._target.observe(time.perf_counter() - self._start)
+        return False
+
+
+class Histogram(_Metric):
+    """値の分布（取得・解析・DB操作の秒数など）をバケットごとの件数で数える"""
+
+    type_name = "histogram"
+
+    def __init__(
+        self, name, documentation, labelnames=(), buckets=DEFAULT_BUCKETS, registry=None
+    ):
+        self.buckets = tuple(sorted(float(b) for b in buckets if b != math.inf))
+        super().__init__(name, documentation, labelnames, registry)
+
+    def _new_child(self):
+        return _HistogramValue(self.buckets)
+
+    def observe(self, value):
+        self._children[()].observe(value)
+
+    def time(self):
+        """with metric.time(): ... で経過秒数を記録する"""
+        return _Timer(self._children[()])
+
+
+class Registry:
+    """出力するメトリクスの一覧"""
+
+    def __init__(self):
+        self._metrics = {}
+        self._lock = threading.Lock()
+
+    def register(self, metric):
+        with self._lock:
+            if metric.name in self._metrics:
+                raise ValueError(f"{metric.name} はすでに登録されています")
+            self._metrics[metric.name] = metric
+
+    def get(self, name):
+        return self._metrics.get(name)
+
+    def expose(self) -> str:
+        """Prometheus のテキスト形式で全メトリクスを返す"""
+        with self._lock:
+            metrics = list(self._metrics.values())
+        return "".join(metric.expose() for metric in metrics)
+
+
+REGISTRY = Registry()
+
+
+def timed(histogram, label=None):
+    """関数の実行秒数を histogram に記録するデコレータ
+
+    label を省略すると関数名をラベルの値にする（ラベルのある histogram の場合）。
+    ジェネレータ関数は、使い切るか閉じるまでにジェネレータの中で費やした秒数を
+    記録する（利用側が各要素を処理する時間は含めない）。
+    """
+
+    def decorator(func):
+        if histogram.labelnames:
+            target = histogram.labels(label or func.__name__)
+        else:
+            target = histogram._children[()]
+
+        if inspect.isgeneratorfunction(func):
+
+            @functools.wraps(func)
+            def generator_wrapper(*args, **kwargs):
+                generator = func(*args, **kwargs)
+                elapsed = 0.0
+                try:
+                    while True:
+                        start = time.perf_counter()
+                        try:
+                            item = next(generator)
+                        except StopIteration as stop:
+                            return stop.value
+                        finally:
+                            elapsed += time.perf_counter() - start
+                        yield item
+                finally:
+                    # 途中で閉じられたら、カーソル・接続の後始末の時間も含める
+                    start = time.perf_counter()
+                    generator.close()
+                    elapsed += time.perf_counter() - start
+                    target.observe(elapsed)
+
+            return generator_wrapper
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            start = time.perf_counter()
+            try:
+                return func(*args, **kwargs)
+            finally:
+                target.observe(time.perf_counter() - start)
+
+        return wrapper
+
+    return decorator
+
+
+def cached(func, seconds):
+    """func() の値を seconds 秒だけ使い回す（DB への問い合わせを伴う値の出力用）"""
+    state = {"at": None, "value": None}
+    lock = threading.Lock()
+
+    def wrapper():
+        with lock:
+            now = time.monotonic()
+            if state["at"] is None or now - state["at"] >= seconds:
+                state["value"] = func()
+                state["at"] = now
+            return state["value"]
+
+    return wrapper
+
+
+# クローラーのメトリクス（各モジュールから記録する）
+FETCH_SECONDS = Histogram(
+    "scrape_fetch_seconds",
+    "ページの取得（リクエストから本文の受信まで）にかかった秒数",
+    ["host"],
+)
+PARSE_SECONDS = Histogram("scrape_parse_seconds", "HTML/XML の解析にかかった秒数")
+DB_SECONDS = Histogram(
+    "scrape_db_seconds", "models.py の関数ごとのDB操作にかかった秒数", ["function"]
+)
+DOWNLOADED_BYTES = Counter(
+    "scrape_downloaded_bytes_total", "受信した本文のバイト数（展開後）"
+)
+PAGES = Counter(
+    "scrape_pages_total",
+    "処理したページ数（result: ok / error / not_modified / blocked）",
+    ["result"],
+)
+PAGES_PER_SECOND = Gauge(
+    "scrape_pages_per_second",
+    "直近 rate_window 秒（出力の間隔がそれより長ければ前回の出力から）の"
+    "1秒あたりの処理ページ数",
+)
+FRONTIER_PAGES = Gauge("scrape_frontier_pages", "未処理のページ数（取得待ちのキュー）")
+
+
+class _Rate:
+    """total() の直近 window 秒の増え方から1秒あたりの値を求める
+
+    出力するたびに (時刻, 合計) を記録し、window 秒より前の記録は、window 秒
+    以上さかのぼれる1件だけを残して捨てる。
+    """
+
+    def __init__(self, total, window):
+        self._total = total
+        self._window = window
+        self._samples = deque([(time.monotonic(), total())])
+        self._lock = threading.Lock()
+
+    def __call__(self):
+        now, total = time.monotonic(), self._total()
+        with self._lock:
+            self._samples.append((now, total))
+            while len(self._samples) > 2 and now - self._samples[1][0] >= self._window:
+                self._samples.popleft()
+            then, before = self._samples[0]
+        return (total - before) / (now - then) if now > then else 0.0
+
+
+def _pages_total():
+    return sum(value for _, _, _, value in PAGES._samples())
+
+
+PAGES_PER_SECOND.set_function(_Rate(_pages_total, METRICS_CONFIG["rate_window"]))
+
+
+class _MetricsHandler(BaseHTTPRequestHandler):
+    registry = REGISTRY
+
+    def do_GET(self):
+        if self.path.split("?")[0] != "/metrics":
+            self.send_error(404)
+            return
+        body = self.registry.expose().encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", CONTENT_TYPE)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+_server = None
+_server_lock = threading.Lock()
+
+
+def start_metrics_server(port=None, host=None, registry=None):
+    """/metrics を返すHTTPサーバーをバックグラウンドのスレッドで起動し、ポート番号を返す
+
+    port に 0 を渡すと空いているポートを使う。起動済みならそのポートを返す。
+    """
+    global _server
+    port = METRICS_CONFIG["port"] if port is None else port
+    host = host or METRICS_CONFIG["host"]
+    with _server_lock:
+        if _server is None:
+            handler = type(
+                "MetricsHandler",
+                (_MetricsHandler,),
+                {"registry": registry or REGISTRY},
+            )
+            _server = ThreadingHTTPServer((host, port), handler)
+            _server.daemon_threads = True
+            threading.Thread(target=_server.serve_forever, daemon=True).start()
+        return _server.server_address[1]
+
+
+def stop_metrics_server():
+    global _server
+    with _server_lock:
+        server, _server = _server, None
+    if server is not None:
+        server.shutdown()
+        server.server_close()
@@ -1,8 +1,20 @@
 from datetime import datetime
-import mysql.connector
-from config import DB_CONFIG
+import mysql.connector  # noqa: F401 (テストから models.mysql.connector を参照)
+from config import DB_CONFIG, METRICS_CONFIG  # noqa: F401
+from db import get_connection
+import cdx_index
+import content_store
+from metrics import DB_SECONDS, FRONTIER_PAGES, cached, timed
+import hashlib
 import json
-from typing import Optional, Dict, Any, Tuple, Union
+import os
+import socket
+from typing import Optional, Dict, Any, List, Sequence, Tuple, Union
+
+
+def url_hash(url: str) -> bytes:
+    """url_hash カラム（UNHEX(SHA2(url, 256))）と同じ値を計算"""
+    return hashlib.sha256(url.encode("utf-8")).digest()
 
 
 class ScrapedPage:
@@ -18,6 +30,12 @@ class ScrapedPage:
         method="GET",
         processed=False,
         payload=None,
+        document=None,
+        etag=None,
+        last_modified=None,
+        warc_location=None,
+        body_size=None,
+        truncated=False,
     ):
         self.url = url
         self.referrer = referrer
@@ -30,6 +48,15 @@ class ScrapedPage:
         self.processed = False
         self.method = method
         self.payload = payload or {}
+        self.document = document  # 解析済みの ParsedDocument（DBには保存しない）
+        # 次回の条件付きGET（If-None-Match / If-Modified-Since）に使う値
+        self.etag = etag
+        self.last_modified = last_modified
+        # 本文を WARC に保存したときの (ファイル名, オフセット, 長さ)
+        self.warc_location = warc_location
+        # 受信した本文のバイト数と、上限を超えて切り詰めたか（DBには保存しない）
+        self.body_size = body_size
+        self.truncated = truncated
 
     def to_dict(self):
         return {
@@ -44,22 +71,29 @@ class ScrapedPage:
             "processed": self.processed,
             "method": self.method,
             "payload": json.dumps(self.payload),
+            "etag": self.etag,
+            "last_modified": self.last_modified,
+            "warc_file": self.warc_location[0] if self.warc_location else None,
+            "warc_offset": self.warc_location[1] if self.warc_location else None,
+            "warc_length": self.warc_location[2] if self.warc_location else None,
         }
 
 
+# save_page_to_db の更新時に、新しい本文（page_contents の参照・WARC の位置を含む）があるか
+_HAS_NEW_BODY = (
+    "VALUES(content) IS NOT NULL OR VALUES(content_hash) IS NOT NULL"
+    " OR VALUES(warc_file) IS NOT NULL"
+)
+
+
+@timed(DB_SECONDS)
 def save_page_to_db(page):
     """スクレイピング結果をデータベースに保存（POST対応）"""
-    conn = mysql.connector.connect(**DB_CONFIG)
+    conn = get_connection()
     cursor = conn.cursor()
     try:
         # 値の型を安全に変換
         page_dict = page.to_dict()
-        byte_size = (
-            len(page_dict["content"].encode("utf-8", errors="ignore"))
-            if page_dict.get("content")
-            else 0
-        )
-        print(f"{page_dict['url']} page_dict content size: {byte_size} bytes")
         if page_dict.get("hash") is not None and not isinstance(page_dict["hash"], str):
             # bytesやその他の型を文字列化（例: SHA256のbytes → hex文字列）
             page_dict["hash"] = (
@@ -67,8 +101,24 @@ def save_page_to_db(page):
                 if hasattr(page_dict["hash"], "hex")
                 else str(page_dict["hash"])
             )
+        # 本文は page_contents に1回だけ保存し、scraped_pages からはハッシュで参照する
+        # （WARC に保存済みの本文はDBに書かず、位置だけを保存する）
+        # 本文のエンコードは page_contents に保存するときの1回だけにする
+        page_dict["content_hash"] = None
+        byte_size = getattr(page, "body_size", None)
+        if page_dict["warc_file"]:
+            page_dict["content"] = None
+        elif page_dict.get("content") and content_store.dedup_enabled():
+            encoded = page_dict["content"].encode("utf-8", errors="ignore")
+            if byte_size is None:
+                byte_size = len(encoded)
+            page_dict["content_hash"] = content_store.store_content(
+                cursor, page_dict["content"], encoded
+            )
+            page_dict["content"] = None
+        print(f"{page_dict['url']} page_dict content size: {byte_size or 0} bytes")
 
-        sql = """
+        sql = f"""
             INSERT INTO scraped_pages (
                 url,
                 referrer,
@@ -80,7 +130,13 @@ def save_page_to_db(page):
                 error_message,
                 processed,
                 method,
-                payload
+                payload,
+                etag,
+                last_modified,
+                content_hash,
+                warc_file,
+                warc_offset,
+                warc_length
             )
             VALUES (
                 %(url)s,
@@ -93,30 +149,46 @@ def save_page_to_db(page):
                 %(error_message)s,
                 %(processed)s,
                 %(method)s,
-                %(payload)s
+                %(payload)s,
+                %(etag)s,
+                %(last_modified)s,
+                %(content_hash)s,
+                %(warc_file)s,
+                %(warc_offset)s,
+                %(warc_length)s
             )
             ON DUPLICATE KEY UPDATE
                 referrer = COALESCE(VALUES(referrer), referrer),
                 fetched_at = VALUES(fetched_at),
                 -- titleは更新しない
-                content = COALESCE(VALUES(content), content),
+                -- 本文（またはその参照）がない場合は以前の本文を残す
+                content = IF({_HAS_NEW_BODY}, VALUES(content), content),
+                content_hash = IF({_HAS_NEW_BODY}, VALUES(content_hash), content_hash),
+                warc_file = IF({_HAS_NEW_BODY}, VALUES(warc_file), warc_file),
+                warc_offset = IF({_HAS_NEW_BODY}, VALUES(warc_offset), warc_offset),
+                warc_length = IF({_HAS_NEW_BODY}, VALUES(warc_length), warc_length),
                 status_code = COALESCE(VALUES(status_code), status_code),
                 `hash` = COALESCE(VALUES(`hash`), `hash`),
                 error_message = VALUES(error_message),
                 processed = VALUES(processed),
                 method = VALUES(method),
-                payload = VALUES(payload)
+                payload = VALUES(payload),
+                etag = VALUES(etag),
+                last_modified = VALUES(last_modified)
         """
         cursor.execute(sql, page_dict)
         conn.commit()
+        if page_dict["content_hash"] is not None:
+            content_store.mark_stored(page_dict["content_hash"])
     finally:
         cursor.close()
         conn.close()
 
 
+@timed(DB_SECONDS)
 def get_unprocessed_page() -> Optional[Dict[str, Any]]:
     """未処理のページを1件取得（POST対応）"""
-    conn = mysql.connector.connect(**DB_CONFIG)
+    conn = get_connection()
     cursor = conn.cursor(dictionary=True)
     try:
         cursor.execute(
@@ -153,17 +225,194 @@ def get_unprocessed_page() -> Optional[Dict[str, Any]]:
         conn.close()
 
 
+@timed(DB_SECONDS)
+def get_unprocessed_pages(
+    limit: int = 100,
+    worker_id: Optional[str] = None,
+    claim_timeout: int = 600,
+    skip_hosts: Sequence[str] = (),
+) -> List[Dict[str, Any]]:
+    """未処理のページを最大 limit 件まとめて確保して返す（複数ワーカー・複数プロセス対応）
+
+    FOR UPDATE SKIP LOCKED で他ワーカーが選択中の行を飛ばし、
+    1回の UPDATE で claimed_by / claimed_at を記録してから返す。
+    claim_timeout 秒を過ぎた確保は異常終了したワーカーのものとみなして再確保できる。
+    skip_hosts のホスト（crawl-delay の待ち中など）の行は確保しない。
+    """
+    worker_id = worker_id or f"{socket.gethostname()}:{os.getpid()}"
+    host_filter = ""
+    if skip_hosts:
+        # "https://host:port/..." の3つ目の区切りまでがホスト（netloc）
+        placeholders = ", ".join(["%s"] * len(skip_hosts))
+        host_filter = (
+            "AND SUBSTRING_INDEX(SUBSTRING_INDEX(url, '/', 3), '/', -1)"
+            f" NOT IN ({placeholders})"
+        )
+    conn = get_connection()
+    cursor = conn.cursor(dictionary=True)
+    try:
+        conn.start_transaction(isolation_level="READ COMMITTED")
+        cursor.execute(
+            f"""
+            SELECT id, url, referrer, method, payload, etag, last_modified
+            FROM scraped_pages
+            WHERE processed = FALSE
+            AND (claimed_at IS NULL OR claimed_at < NOW() - INTERVAL %s SECOND)
+            {host_filter}
+            ORDER BY id ASC
+            LIMIT %s
+            FOR UPDATE SKIP LOCKED
+            """,
+            (claim_timeout, *skip_hosts, limit),
+        )
+        rows = cursor.fetchall() or []  # type: ignore
+        if not rows:
+            conn.commit()
+            return []
+        ids = [row["id"] for row in rows]  # type: ignore
+        placeholders = ", ".join(["%s"] * len(ids))
+        cursor.execute(
+            "UPDATE scraped_pages SET claimed_by = %s, claimed_at = NOW()"
+            f" WHERE id IN ({placeholders})",
+            (worker_id[:255], *ids),
+        )
+        conn.commit()
+        return [
+            {
+                "id": row["id"],  # type: ignore
+                "url": row["url"],  # type: ignore
+                "referrer": row["referrer"],  # type: ignore
+                "method": (row.get("method") or "GET").upper(),  # type: ignore
+                "payload": (
+                    json.loads(row["payload"])  # type: ignore
+                    if row.get("payload")  # type: ignore
+                    else {}
+                ),
+                "etag": row.get("etag"),  # type: ignore
+                "last_modified": row.get("last_modified"),  # type: ignore
+            }
+            for row in rows
+        ]
+    finally:
+        cursor.close()
+        conn.close()
+
+
+@timed(DB_SECONDS)
+def release_pages(urls_or_ids: Sequence[Union[int, str]]):
+    """確保したまま処理しなかったページを手放し、すぐに再確保できるようにする
+
+    id と url の混在可。処理済みの行には触れない。
+    """
+    by_column: Dict[str, List[Any]] = {"id": [], "url_hash": []}
+    for key in urls_or_ids:
+        if isinstance(key, int):
+            by_column["id"].append(key)
+        else:
+            by_column["url_hash"].append(url_hash(key))
+    if not any(by_column.values()):
+        return
+
+    conn = get_connection()
+    cursor = conn.cursor()
+    try:
+        for column, targets in by_column.items():
+            if not targets:
+                continue
+            placeholders = ", ".join(["%s"] * len(targets))
+            cursor.execute(
+                "UPDATE scraped_pages SET claimed_by = NULL, claimed_at = NULL"
+                f" WHERE {column} IN ({placeholders}) AND processed = FALSE",
+                tuple(targets),
+            )
+        conn.commit()
+    finally:
+        cursor.close()
+        conn.close()
+
+
+@timed(DB_SECONDS)
+def mark_pages_as_processed(
+    urls_or_ids: Sequence[Union[int, str]],
+    errors: Optional[Union[Sequence[Optional[str]], Dict[Any, Optional[str]]]] = None,
+):
+    """複数ページをまとめて処理済みにする（id と url の混在可）
+
+    errors は urls_or_ids と同じ順のリスト、またはキーごとの辞書で、
+    省略時はエラーメッセージを NULL にする。id 指定分と url 指定分で
+    それぞれ1回の UPDATE を実行する。
+    """
+    if errors is None:
+        messages = {}
+    elif isinstance(errors, dict):
+        messages = errors
+    else:
+        messages = dict(zip(urls_or_ids, errors))
+
+    # url 指定分は url_hash で検索する
+    by_column: Dict[str, Dict[Any, Optional[str]]] = {"id": {}, "url_hash": {}}
+    for key in urls_or_ids:
+        if isinstance(key, int):
+            by_column["id"][key] = messages.get(key)
+        else:
+            by_column["url_hash"][url_hash(key)] = messages.get(key)
+    if not any(by_column.values()):
+        return
+
+    conn = get_connection()
+    cursor = conn.cursor()
+    try:
+        for column, targets in by_column.items():
+            if not targets:
+                continue
+            cases = " ".join(["WHEN %s THEN %s"] * len(targets))
+            placeholders = ", ".join(["%s"] * len(targets))
+            params: List[Any] = []
+            for key, message in targets.items():
+                params.extend((key, message))
+            params.extend(targets.keys())
+            cursor.execute(
+                "UPDATE scraped_pages"
+                f" SET processed = TRUE, error_message = CASE {column} {cases} END,"
+                " claimed_by = NULL, claimed_at = NULL"
+                f" WHERE {column} IN ({placeholders})",
+                tuple(params),
+            )
+        conn.commit()
+    finally:
+        cursor.close()
+        conn.close()
+
+
+@timed(DB_SECONDS)
 def mark_page_as_processed(url, error_message=None):
     """ページを処理済みとしてマーク"""
-    conn = mysql.connector.connect(**DB_CONFIG)
+    conn = get_connection()
     cursor = conn.cursor()
 
     try:
         cursor.execute(
             "UPDATE scraped_pages"
-            " SET processed = TRUE, error_message = %s"
-            " WHERE url = %s",
-            (error_message, url),
+            " SET processed = TRUE, error_message = %s,"
+            " claimed_by = NULL, claimed_at = NULL"
+            " WHERE url_hash = %s",
+            (error_message, url_hash(url)),
+        )
+        conn.commit()
+    finally:
+        cursor.close()
+        conn.close()
+
+
+@timed(DB_SECONDS)
+def touch_page(url: str):
+    """304 Not Modified だったページの取得日時だけを更新する（本文・ハッシュはそのまま）"""
+    conn = get_connection()
+    cursor = conn.cursor()
+    try:
+        cursor.execute(
+            "UPDATE scraped_pages SET fetched_at = %s WHERE url_hash = %s",
+            (datetime.now(), url_hash(url)),
         )
         conn.commit()
     finally:
@@ -171,9 +420,10 @@ def mark_page_as_processed(url, error_message=None):
         conn.close()
 
 
+@timed(DB_SECONDS)
 def get_page_counts():
     """未処理件数と処理済み件数を返す"""
-    conn = mysql.connector.connect(**DB_CONFIG)
+    conn = get_connection()
     cursor = conn.cursor()
     try:
         cursor.execute("SELECT COUNT(*) FROM scraped_pages WHERE processed = FALSE")
@@ -192,37 +442,132 @@ def get_page_counts():
         conn.close()
 
 
+@timed(DB_SECONDS)
 def reset_all_processed():
     """全レコードの processed を FALSE にする"""
-    conn = mysql.connector.connect(**DB_CONFIG)
+    conn = get_connection()
     cursor = conn.cursor()
     try:
-        cursor.execute("UPDATE scraped_pages SET processed = FALSE")
+        # 直前の実行の確保も解除し、claim_timeout を待たずに確保できるようにする
+        cursor.execute(
+            "UPDATE scraped_pages"
+            " SET processed = FALSE, claimed_by = NULL, claimed_at = NULL"
+        )
         conn.commit()
     finally:
         cursor.close()
         conn.close()
 
 
+@timed(DB_SECONDS)
+def find_existing_urls(urls, chunk_size=1000) -> set:
+    """urls のうち scraped_pages に登録済みのURLの集合を返す（url_hash の IN で検索）"""
+    by_hash = {url_hash(url): url for url in urls}
+    if not by_hash:
+        return set()
+    hashes = list(by_hash)
+    conn = get_connection()
+    cursor = conn.cursor()
+    try:
+        existing = set()
+        for start in range(0, len(hashes), chunk_size):
+            end = start + chunk_size
+            chunk = hashes[start:end]
+            placeholders = ", ".join(["%s"] * len(chunk))
+            cursor.execute(
+                "SELECT url_hash FROM scraped_pages"
+                f" WHERE url_hash IN ({placeholders})",
+                tuple(chunk),
+            )
+            for (value,) in cursor.fetchall():  # type: ignore
+                existing.add(by_hash[bytes(value)])
+        return existing
+    finally:
+        cursor.close()
+        conn.close()
+
+
+@timed(DB_SECONDS)
 def exists_in_db(url: str) -> bool:
     """指定URLが scraped_pages に存在するかを返す"""
-    conn = mysql.connector.connect(**DB_CONFIG)
+    conn = get_connection()
     cursor = conn.cursor()
     try:
-        cursor.execute("SELECT 1 FROM scraped_pages WHERE url = %s LIMIT 1", (url,))
+        cursor.execute(
+            "SELECT 1 FROM scraped_pages WHERE url_hash = %s LIMIT 1", (url_hash(url),)
+        )
         return cursor.fetchone() is not None
     finally:
         cursor.close()
         conn.close()
 
 
-def get_page_by_url(url: str):
-    """指定URLのページ情報を取得"""
-    conn = mysql.connector.connect(**DB_CONFIG)
+@timed(DB_SECONDS)
+def save_links_to_db(links, referrer=None, chunk_size=1000) -> int:
+    """ページ内のリンクをまとめて未処理ページとして登録し、新規登録件数を返す
+
+    links は (url, title) のリスト。同じURLは最初のものだけを残し、
+    複数行 INSERT で一括登録する（既存URLは更新しない）。
+    """
+    unique: Dict[str, Any] = {}
+    for url, title in links:
+        if url and url not in unique:
+            unique[url] = title
+    if not unique:
+        return 0
+
+    now = datetime.now()
+    rows = [
+        (url, referrer, now, title, False, "GET", "{}") for url, title in unique.items()
+    ]
+    conn = get_connection()
+    cursor = conn.cursor()
+    try:
+        inserted = 0
+        for start in range(0, len(rows), chunk_size):
+            end = start + chunk_size
+            chunk = rows[start:end]
+            placeholders = ", ".join(["(%s, %s, %s, %s, %s, %s, %s)"] * len(chunk))
+            cursor.execute(
+                "INSERT INTO scraped_pages"
+                " (url, referrer, fetched_at, title, processed, method, payload)"
+                f" VALUES {placeholders}"
+                " ON DUPLICATE KEY UPDATE id = id",
+                tuple(value for row in chunk for value in row),
+            )
+            inserted += max(cursor.rowcount, 0)
+        conn.commit()
+        return inserted
+    finally:
+        cursor.close()
+        conn.close()
+
+
+# 本文が page_contents にある行はそちらの本文を content として返す
+# （圧縮して保存した本文は content_body で受け取り、content_store.decode_row で展開する）
+_SELECT_PAGE = (
+    "SELECT sp.*, COALESCE(pc.content, sp.content) AS content,"
+    " pc.body AS content_body"
+    " FROM scraped_pages sp"
+    " LEFT JOIN page_contents pc ON pc.`hash` = sp.content_hash"
+)
+
+
+@timed(DB_SECONDS)
+def get_page_by_url(url: str, from_archive: bool = False):
+    """指定URLのページ情報を取得
+
+    from_archive=True なら DB を使わず、CDX 索引と WARC ファイルから最新の取得結果を返す。
+    """
+    if from_archive:
+        return cdx_index.get_archived_page(url)
+    conn = get_connection()
     cursor = conn.cursor(dictionary=True)
     try:
-        cursor.execute("SELECT * FROM scraped_pages WHERE url = %s LIMIT 1", (url,))
-        row = cursor.fetchone()  # type: ignore
+        cursor.execute(
+            f"{_SELECT_PAGE} WHERE sp.url_hash = %s LIMIT 1", (url_hash(url),)
+        )
+        row = content_store.decode_row(cursor.fetchone())  # type: ignore
         if row:
             row: Optional[Dict[str, Any]] = row
             if row.get("payload"):
@@ -234,21 +579,45 @@ def get_page_by_url(url: str):
         conn.close()
 
 
+@timed(DB_SECONDS)
 def delete_page_by_url(url: str):
     """指定URLのページ情報を削除"""
-    conn = mysql.connector.connect(**DB_CONFIG)
+    conn = get_connection()
+    cursor = conn.cursor()
+    try:
+        cursor.execute(
+            "DELETE FROM scraped_pages WHERE url_hash = %s", (url_hash(url),)
+        )
+        conn.commit()
+    finally:
+        cursor.close()
+        conn.close()
+
+
+@timed(DB_SECONDS)
+def delete_unreferenced_contents() -> int:
+    """どのページからも参照されていない本文を page_contents から削除し、件数を返す"""
+    conn = get_connection()
     cursor = conn.cursor()
     try:
-        cursor.execute("DELETE FROM scraped_pages WHERE url = %s", (url,))
+        cursor.execute(
+            "DELETE pc FROM page_contents pc"
+            " LEFT JOIN scraped_pages sp ON sp.content_hash = pc.`hash`"
+            " WHERE sp.id IS NULL"
+        )
+        deleted = max(cursor.rowcount, 0)
         conn.commit()
+        content_store.forget_stored()
+        return deleted
     finally:
         cursor.close()
         conn.close()
 
 
+@timed(DB_SECONDS)
 def update_page_content(url: str, content: str, hash_value):
     """指定URLのページ内容とハッシュを更新"""
-    conn = mysql.connector.connect(**DB_CONFIG)
+    conn = get_connection()
     cursor = conn.cursor()
     try:
         hash_str = (
@@ -256,31 +625,42 @@ def update_page_content(url: str, content: str, hash_value):
             if hash_value is not None
             else None
         )
+        content_key = None
+        if content and content_store.dedup_enabled():
+            content_key = content_store.store_content(cursor, content)
+            content = None
         cursor.execute(
-            "UPDATE scraped_pages SET content = %s, `hash` = %s WHERE url = %s",
-            (content, hash_str, url),
+            "UPDATE scraped_pages SET content = %s, content_hash = %s, `hash` = %s"
+            " WHERE url_hash = %s",
+            (content, content_key, hash_str, url_hash(url)),
         )
         conn.commit()
+        if content_key is not None:
+            content_store.mark_stored(content_key)
     finally:
         cursor.close()
         conn.close()
 
 
+@timed(DB_SECONDS)
 def clear_all_pages():
     """scraped_pages テーブルの全レコードを削除"""
-    conn = mysql.connector.connect(**DB_CONFIG)
+    conn = get_connection()
     cursor = conn.cursor()
     try:
         cursor.execute("DELETE FROM scraped_pages")
+        cursor.execute("DELETE FROM page_contents")
         conn.commit()
+        content_store.forget_stored()
     finally:
         cursor.close()
         conn.close()
 
 
+@timed(DB_SECONDS)
 def count_pages():
     """scraped_pages テーブルの全レコード数を返す"""
-    conn = mysql.connector.connect(**DB_CONFIG)
+    conn = get_connection()
     cursor = conn.cursor()
     try:
         cursor.execute("SELECT COUNT(*) FROM scraped_pages")
@@ -293,9 +673,10 @@ def count_pages():
         conn.close()
 
 
+@timed(DB_SECONDS)
 def get_all_urls():
     """scraped_pages テーブルの全URLをリストで返す"""
-    conn = mysql.connector.connect(**DB_CONFIG)
+    conn = get_connection()
     cursor = conn.cursor()
     try:
         cursor.execute("SELECT url FROM scraped_pages")
@@ -311,9 +692,48 @@ def get_all_urls():
         conn.close()
 
 
+@timed(DB_SECONDS)
+def stream_urls(min_id: int = 0, batch_size: int = 10000):
+    """id が min_id より大きい行の (id, url) を id 順に少しずつ読み出す
+
+    結果を一度に読み込まないよう、非バッファカーソルで batch_size 件ずつ取得する。
+    """
+    conn = get_connection()
+    cursor = conn.cursor(buffered=False)
+    try:
+        cursor.execute(
+            "SELECT id, url FROM scraped_pages WHERE id > %s ORDER BY id",
+            (min_id,),
+        )
+        while True:
+            rows = cursor.fetchmany(batch_size)
+            if not rows:
+                break
+            for row in rows:
+                yield row[0], row[1]
+    finally:
+        cursor.close()
+        conn.close()
+
+
+@timed(DB_SECONDS)
+def get_max_page_id() -> int:
+    """scraped_pages の最大 id を返す（空なら 0）"""
+    conn = get_connection()
+    cursor = conn.cursor()
+    try:
+        cursor.execute("SELECT COALESCE(MAX(id), 0) FROM scraped_pages")
+        row = cursor.fetchone()
+        return int(row[0]) if row else 0  # type: ignore
+    finally:
+        cursor.close()
+        conn.close()
+
+
+@timed(DB_SECONDS)
 def get_processed_urls():
     """処理済みのURLをリストで返す"""
-    conn = mysql.connector.connect(**DB_CONFIG)
+    conn = get_connection()
     cursor = conn.cursor()
     try:
         cursor.execute("SELECT url FROM scraped_pages WHERE processed = TRUE")
@@ -329,9 +749,10 @@ def get_processed_urls():
         conn.close()
 
 
+@timed(DB_SECONDS)
 def get_unprocessed_urls():
     """未処理のURLをリストで返す"""
-    conn = mysql.connector.connect(**DB_CONFIG)
+    conn = get_connection()
     cursor = conn.cursor()
     try:
         cursor.execute("SELECT url FROM scraped_pages WHERE processed = FALSE")
@@ -347,38 +768,48 @@ def get_unprocessed_urls():
         conn.close()
 
 
+@timed(DB_SECONDS)
 def mark_all_as_processed():
     """全ページを処理済みとしてマーク"""
-    conn = mysql.connector.connect(**DB_CONFIG)
+    conn = get_connection()
     cursor = conn.cursor()
     try:
-        cursor.execute("UPDATE scraped_pages SET processed = TRUE")
+        cursor.execute(
+            "UPDATE scraped_pages"
+            " SET processed = TRUE, claimed_by = NULL, claimed_at = NULL"
+        )
         conn.commit()
     finally:
         cursor.close()
         conn.close()
 
 
+@timed(DB_SECONDS)
 def mark_all_as_unprocessed():
     """全ページを未処理としてマーク"""
-    conn = mysql.connector.connect(**DB_CONFIG)
+    conn = get_connection()
     cursor = conn.cursor()
     try:
-        cursor.execute("UPDATE scraped_pages SET processed = FALSE")
+        # 直前の実行の確保も解除し、claim_timeout を待たずに確保できるようにする
+        cursor.execute(
+            "UPDATE scraped_pages"
+            " SET processed = FALSE, claimed_by = NULL, claimed_at = NULL"
+        )
         conn.commit()
     finally:
         cursor.close()
         conn.close()
 
 
+@timed(DB_SECONDS)
 def update_error_message(url: str, error_message: str):
     """指定URLのエラーメッセージを更新"""
-    conn = mysql.connector.connect(**DB_CONFIG)
+    conn = get_connection()
     cursor = conn.cursor()
     try:
         cursor.execute(
-            "UPDATE scraped_pages SET error_message = %s WHERE url = %s",
-            (error_message, url),
+            "UPDATE scraped_pages SET error_message = %s WHERE url_hash = %s",
+            (error_message, url_hash(url)),
         )
         conn.commit()
     finally:
@@ -386,9 +817,10 @@ def update_error_message(url: str, error_message: str):
         conn.close()
 
 
+@timed(DB_SECONDS)
 def get_error_messages():
     """全ページのエラーメッセージを取得"""
-    conn = mysql.connector.connect(**DB_CONFIG)
+    conn = get_connection()
     cursor = conn.cursor(dictionary=True)
     try:
         cursor.execute(
@@ -403,9 +835,10 @@ def get_error_messages():
         conn.close()
 
 
+@timed(DB_SECONDS)
 def clear_error_messages():
     """全ページのエラーメッセージをクリア"""
-    conn = mysql.connector.connect(**DB_CONFIG)
+    conn = get_connection()
     cursor = conn.cursor()
     try:
         cursor.execute("UPDATE scraped_pages SET error_message = NULL")
@@ -415,9 +848,10 @@ def clear_error_messages():
         conn.close()
 
 
+@timed(DB_SECONDS)
 def get_page_statistics():
     """ページの統計情報を取得"""
-    conn = mysql.connector.connect(**DB_CONFIG)
+    conn = get_connection()
     cursor = conn.cursor(dictionary=True)
     try:
         cursor.execute(
@@ -432,8 +866,9 @@ def get_page_statistics():
                 CASE WHEN processed = FALSE
                 THEN 1 ELSE 0 END
                 ) AS unprocessed_pages,
-                AVG(LENGTH(content)) AS avg_content_size
-            FROM scraped_pages
+                AVG(COALESCE(pc.size, LENGTH(sp.content))) AS avg_content_size
+            FROM scraped_pages sp
+            LEFT JOIN page_contents pc ON pc.`hash` = sp.content_hash
         """
         )
         return cursor.fetchone()
@@ -442,21 +877,23 @@ def get_page_statistics():
         conn.close()
 
 
+@timed(DB_SECONDS)
 def get_page_by_id(page_id: int):
     """指定IDのページ情報を取得"""
-    conn = mysql.connector.connect(**DB_CONFIG)
+    conn = get_connection()
     cursor = conn.cursor(dictionary=True)
     try:
-        cursor.execute("SELECT * FROM scraped_pages WHERE id = %s", (page_id,))
-        return cursor.fetchone()
+        cursor.execute(f"{_SELECT_PAGE} WHERE sp.id = %s", (page_id,))
+        return content_store.decode_row(cursor.fetchone())  # type: ignore
     finally:
         cursor.close()
         conn.close()
 
 
+@timed(DB_SECONDS)
 def get_page_count():
     """scraped_pages テーブルの全レコード数を返す"""
-    conn = mysql.connector.connect(**DB_CONFIG)
+    conn = get_connection()
     cursor = conn.cursor()
     try:
         cursor.execute("SELECT COUNT(*) FROM scraped_pages")
@@ -464,3 +901,22 @@ def get_page_count():
     finally:
         cursor.close()
         conn.close()
+
+
+def _count_unprocessed() -> int:
+    """未処理件数（メトリクス用。クロールのDB時間に混ざらないよう @timed を付けない）"""
+    conn = get_connection()
+    cursor = conn.cursor()
+    try:
+        cursor.execute("SELECT COUNT(*) FROM scraped_pages WHERE processed = FALSE")
+        row = cursor.fetchone()
+        return row[0] if row else 0
+    finally:
+        cursor.close()
+        conn.close()
+
+
+# 取得待ちのページ数。/metrics を読むたびにDBに問い合わせないよう一定時間使い回す
+FRONTIER_PAGES.set_function(
+    cached(_count_unprocessed, METRICS_CONFIG["frontier_interval"])
+)
@@ -0,0 +1,118 @@
+import threading
+import time
+from urllib.parse import urlparse
+
+
+class HostScheduler:
+    """ホストごとの次回取得可能時刻を管理する
+
+    crawl-delay はそのホストへのリクエスト間隔にだけ適用し、
+    他のホストのURLは待たずに取得できるようにする。
+    ワーカー（スレッド）間で共有して使う。
+    """
+
+    def __init__(self, clock=time.monotonic):
+        self._clock = clock
+        self._ready = {}  # ホスト -> 次に取得してよい時刻
+        self._postponed = {}  # robots.txt を確認できないホスト -> 再開する時刻
+        self._lock = threading.Lock()
+
+    def wait_time(self, host) -> float:
+        """host の取得可能時刻までの秒数（0 なら今すぐ取得できる）"""
+        with self._lock:
+            return max(0.0, self._ready.get(host, 0.0) - self._clock())
+
+    def reserve(self, host, delay) -> float:
+        """host への次のリクエスト枠を確保し、その時刻までの待ち秒数を返す
+
+        確保した時刻から delay 秒後までは同じホストの次の枠を渡さない。
+        """
+        with self._lock:
+            now = self._clock()
+            start = max(now, self._ready.get(host, now))
+            self._ready[host] = start + max(0.0, float(delay or 0))
+            self._prune(now)
+            return start - now
+
+    def try_reserve(self, host, delay) -> float:
+        """今すぐ取得できるなら枠を確保して 0 を返す
+
+        取得可能時刻がまだ先なら枠を確保せず、その時刻までの秒数を返す。
+        """
+        with self._lock:
+            now = self._clock()
+            ready = self._ready.get(host, now)
+            if ready > now:
+                return ready - now
+            self._ready[host] = now + max(0.0, float(delay or 0))
+            self._prune(now)
+            return 0.0
+
+    def postpone(self, host, seconds):
+        """host を seconds 秒間取得しない（robots.txt を確認できないときなど）"""
+        with self._lock:
+            now = self._clock()
+            until = now + max(0.0, float(seconds or 0))
+            self._ready[host] = max(self._ready.get(host, now), until)
+            self._postponed[host] = until
+
+    def postponed_hosts(self) -> set:
+        """postpone で取得を止めているホスト（期限を過ぎたものは除く）"""
+        with self._lock:
+            now = self._clock()
+            self._postponed = {h: t for h, t in self._postponed.items() if t > now}
+            return set(self._postponed)
+
+    def busy_hosts(self) -> list:
+        """取得可能時刻がまだ来ていないホストを、待ちの長い順にすべて返す
+
+        確保から除くホストの一覧に使うので件数で切り詰めない（漏れたホストの行は
+        確保しては手放すことを繰り返してしまう）。
+        """
+        with self._lock:
+            now = self._clock()
+            busy = [(ready, host) for host, ready in self._ready.items() if ready > now]
+        busy.sort(reverse=True)
+        return [host for _, host in busy]
+
+    def pick(self, rows):
+        """rows から最も早く取得できるホストの行を取り出して返す
+
+        待たずに取得できる行があればその中で先頭のものを返す。
+        """
+        with self._lock:
+            now = self._clock()
+            best_index = 0
+            best_ready = None
+            for index, row in enumerate(rows):
+                ready = self._ready.get(host_of(row["url"]), now)
+                if ready <= now:
+                    best_index = index
+                    break
+                if best_ready is None or ready < best_ready:
+                    best_index, best_ready = index, ready
+            return rows.pop(best_index)
+
+    def _prune(self, now):
+        # 取得可能時刻を過ぎたホストは覚えておく必要がない
+        if len(self._ready) > 10000:
+            self._ready = {h: t for h, t in self._ready.items() if t > now}
+
+
+def host_of(url) -> str:
+    return urlparse(url).netloc
+
+
+_scheduler = HostScheduler()
+
+
+def get_host_scheduler() -> HostScheduler:
+    """ワーカー間で共有するスケジューラーを返す"""
+    return _scheduler
+
+
+def wait_for_host(url, delay):
+    """url のホストの取得枠を確保し、枠の時刻まで待つ"""
+    wait = _scheduler.reserve(host_of(url), delay)
+    if wait > 0:
+        time.sleep(wait)
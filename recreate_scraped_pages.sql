@@ -5,15 +5,26 @@ DROP TABLE IF EXISTS scraped_pages;
 CREATE TABLE scraped_pages (
     id INT AUTO_INCREMENT PRIMARY KEY,
     url TEXT NOT NULL, -- 実際に取得したページのURL
+    url_hash BINARY(32) AS (UNHEX(SHA2(url, 256))) STORED, -- URLのSHA-256
     referrer TEXT, -- リンク元のURL（任意）
     method VARCHAR(10) NOT NULL DEFAULT 'GET', -- HTTPメソッド（GET/POSTなど）
     payload JSON DEFAULT NULL, -- POSTデータなどをJSON形式で保存
     fetched_at DATETIME, -- 取得日時
     title TEXT, -- ページタイトル（最初に取得したものを保持）
     content LONGTEXT, -- ページ本文
+    content_hash BINARY(32) DEFAULT NULL, -- page_contents.hash（本文はそちらに保存）
+    warc_file VARCHAR(255) DEFAULT NULL, -- 本文を保存した WARC ファイル名
+    warc_offset BIGINT DEFAULT NULL, -- WARC ファイル内のレコードの位置
+    warc_length INT DEFAULT NULL, -- レコード（gzip メンバー）のバイト数
     status_code INT, -- HTTPステータスコード
     hash TEXT, -- 内容のハッシュ値（SHA-256など）
+    etag VARCHAR(255) DEFAULT NULL, -- 応答の ETag（再取得時の If-None-Match）
+    last_modified VARCHAR(64) DEFAULT NULL, -- 応答の Last-Modified（再取得時の If-Modified-Since）
     error_message TEXT, -- エラー内容（取得失敗時）
     processed BOOLEAN DEFAULT FALSE, -- 取得済みかどうかのフラグ
-    UNIQUE KEY uniq_url (url(255)) -- URLをユニーク化（先頭255文字）
+    claimed_by VARCHAR(255) DEFAULT NULL, -- 処理中のワーカーID
+    claimed_at DATETIME DEFAULT NULL, -- ワーカーが確保した日時
+    UNIQUE KEY uniq_url_hash (url_hash), -- URL全体でユニーク化
+    KEY idx_content_hash (content_hash), -- 本文の参照元の検索用
+    KEY idx_processed_id (processed, id) -- 未処理ページの確保用
 ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4;
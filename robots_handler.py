@@ -1,108 +1,384 @@
-from urllib.robotparser import RobotFileParser
 from urllib.parse import urlparse
+from collections import OrderedDict, namedtuple
 import datetime
-import mysql.connector
-from config import DB_CONFIG
-from urllib.error import URLError
+import json
+import re
+import threading
+import time
+import mysql.connector  # noqa: F401 (テストから参照)
+import requests
+import http_client
+import metrics
+from config import ROBOTS_CONFIG
+from db import get_connection
+from robots_parser import RobotsMatcher, parse_robots_txt, select_group
 
+RobotsResponse = namedtuple(
+    "RobotsResponse", ["status", "text", "etag", "last_modified", "max_age"]
+)
 
-def fetch_and_store_robots(domain, user_agent="MyScraperBot"):
-    """robots.txtを取得してDBに保存"""
-    robots_url = f"https://{domain}/robots.txt"
-    rp = RobotFileParser()
-    rp.set_url(robots_url)
+_MAX_AGE = re.compile(r"max-age\s*=\s*(\d+)", re.I)
 
-    conn = mysql.connector.connect(**DB_CONFIG)
-    cursor = conn.cursor()
 
+class RobotsUnreachable(Exception):
+    """robots.txt がサーバーエラー・時間切れなどで取得できなかった
+
+    retry_after は再取得を試みるまでの秒数（わかる場合）。
+    """
+
+    def __init__(self, message, retry_after=None):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+def _read_capped(response, max_bytes, deadline):
+    """本文を max_bytes まで読む（超えた分は無視する）"""
+    body = bytearray()
+    timed_out = RobotsUnreachable("robots.txt の取得が時間切れになりました")
+    for chunk in http_client.iter_body(response, deadline, 8192, timed_out):
+        body += chunk
+        if len(body) >= max_bytes:
+            # 途中で切れた最終行は捨てる（改行がなければ全体を捨てる）
+            keep = body.rfind(b"\n", 0, max_bytes) + 1
+            del body[keep:]
+            break
+    return bytes(body).decode("utf-8", errors="replace").lstrip("\ufeff")
+
+
+def download_robots_txt(robots_url, etag=None, last_modified=None):
+    """共有HTTPクライアントで robots.txt を取得して RobotsResponse を返す
+
+    ETag / Last-Modified があれば条件付きで取得し、変更がなければ status=304。
+    4xx（ファイルがない・見られない）は RFC 9309 に従い「制限なし」として空文字を返す。
+    5xx と接続・時間切れのエラーは RobotsUnreachable を送出する。
+    """
+    headers = {}
+    if etag:
+        headers["If-None-Match"] = etag
+    if last_modified:
+        headers["If-Modified-Since"] = last_modified
+    timeout = ROBOTS_CONFIG["timeout"]
+    deadline = time.monotonic() + timeout
     try:
-        rp.read()
-        disallow = "\n".join(["*"] if getattr(rp, "disallow_all", False) else [])
-        allow = "\n".join(["*"] if getattr(rp, "allow_all", False) else [])
-        delay = rp.crawl_delay(user_agent)
+        response = http_client.get(
+            robots_url, headers=headers, timeout=timeout, stream=True
+        )
+        try:
+            if response.status_code >= 500:
+                raise RobotsUnreachable(f"HTTP {response.status_code}")
+            match = _MAX_AGE.search(response.headers.get("Cache-Control") or "")
+            max_age = int(match.group(1)) if match else None
+            if response.status_code == 304:
+                return RobotsResponse(304, None, etag, last_modified, max_age)
+            text = ""
+            if response.status_code < 400:
+                text = _read_capped(response, ROBOTS_CONFIG["max_bytes"], deadline)
+            return RobotsResponse(
+                response.status_code,
+                text,
+                response.headers.get("ETag"),
+                response.headers.get("Last-Modified"),
+                max_age,
+            )
+        finally:
+            response.close()
+    except requests.RequestException as e:
+        raise RobotsUnreachable(str(e)) from e
 
-        now = datetime.datetime.now(datetime.UTC)
-        expires = now + datetime.timedelta(hours=24)
 
-        sql = """
-            INSERT INTO robots_rules
-            (domain, user_agent, disallow, allow, crawl_delay, fetched_at, expires_at)
-            VALUES (%s, %s, %s, %s, %s, %s, %s)
-            ON DUPLICATE KEY UPDATE
-            disallow = VALUES(disallow),
-            allow = VALUES(allow),
-            crawl_delay = VALUES(crawl_delay),
-            fetched_at = VALUES(fetched_at),
-            expires_at = VALUES(expires_at)
-        """
-
-        cursor.execute(sql, (domain, user_agent, disallow, allow, delay, now, expires))
-        conn.commit()
+def _expires_after(now, max_age):
+    """Cache-Control: max-age（なければ max_ttl）を上下限に収めた有効期限"""
+    ttl = ROBOTS_CONFIG["max_ttl"] if max_age is None else max_age
+    ttl = min(max(ttl, ROBOTS_CONFIG["min_ttl"]), ROBOTS_CONFIG["max_ttl"])
+    return now + datetime.timedelta(seconds=ttl)
 
-    except URLError as e:
-        print(f"[WARN] robots.txt取得失敗: {e}")
-        return
 
+def _get_stored_robots(domain, user_agent):
+    """再検証用に保存済みの ETag / Last-Modified / 連続失敗回数を返す"""
+    conn = get_connection()
+    cursor = conn.cursor(dictionary=True)
+    try:
+        cursor.execute(
+            """
+            SELECT etag, last_modified, fail_count FROM robots_rules
+            WHERE domain = %s AND user_agent = %s
+        """,
+            (domain, user_agent),
+        )
+        row = cursor.fetchone()
+        return dict(row) if isinstance(row, dict) else None
     finally:
         cursor.close()
         conn.close()
 
 
-def check_robots_rules(url, user_agent="MyScraperBot"):
-    """robots.txtのルールをチェック"""
-    conn = mysql.connector.connect(**DB_CONFIG)
-    cursor = conn.cursor(dictionary=True)
+def _execute(sql, params):
+    conn = get_connection()
+    cursor = conn.cursor()
+    try:
+        cursor.execute(sql, params)
+        conn.commit()
+    finally:
+        cursor.close()
+        conn.close()
+
 
+def fetch_and_store_robots(domain, user_agent="MyScraperBot"):
+    """robots.txtを取得してDBに保存
+
+    全 user-agent グループのルールを rule_groups に、このクローラーに
+    適用されるグループの Disallow / Allow を disallow / allow（改行区切り）に保存する。
+    保存済みの ETag / Last-Modified で再検証し、304 なら expires_at だけ延ばす。
+    取得できなければ失敗回数に応じて再取得までの間隔を延ばす（以前のルールは残す）。
+    以前のルールがなければ RFC 9309 に従いサイト全体を不許可として記録し、
+    再取得できるまでそのドメインのページは取得しない。
+    """
+    robots_url = f"https://{domain}/robots.txt"
+    stored = _get_stored_robots(domain, user_agent) or {}
+    now = datetime.datetime.now(datetime.UTC)
     try:
-        domain = urlparse(url).netloc
+        result = download_robots_txt(
+            robots_url, stored.get("etag"), stored.get("last_modified")
+        )
+    except RobotsUnreachable as e:
+        fail_count = (stored.get("fail_count") or 0) + 1
+        backoff = min(
+            ROBOTS_CONFIG["backoff_base"] * 2 ** (fail_count - 1),
+            ROBOTS_CONFIG["max_ttl"],
+        )
+        print(f"[WARN] robots.txt取得失敗（{backoff}秒後に再試行）: {e}")
+        # 以前のルールがあればそのまま使い、なければ全体を不許可として扱う
+        _execute(
+            """
+            INSERT INTO robots_rules
+            (domain, user_agent, disallow, allow, fetched_at, expires_at, fail_count)
+            VALUES (%s, %s, '/', '', %s, %s, %s)
+            ON DUPLICATE KEY UPDATE
+            expires_at = VALUES(expires_at),
+            fail_count = VALUES(fail_count)
+        """,
+            (
+                domain,
+                user_agent,
+                now,
+                now + datetime.timedelta(seconds=backoff),
+                fail_count,
+            ),
+        )
+        return
 
-        # robots_rulesテーブルをチェック
-        cursor.execute(
+    expires = _expires_after(now, result.max_age)
+    if result.status == 304:
+        _execute(
             """
-            SELECT * FROM robots_rules
+            UPDATE robots_rules SET expires_at = %s, fail_count = 0
             WHERE domain = %s AND user_agent = %s
-            AND expires_at > NOW()
         """,
-            (domain, user_agent),
+            (expires, domain, user_agent),
         )
+        return
 
-        rules = cursor.fetchone()
-
-        # ルールが存在しないか期限切れの場合は更新
-        if not rules:
-            fetch_and_store_robots(domain, user_agent)
-            cursor.execute(
-                """
-                SELECT * FROM robots_rules
-                WHERE domain = %s AND user_agent = %s
-            """,
-                (domain, user_agent),
-            )
-            rules = cursor.fetchone()
+    groups = parse_robots_txt(result.text)
+    group = select_group(groups, user_agent)
+    disallow = "\n".join(p for kind, p in group["rules"] if kind == "disallow")
+    allow = "\n".join(p for kind, p in group["rules"] if kind == "allow")
+    delay = group["crawl_delay"]
+
+    sql = """
+        INSERT INTO robots_rules
+        (domain, user_agent, disallow, allow, rule_groups, crawl_delay,
+         etag, last_modified, fail_count, fetched_at, expires_at)
+        VALUES (%s, %s, %s, %s, %s, %s, %s, %s, 0, %s, %s)
+        ON DUPLICATE KEY UPDATE
+        disallow = VALUES(disallow),
+        allow = VALUES(allow),
+        rule_groups = VALUES(rule_groups),
+        crawl_delay = VALUES(crawl_delay),
+        etag = VALUES(etag),
+        last_modified = VALUES(last_modified),
+        fail_count = 0,
+        fetched_at = VALUES(fetched_at),
+        expires_at = VALUES(expires_at)
+    """
+    _execute(
+        sql,
+        (
+            domain,
+            user_agent,
+            disallow,
+            allow,
+            json.dumps(groups, ensure_ascii=False),
+            delay,
+            result.etag,
+            result.last_modified,
+            now,
+            expires,
+        ),
+    )
+
+
+class RobotsCache:
+    """(domain, user_agent) ごとの robots.txt ルールを保持する LRU キャッシュ
 
-        if not rules:
-            return True, 0  # ルールが取得できない場合はデフォルトで許可
+    エントリは DB の expires_at までの秒数だけ有効。期限切れのまま再取得に
+    失敗したドメインやルールを読めなかったドメインは negative_ttl 秒だけ覚えておく。
+    """
 
-        # rulesを明示的に辞書型にキャスト
-        rules_dict = dict(rules.items())  # type: ignore
+    def __init__(self, max_entries=10000, negative_ttl=600, clock=time.monotonic):
+        self.max_entries = max(1, int(max_entries))
+        self.negative_ttl = negative_ttl
+        self.hits = 0
+        self.misses = 0
+        self._clock = clock
+        self._entries = OrderedDict()  # key -> (有効期限, ルール or None)
+        self._lock = threading.Lock()
 
-        # パスに対するアクセス可否を判定
-        path = urlparse(url).path or "/"
+    def get(self, key):
+        """(見つかったか, ルール) を返す"""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[0] > self._clock():
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return True, entry[1]
+            if entry is not None:
+                del self._entries[key]
+            self.misses += 1
+            return False, None
 
-        # Disallowルールをチェック
-        if rules_dict["disallow"]:
-            for pattern in rules_dict["disallow"].split("\n"):  # type: ignore
-                if pattern and path.startswith(str(pattern)):
-                    return False, 0
+    def put(self, key, rules, ttl):
+        with self._lock:
+            self._entries[key] = (self._clock() + ttl, rules)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
 
-        # Allowルールをチェック
-        if rules_dict["allow"]:
-            for pattern in rules_dict["allow"].split("\n"):  # type: ignore
-                if pattern and path.startswith(str(pattern)):
-                    return True, rules_dict["crawl_delay"] or 0
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self.hits = 0
+            self.misses = 0
 
-        return True, rules_dict["crawl_delay"] or 0
+    @property
+    def hit_rate(self):
+        total = self.hits + self.misses
+        return self.hits / total if total else 0.0
 
+
+_robots_cache = RobotsCache(
+    max_entries=ROBOTS_CONFIG["cache_size"],
+    negative_ttl=ROBOTS_CONFIG["negative_ttl"],
+)
+
+
+metrics.Counter(
+    "scrape_robots_cache_hits_total", "robots.txt のルールをキャッシュから返した回数"
+).set_function(lambda: _robots_cache.hits)
+metrics.Counter(
+    "scrape_robots_cache_misses_total", "robots.txt のルールがキャッシュになかった回数"
+).set_function(lambda: _robots_cache.misses)
+metrics.Gauge(
+    "scrape_robots_cache_hit_ratio", "robots.txt のルールのキャッシュのヒット率"
+).set_function(lambda: _robots_cache.hit_rate)
+
+
+def get_robots_cache() -> RobotsCache:
+    return _robots_cache
+
+
+def clear_robots_cache():
+    """キャッシュを空にする（テストや robots_rules を直接更新したとき用）"""
+    _robots_cache.clear()
+
+
+def _select_rules(domain, user_agent, unexpired):
+    """robots_rules の行を読む（接続は読み終えたらすぐ返却する）"""
+    conn = get_connection()
+    cursor = conn.cursor(dictionary=True)
+    try:
+        cursor.execute(
+            f"""
+            SELECT *, TIMESTAMPDIFF(SECOND, NOW(), expires_at) AS ttl_seconds
+            FROM robots_rules
+            WHERE domain = %s AND user_agent = %s
+            {"AND expires_at > NOW()" if unexpired else ""}
+        """,
+            (domain, user_agent),
+        )
+        return cursor.fetchone()
     finally:
         cursor.close()
         conn.close()
+
+
+def _load_robots_rules(domain, user_agent):
+    """DBからルールを読んでコンパイルし、キャッシュする
+
+    有効なルールがなければ robots.txt を取得して保存してから読み直す。
+    取得の間は接続を借りたままにせず、読み直しは別の接続（新しいスナップショット）で行う。
+    """
+    rules = _select_rules(domain, user_agent, unexpired=True)
+    # ルールが存在しないか期限切れの場合は更新
+    if not rules:
+        fetch_and_store_robots(domain, user_agent)
+        rules = _select_rules(domain, user_agent, unexpired=False)
+
+    key = (domain, user_agent)
+    if not rules:
+        # 保存したはずのルールを読めない: 許可とはみなさず、しばらく後回しにする
+        ttl = _robots_cache.negative_ttl
+        compiled = {
+            "matcher": RobotsMatcher.from_columns("/", ""),
+            "crawl_delay": 0,
+            "retry_at": time.monotonic() + ttl,
+        }
+        _robots_cache.put(key, compiled, ttl)
+        return compiled
+
+    # ルールは一度だけコンパイルしてキャッシュする
+    compiled = {
+        "matcher": RobotsMatcher.from_columns(rules["disallow"], rules["allow"]),
+        "crawl_delay": rules["crawl_delay"] or 0,
+    }
+    ttl = rules.get("ttl_seconds")
+    if not ttl or ttl <= 0:
+        # 期限切れのまま再取得に失敗した行は、しばらく再取得しない
+        ttl = _robots_cache.negative_ttl
+    ttl = min(ttl, ROBOTS_CONFIG["max_ttl"])
+    if _never_fetched(rules):
+        # 一度も取得できていない: 再取得の時刻まで全体を不許可として後回しにする
+        compiled["retry_at"] = time.monotonic() + ttl
+    _robots_cache.put(key, compiled, ttl)
+    return compiled
+
+
+def _never_fetched(rules) -> bool:
+    """取得失敗の記録だけがある行か（fetch_and_store_robots が全体不許可で作る）"""
+    return (
+        bool(rules.get("fail_count"))
+        and rules.get("rule_groups") is None
+        and rules["disallow"] == "/"
+    )
+
+
+def check_robots_rules(url, user_agent="MyScraperBot"):
+    """robots.txtのルールをチェック
+
+    ルールはプロセス内にキャッシュし、有効期限内はDBに問い合わせない。
+    robots.txt を一度も取得できていないドメインは、処理済みにせず後で
+    やり直せるよう RobotsUnreachable（retry_after は再取得までの秒数）を送出する。
+    """
+    domain = urlparse(url).netloc
+    found, compiled = _robots_cache.get((domain, user_agent))
+    if not found:
+        compiled = _load_robots_rules(domain, user_agent)
+
+    if "retry_at" in compiled:
+        raise RobotsUnreachable(
+            f"{domain} の robots.txt を取得できていません",
+            retry_after=max(0.0, compiled["retry_at"] - time.monotonic()),
+        )
+
+    if not compiled["matcher"].allowed_url(url):
+        return False, 0
+    return True, compiled["crawl_delay"]
@@ -0,0 +1,162 @@
+import re
+from urllib.parse import quote, urlparse
+
+# パーセントエンコード済みの文字と、robots.txt のパターンで意味を持つ文字はそのまま残す
+_SAFE_CHARS = "/?%*$=&;:@!+,'()~-._"
+_PERCENT_ESCAPE = re.compile(r"%[0-9a-fA-F]{2}")
+
+
+def normalize_path(path: str) -> str:
+    """比較用にパスを正規化（非ASCII文字はUTF-8でエンコードし、%xx は大文字にそろえる）"""
+    path = quote(path, safe=_SAFE_CHARS)
+    return _PERCENT_ESCAPE.sub(lambda m: m.group(0).upper(), path)
+
+
+def parse_robots_txt(text: str) -> list[dict]:
+    """robots.txt を RFC 9309 のグループ単位に分解する
+
+    戻り値は {"user_agents": [...], "rules": [["allow" | "disallow", パターン], ...],
+    "crawl_delay": 秒数 or None} のリスト。
+    """
+    groups = []
+    group = None
+    in_agents = False  # 直前の行が user-agent 行か
+    for line in (text or "").splitlines():
+        line = line.split("#", 1)[0].strip()
+        if ":" not in line:
+            continue
+        key, value = line.split(":", 1)
+        key = key.strip().lower()
+        value = value.strip()
+        if key == "user-agent":
+            if not in_agents:
+                group = {"user_agents": [], "rules": [], "crawl_delay": None}
+                groups.append(group)
+            group["user_agents"].append(value.lower())
+            in_agents = True
+            continue
+        if key == "sitemap":
+            continue  # グループに属さない
+        in_agents = False
+        if group is None:
+            continue  # user-agent 行より前のルールは無視
+        if key in ("allow", "disallow"):
+            if not value:
+                continue  # 値が空のルールは何も禁止・許可しない
+            if not value.startswith(("/", "*")):
+                value = "/" + value
+            group["rules"].append([key, value])
+        elif key == "crawl-delay":
+            try:
+                group["crawl_delay"] = float(value)
+            except ValueError:
+                pass
+    return groups
+
+
+def product_token(user_agent: str) -> str:
+    """User-Agent 文字列からプロダクトトークン（"Bot/1.0" の "bot"）を取り出す"""
+    return (user_agent or "").split("/", 1)[0].strip().lower()
+
+
+def select_group(groups, user_agent) -> dict:
+    """user_agent に適用するグループを返す（同名のグループはまとめる）
+
+    一致するグループがなければ "*" のグループ、それもなければ空のグループ。
+    """
+    token = product_token(user_agent)
+    matched = [g for g in groups if token and token in g["user_agents"]]
+    if not matched:
+        matched = [g for g in groups if "*" in g["user_agents"]]
+    rules = [rule for g in matched for rule in g["rules"]]
+    delays = [g["crawl_delay"] for g in matched if g["crawl_delay"] is not None]
+    return {"rules": rules, "crawl_delay": delays[0] if delays else None}
+
+
+class _Node:
+    __slots__ = ("children", "prefix", "end")
+
+    def __init__(self):
+        self.children = {}
+        self.prefix = None  # この位置までの前方一致ルール (長さ, allow)
+        self.end = None  # "$" 付きでこの位置で終わるルール (長さ, allow)
+
+
+class RobotsMatcher:
+    """Allow/Disallow ルールを一度だけコンパイルし、最長一致で判定する
+
+    RFC 9309 に従い、パスに一致するルールのうちパターンが最も長いものを採用し、
+    同じ長さなら Allow を優先する。どのルールにも一致しなければ許可。
+    ワイルドカードを含まないルール（"$" 終端を含む）はトライ木に入れ、
+    パスの長さに比例する手間で判定する。"*" を含むルールは正規表現にして、
+    トライ木で見つかったルールより長いものだけを長い順に確認する。
+    """
+
+    def __init__(self, rules):
+        self._root = _Node()
+        wildcards = []
+        for kind, pattern in rules:
+            if not pattern:
+                continue
+            allow = kind == "allow"
+            pattern = normalize_path(pattern)
+            key = (len(pattern), allow)
+            anchored = pattern.endswith("$")
+            body = pattern[:-1] if anchored else pattern
+            if not anchored:
+                body = body.rstrip("*")  # 末尾の "*" は前方一致と同じ
+            if "*" in body:
+                regex = ".*".join(re.escape(part) for part in body.split("*"))
+                wildcards.append((key, re.compile(regex + ("$" if anchored else ""))))
+                continue
+            node = self._root
+            for ch in body:
+                node = node.children.setdefault(ch, _Node())
+            if anchored:
+                node.end = max(node.end or key, key)
+            else:
+                node.prefix = max(node.prefix or key, key)
+        wildcards.sort(key=lambda item: item[0], reverse=True)
+        self._wildcards = wildcards
+
+    @classmethod
+    def from_columns(cls, disallow, allow):
+        """robots_rules テーブルの disallow / allow（改行区切り）から作る"""
+        rules = [("disallow", p) for p in (disallow or "").split("\n") if p.strip()]
+        rules += [("allow", p) for p in (allow or "").split("\n") if p.strip()]
+        return cls((kind, p.strip()) for kind, p in rules)
+
+    def _best_literal(self, path):
+        node = self._root
+        best = node.prefix
+        last = len(path) - 1
+        for i, ch in enumerate(path):
+            node = node.children.get(ch)
+            if node is None:
+                break
+            if node.prefix is not None and (best is None or node.prefix > best):
+                best = node.prefix
+            if i == last and node.end is not None and (best is None or node.end > best):
+                best = node.end
+        return best
+
+    def allowed(self, path: str) -> bool:
+        """パス（クエリ文字列を含む）へのアクセスが許可されるか"""
+        path = normalize_path(path or "/")
+        if path == "/robots.txt":
+            return True
+        best = self._best_literal(path)
+        for key, regex in self._wildcards:
+            if best is not None and key <= best:
+                break
+            if regex.match(path):
+                best = key
+                break
+        return best is None or best[1]
+
+    def allowed_url(self, url: str) -> bool:
+        parsed = urlparse(url)
+        path = parsed.path or "/"
+        if parsed.query:
+            path += "?" + parsed.query
+        return self.allowed(path)
@@ -0,0 +1,5 @@
+-- 並列ワーカー用の確保状態カラムを追加
+-- mysql -u your_user -p scraping_db < schema/migrations/001_add_claim_columns.sql
+ALTER TABLE scraped_pages
+    ADD COLUMN claimed_by VARCHAR(255) DEFAULT NULL AFTER processed,
+    ADD COLUMN claimed_at DATETIME DEFAULT NULL AFTER claimed_by;
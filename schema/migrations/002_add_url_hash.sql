@@ -0,0 +1,11 @@
+-- URL先頭255文字のユニークキーを url_hash（SHA-256）のユニークキーに置き換える
+-- mysql -u your_user -p scraping_db < schema/migrations/002_add_url_hash.sql
+--
+-- 先頭255文字が同じ別URLが衝突しなくなり、url での検索は
+-- 32バイト固定長のインデックスで行われる。
+ALTER TABLE scraped_pages
+    ADD COLUMN url_hash BINARY(32)
+        AS (UNHEX(SHA2(url, 256))) STORED AFTER url,
+    ADD UNIQUE KEY uniq_url_hash (url_hash),
+    ADD KEY idx_processed_id (processed, id),
+    DROP INDEX uniq_url;
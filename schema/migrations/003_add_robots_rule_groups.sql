@@ -0,0 +1,9 @@
+-- robots.txt の全 user-agent グループのルールを保存する列を追加する
+-- mysql -u your_user -p scraping_db < schema/migrations/003_add_robots_rule_groups.sql
+--
+-- disallow / allow にはこのクローラーに適用されるグループのルールを
+-- ワイルドカード（* と $）を含めてそのまま保存する。
+-- 以前の形式（disallow_all 時の "*" のみ）の行は再取得させる。
+ALTER TABLE robots_rules
+    ADD COLUMN rule_groups JSON DEFAULT NULL AFTER allow;
+UPDATE robots_rules SET expires_at = NOW();
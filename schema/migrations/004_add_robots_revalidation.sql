@@ -0,0 +1,10 @@
+-- robots.txt の条件付き再取得と、取得失敗時のバックオフ用の列を追加する
+-- mysql -u your_user -p scraping_db < schema/migrations/004_add_robots_revalidation.sql
+--
+-- etag / last_modified は次回の If-None-Match / If-Modified-Since に使い、
+-- 304 が返れば expires_at だけを延ばす。fail_count は連続失敗回数で、
+-- 再取得までの間隔を失敗ごとに2倍にする。
+ALTER TABLE robots_rules
+    ADD COLUMN etag VARCHAR(255) DEFAULT NULL AFTER crawl_delay,
+    ADD COLUMN last_modified VARCHAR(64) DEFAULT NULL AFTER etag,
+    ADD COLUMN fail_count INT NOT NULL DEFAULT 0 AFTER last_modified;
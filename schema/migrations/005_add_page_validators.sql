@@ -0,0 +1,8 @@
+-- ページ再取得時の条件付きGET用の列を追加する
+-- mysql -u your_user -p scraping_db < schema/migrations/005_add_page_validators.sql
+--
+-- 取得時の ETag / Last-Modified を保存し、--reset などで再取得するときに
+-- If-None-Match / If-Modified-Since を送る。304 が返れば fetched_at だけを更新する。
+ALTER TABLE scraped_pages
+    ADD COLUMN etag VARCHAR(255) DEFAULT NULL AFTER `hash`,
+    ADD COLUMN last_modified VARCHAR(64) DEFAULT NULL AFTER etag;
@@ -0,0 +1,24 @@
+-- ページ本文をハッシュをキーとする page_contents に移し、同一の本文を共有する
+-- mysql -u your_user -p scraping_db < schema/migrations/006_add_page_contents.sql
+--
+-- scraped_pages.content_hash が page_contents.hash を参照する。content が残っている
+-- 行もそのまま読めるが、以下の移行で既存の本文も page_contents にまとめる。
+CREATE TABLE IF NOT EXISTS page_contents (
+    `hash` BINARY(32) PRIMARY KEY,
+    content LONGTEXT NOT NULL,
+    size INT NOT NULL,
+    created_at DATETIME
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4;
+
+ALTER TABLE scraped_pages
+    ADD COLUMN content_hash BINARY(32) DEFAULT NULL AFTER content,
+    ADD KEY idx_content_hash (content_hash);
+
+INSERT IGNORE INTO page_contents (`hash`, content, size, created_at)
+SELECT UNHEX(SHA2(content, 256)), content, LENGTH(content), fetched_at
+FROM scraped_pages
+WHERE content IS NOT NULL AND content <> '';
+
+UPDATE scraped_pages
+SET content_hash = UNHEX(SHA2(content, 256)), content = NULL
+WHERE content IS NOT NULL AND content <> '';
@@ -0,0 +1,8 @@
+-- page_contents に圧縮した本文を保存する body 列を追加する
+-- mysql -u your_user -p scraping_db < schema/migrations/007_add_page_content_body.sql
+--
+-- 圧縮した本文は body に先頭1バイトの形式マーカー（z=zlib, s=zstd, r=非圧縮）付きで保存し、
+-- content は NULL にする。既存の行は content のまま読める。
+ALTER TABLE page_contents
+    MODIFY COLUMN content LONGTEXT NULL,
+    ADD COLUMN body LONGBLOB DEFAULT NULL AFTER content;
@@ -0,0 +1,9 @@
+-- 本文を WARC ファイルに保存したときの位置の列を追加する
+-- mysql -u your_user -p scraping_db < schema/migrations/008_add_warc_location.sql
+--
+-- STORAGE_CONFIG["backend"] = "warc" のとき、本文は WARC ファイルに追記し、
+-- scraped_pages にはファイル名・オフセット・長さだけを保存する。
+ALTER TABLE scraped_pages
+    ADD COLUMN warc_file VARCHAR(255) DEFAULT NULL AFTER content_hash,
+    ADD COLUMN warc_offset BIGINT DEFAULT NULL AFTER warc_file,
+    ADD COLUMN warc_length INT DEFAULT NULL AFTER warc_offset;
@@ -0,0 +1,7 @@
+CREATE TABLE page_contents (
+    `hash` BINARY(32) PRIMARY KEY,              -- 本文（UTF-8）のSHA-256。scraped_pages.content_hash から参照
+    content LONGTEXT,                           -- ページ本文（同じ本文は1回だけ保存。圧縮時は NULL）
+    body LONGBLOB,                              -- 圧縮した本文（先頭1バイトが形式: z=zlib, s=zstd, r=非圧縮）
+    size INT NOT NULL,                          -- 本文のバイト数
+    created_at DATETIME                         -- 最初に保存した日時
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4;
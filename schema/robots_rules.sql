@@ -4,7 +4,11 @@ CREATE TABLE robots_rules (
     user_agent VARCHAR(255) DEFAULT 'MyScraperBot',
     disallow TEXT,
     allow TEXT,
+    rule_groups JSON,
     crawl_delay INT,
+    etag VARCHAR(255),
+    last_modified VARCHAR(64),
+    fail_count INT NOT NULL DEFAULT 0,
     fetched_at DATETIME,
     expires_at DATETIME
 );
@@ -1,10 +1,10 @@
 import requests
 from bs4 import BeautifulSoup
-import mysql.connector
 import hashlib
 from urllib.parse import urlparse
 from fetch_and_store_robots import fetch_and_store_robots
 from models import ScrapedPage
+from db import get_connection
 
 
 # ハッシュ値を生成する関数
@@ -43,9 +43,7 @@ def scrape(url, referrer=None):
 
 # MySQLにスクレイピング結果を保存する関数
 def save_to_mysql(data):
-    from config import DB_CONFIG
-
-    conn = mysql.connector.connect(**DB_CONFIG)
+    conn = get_connection()
     cursor = conn.cursor()
 
     try:
@@ -98,9 +96,7 @@ def is_under_base(url, base_url):
 
 # robots.txtのルールをチェックする関数
 def check_robots_rules(url, user_agent="MyScraperBot"):
-    from config import DB_CONFIG
-
-    conn = mysql.connector.connect(**DB_CONFIG)
+    conn = get_connection()
     cursor = conn.cursor(dictionary=True)
 
     try:
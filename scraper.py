@@ -1,23 +1,51 @@
-import types
-import requests
-from bs4 import BeautifulSoup
 import hashlib
+import os
+import socket
+import threading
 import time
+from concurrent.futures import ThreadPoolExecutor
 from urllib.parse import urlparse
 from models import (
     ScrapedPage,
     save_page_to_db,
-    get_unprocessed_page,
+    get_unprocessed_pages,
     mark_page_as_processed,
+    mark_pages_as_processed,
+    release_pages,
     get_page_counts,
-    exists_in_db,
+    save_links_to_db,
+    find_existing_urls,
+    touch_page,
 )
-from link_extractor import extract_links, extract_title
-from robots_handler import check_robots_rules
+from db import get_pool
+from browser_pool import get_browser_pool, close_browser_pool
+import http_client
+import metrics
+import content_store
+import content_filter
+import warc_store
+from url_filter import get_seen_filter, init_seen_filter, save_seen_filter
+from link_extractor import parse_document
+from charset_resolver import decode_body
+from politeness import get_host_scheduler, host_of, wait_for_host
+from robots_handler import RobotsUnreachable, check_robots_rules
 import argparse
 import json
-from playwright.sync_api import sync_playwright  # type: ignore
-from config import USE_PLAYWRIGHT_PATTERNS
+from typing import Optional
+from config import USE_PLAYWRIGHT_PATTERNS, CRAWLER_CONFIG, HTTP_CONFIG, METRICS_CONFIG
+
+
+def archive_response(url, response, body: bytes):
+    """WARC バックエンドが有効ならレスポンスを WARC に追記し、保存先を返す"""
+    if not warc_store.enabled():
+        return None
+    return warc_store.archive_response(
+        url,
+        response.status_code,
+        getattr(response, "reason", None),
+        response.headers,
+        body,
+    )
 
 
 def get_hash(text):
@@ -27,17 +55,113 @@ def get_hash(text):
 
 def should_scrape(url, user_agent):
     """robots.txt に基づくスクレイプ可否と遅延処理"""
-    allowed, delay = check_robots_rules(url, user_agent)
+    try:
+        allowed, delay = check_robots_rules(url, user_agent)
+    except RobotsUnreachable as e:
+        # robots.txt を確認できるまでは取得せず、処理済みにもしない
+        print(f"[WARN] {url} を後回しにします: {e}")
+        return False
     if not allowed:
+        metrics.PAGES.labels("blocked").inc()
         mark_page_as_processed(url, "Blocked by robots.txt")
         return False
-    if float(delay) > 0.0:  # type: ignore
-        time.sleep(delay)  # type: ignore
+    # crawl-delay は同じホストへの前回のリクエストからの間隔として待つ
+    wait_for_host(url, delay)
     return True
 
 
-def scrape_page(url: str, referrer: str | None = None) -> ScrapedPage:
-    """HTML取得と ScrapedPage の生成"""
+def read_response(url, response, handler=None):
+    """stream=True のレスポンスの本文を上限まで受信し、(Body, 本文の文字列) を返す
+
+    本文はチャンクごとに読み、上限（HTTP_CONFIG の max_body_bytes /
+    max_download_seconds）を超えたら切り詰めるか打ち切る。ハッシュは受信した
+    バイト列から読みながら計算する。エラーのステータスなら本文を読まずに
+    HTTPError を送出する。どちらの場合もレスポンスは閉じる。
+    handler を渡すと、本文の文字列は content_filter のハンドラーで作る。
+    """
+    try:
+        response.raise_for_status()
+        body = http_client.read_body(response)
+    finally:
+        response.close()
+    content_type = response.headers.get("Content-Type")
+    if handler is not None:
+        return body, handler(url, content_type, body.content) or ""
+    # ヘッダー・BOM・meta から文字コードを決める（統計的な推定は最後の手段）
+    content = decode_body(body.content, content_type, urlparse(url).netloc)
+    return body, content
+
+
+class SkipContent(Exception):
+    """HTML/XML 以外の Content-Type で、処理するハンドラーもない"""
+
+    def __init__(self, content_type):
+        super().__init__(content_filter.skip_message(content_type))
+
+
+def content_handler(status_code, content_type):
+    """本文を読む前に Content-Type を確かめる
+
+    HTML/XML ならそのまま読む（None を返す）。それ以外は登録したハンドラーを
+    返し、ハンドラーがなければ本文を読まずにスキップする（SkipContent を送出）。
+    エラーのステータスは read_response で HTTPError にするので確かめない。
+    """
+    if status_code >= 400 or content_filter.is_markup(content_type):
+        return None
+    handler = content_filter.get_handler(content_type)
+    if handler is None:
+        raise SkipContent(content_type)
+    return handler
+
+
+def skipped_page(url, referrer, status_code, error: SkipContent) -> ScrapedPage:
+    """本文を読まずにスキップしたページ（再取得しないよう処理済みとして保存する）"""
+    return ScrapedPage(
+        url=url,
+        referrer=referrer,
+        title=urlparse(url).netloc,
+        content="",
+        status_code=status_code,
+        error_message=str(error),
+    )
+
+
+def observe_fetch(url, started):
+    """取得（リクエストから本文の受信まで）の秒数をホストごとに記録する"""
+    host = urlparse(url).netloc
+    metrics.FETCH_SECONDS.labels(host).observe(time.perf_counter() - started)
+
+
+def body_error(body):
+    """本文を切り詰めたときに error_message に記録する文言（切り詰めていなければ None）"""
+    if not body.truncated:
+        return None
+    return (
+        f"本文が上限の {HTTP_CONFIG['max_body_bytes']} バイトを超えたため切り詰めました"
+    )
+
+
+def conditional_headers(etag=None, last_modified=None) -> dict:
+    """前回の取得で保存した ETag / Last-Modified から条件付きGETのヘッダーを作る"""
+    headers = {}
+    if etag:
+        headers["If-None-Match"] = etag
+    if last_modified:
+        headers["If-Modified-Since"] = last_modified
+    return headers
+
+
+def scrape_page(
+    url: str,
+    referrer: str | None = None,
+    etag: str | None = None,
+    last_modified: str | None = None,
+) -> ScrapedPage:
+    """HTML取得と ScrapedPage の生成
+
+    etag / last_modified を渡すと条件付きGETを送り、304 が返れば本文の
+    取得・解析・ハッシュ計算をせずに status_code=304 のページを返す。
+    """
     url = (url or "").strip()
     if not url:
         return ScrapedPage(
@@ -47,55 +171,52 @@ def scrape_page(url: str, referrer: str | None = None) -> ScrapedPage:
 
     try:
         if use_playwright:
-            with sync_playwright() as p:
-                browser = p.chromium.launch(headless=True)
-                page_obj = browser.new_page()
-                if referrer:
-                    page_obj.set_extra_http_headers({"Referer": referrer})
-                page_obj.goto(url, wait_until="networkidle")
-                content = await_or_call(page_obj.content())
-                title = (await_or_call(page_obj.title())) or urlparse(url).netloc
-                browser.close()
-                status_code = 200
-                return ScrapedPage(
-                    url=url, title=title, content=content, error_message=None
-                )
-        else:
-            headers = {"Referer": referrer} if referrer else {}
-            response = requests.get(url, headers=headers, timeout=10)
-            # byte_size = len(response.content)
-            # print(f"[DEBUG] Raw content size: {byte_size} bytes")
-
-            response.encoding = response.apparent_encoding
-            response.raise_for_status()
-            content = response.text or ""
-
-            # バイト数を表示（UTF-8でエンコードした場合）
-            # byte_size = len(
-            #   content.encode(response.encoding or "utf-8", errors="ignore")
-            # )
-            # print(f"[DEBUG] {url} の取得サイズ: {byte_size} bytes")
-
-            # if content.lstrip().startswith("<?xml"):
-            #     soup = BeautifulSoup(content, features="xml")
-            # else:
-            #     print(f"[DEBUG] content(before parse)={repr(content)}")
-            #     soup = BeautifulSoup(content, "html.parser")
-            #     print(f"[DEBUG] soup.title={soup.title}")
-            #     print(f"[DEBUG] soup.title.string"
-            #           "={soup.title.string if soup.title else None!r}")
-
-            title = extract_title(content) or urlparse(url).netloc
-            status_code = response.status_code
-        hash_value = get_hash(content)
+            content, title = get_browser_pool().render(url, referrer)
+            return ScrapedPage(
+                url=url,
+                title=title or urlparse(url).netloc,
+                content=content,
+                error_message=None,
+            )
+        headers = {"Referer": referrer} if referrer else {}
+        headers.update(conditional_headers(etag, last_modified))
+        started = time.perf_counter()
+        response = http_client.get(url, headers=headers, stream=True)
+        if response.status_code == 304:
+            response.close()
+            observe_fetch(url, started)
+            return ScrapedPage(
+                url=url,
+                referrer=referrer,
+                status_code=304,
+                etag=response.headers.get("ETag") or etag,
+                last_modified=response.headers.get("Last-Modified") or last_modified,
+            )
+        try:
+            handler = content_handler(
+                response.status_code, response.headers.get("Content-Type")
+            )
+        except SkipContent as e:
+            response.close()
+            return skipped_page(url, referrer, response.status_code, e)
+        body, content = read_response(url, response, handler)
+        observe_fetch(url, started)
+
+        document = parse_document(content, url)
         return ScrapedPage(
             url=url,
             referrer=referrer,
-            title=title,
+            title=document.title or urlparse(url).netloc,
             content=content,
-            status_code=status_code,
-            hash_value=hash_value,
-            error_message=None,
+            status_code=response.status_code,
+            hash_value=body.sha256,
+            error_message=body_error(body),
+            document=document,
+            etag=response.headers.get("ETag"),
+            last_modified=response.headers.get("Last-Modified"),
+            warc_location=archive_response(url, response, body.content),
+            body_size=len(body.content),
+            truncated=body.truncated,
         )
     except Exception as e:
         return ScrapedPage(
@@ -109,41 +230,37 @@ def scrape_page(url: str, referrer: str | None = None) -> ScrapedPage:
         )
 
 
-def await_or_call(value):
-    """値がawaitableならawaitし、そうでなければそのまま返す"""
-    if isinstance(value, types.CoroutineType) or hasattr(value, "__await__"):
-        return value.__await__().__next__()
-    return value
-
-
 def fetch_post_content(url: str, data: dict, referrer: str | None = None, headers=None):
     """POSTリクエストでHTMLを取得し ScrapedPage を生成"""
     try:
         headers = headers or {}
         if referrer:
             headers["Referer"] = referrer
-        response = requests.post(url, data=data, headers=headers, timeout=10)
-        # byte_size = len(response.content)
-        # print(f"[DEBUG] Raw content size: {byte_size} bytes")
-
-        response.encoding = response.apparent_encoding
-        response.raise_for_status()
-        soup = BeautifulSoup(response.text, "html.parser")
-        title = soup.title.string if soup.title else ""
-        content = response.text
-
-        # バイト数を表示（UTF-8でエンコードした場合）
-        # byte_size = len(content.encode(response.encoding or "utf-8", errors="ignore"))
-        # print(f"[DEBUG] {url} の取得サイズ: {byte_size} bytes")
-
-        hash_value = get_hash(content)
+        started = time.perf_counter()
+        response = http_client.post(url, data=data, headers=headers, stream=True)
+        try:
+            handler = content_handler(
+                response.status_code, response.headers.get("Content-Type")
+            )
+        except SkipContent as e:
+            response.close()
+            return skipped_page(url, referrer, response.status_code, e)
+        body, content = read_response(url, response, handler)
+        observe_fetch(url, started)
+        document = parse_document(content, url)
+        title = document.title or ""
         return ScrapedPage(
             url=url,
             referrer=referrer,
             title=title,
             content=content,
             status_code=response.status_code,
-            hash_value=hash_value,
+            hash_value=body.sha256,
+            error_message=body_error(body),
+            document=document,
+            warc_location=archive_response(url, response, body.content),
+            body_size=len(body.content),
+            truncated=body.truncated,
         )
     except Exception as e:
         return ScrapedPage(url=url, referrer=referrer, error_message=str(e))
@@ -151,15 +268,35 @@ def fetch_post_content(url: str, data: dict, referrer: str | None = None, header
 
 def extract_and_save_links(page):
     """リンク抽出と保存"""
-    if page.content.lstrip().startswith("<?xml"):
-        soup = BeautifulSoup(page.content, features="xml")
-    else:
-        soup = BeautifulSoup(page.content, "html.parser")
-    links = extract_links(soup, page.url)
-    for link_url, link_title in links:
-        if not exists_in_db(link_url):
-            new_page = ScrapedPage(url=link_url, referrer=page.url, title=link_title)
-            save_page_to_db(new_page)
+    # 取得時に解析済みならそれを使い、同じ内容を再解析しない
+    document = getattr(page, "document", None) or parse_document(page.content, page.url)
+    links = document.links
+    seen = get_seen_filter()
+    if seen is not None:
+        # 「未登録」は確実なのでそのまま登録する。「既出」は誤判定がありうるので、
+        # 捨てる前に1回の SELECT で登録済みかを確かめる（全部未登録なら問い合わせない）
+        maybe_seen = [url for url, _ in links if url in seen]
+        if maybe_seen:
+            existing = find_existing_urls(maybe_seen)
+            links = [(url, title) for url, title in links if url not in existing]
+    if not links:
+        return
+    save_links_to_db(links, referrer=page.url)
+    if seen is not None:
+        for url, _ in links:
+            seen.add(url)
+
+
+def fetch_page(row) -> ScrapedPage:
+    """行の method に応じて GET / POST でページを取得"""
+    url = row["url"]
+    if (row.get("method") or "GET").upper() == "POST":
+        return fetch_post_content(
+            url, data=row.get("payload") or {}, referrer=row.get("referrer")
+        )
+    # 前回の取得で保存した ETag / Last-Modified があれば条件付きGETにする
+    validators = {key: row[key] for key in ("etag", "last_modified") if row.get(key)}
+    return scrape_page(url, row.get("referrer"), **validators)
 
 
 def process_single_page(row, user_agent):
@@ -169,42 +306,197 @@ def process_single_page(row, user_agent):
         print(f"[WARN] URLがNoneまたは空のためスキップ: {row}")
         return
     url = row["url"]
-    method = row.get("method", "GET").upper()
-    payload = row.get("payload", {})  # dict形式を想定
 
     if not should_scrape(url, user_agent):
         print(f"Skipping {url} (blocked by robots.txt)")
         return
 
-    if method == "POST":
-        page = fetch_post_content(url, data=payload, referrer=row.get("referrer"))
-    else:
-        page = scrape_page(url, row.get("referrer"))
+    page = fetch_page(row)
+    store_scraped_page(page, url)
+
 
+def is_not_modified(page) -> bool:
+    """条件付きGETで 304 Not Modified が返ったページか（本文は取得していない）"""
+    return getattr(page, "status_code", None) == 304
+
+
+def save_page_and_links(page):
+    """取得結果を保存し、内容のあるページならリンクも登録
+
+    304 Not Modified のページは保存済みの内容・リンクが最新なので、取得日時だけを更新する。
+    """
+    metrics.PAGES.labels(_result_label(page)).inc()
+    if is_not_modified(page):
+        touch_page(page.url)
+        return
     save_page_to_db(page)
-    if page.error_message is None:
-        if page.content and page.content.strip():
-            extract_and_save_links(page)
-            mark_page_as_processed(url)
-            print(f"Mark as processed for {url}")
-        else:
-            # 空コンテンツでも再処理しない場合
-            mark_page_as_processed(url)
-            print(f"Mark as processed for {url} (empty content)")
-    else:
-        # エラー時は再処理しないため processed=TRUE にする
-        mark_page_as_processed(url)
-        print(f"Mark as processed for {url} ({page.error_message})")
+    # 上限で切り詰めたページも、受信できた範囲のリンクは登録する
+    ok = page.error_message is None or getattr(page, "truncated", False)
+    if ok and page.content and page.content.strip():
+        extract_and_save_links(page)
+
+
+def store_scraped_page(page, url):
+    """取得結果を保存し、リンクを登録して処理済みにする"""
+    save_page_and_links(page)
+    # エラー時や空コンテンツでも再処理しないため processed=TRUE にする
+    mark_page_as_processed(url)
+    print(f"Mark as processed for {url}{_describe_result(page)}")
+
 
+class HostBusy(Exception):
+    """crawl-delay の間隔が空いておらず、ホストの取得枠を確保できなかった"""
 
-def process_pages(user_agent="MyScraperBot"):
-    """未処理ページを順に処理"""
+    def __init__(self, host, wait):
+        super().__init__(f"{host} は {wait:.1f} 秒後まで取得できません")
+        self.wait = wait
+
+
+def crawl_claimed_page(row, user_agent) -> Optional[str]:
+    """確保済みのページを取得・保存し、処理済みにする際のエラーメッセージを返す
+
+    処理済みへの更新は呼び出し側がバッチでまとめて行う。確保した行を持ったまま
+    crawl-delay を待たないよう、ホストの取得枠が空いていなければ HostBusy を送出する。
+    robots.txt を確認できないホストは再取得の時刻まで止め、同じく HostBusy を送出する。
+    """
+    url = row["url"]
+    host = host_of(url)
+    scheduler = get_host_scheduler()
+    try:
+        allowed, delay = check_robots_rules(url, user_agent)
+    except RobotsUnreachable as e:
+        scheduler.postpone(host, e.retry_after)
+        raise HostBusy(host, e.retry_after or 0) from e
+    if not allowed:
+        metrics.PAGES.labels("blocked").inc()
+        print(f"Skipping {url} (blocked by robots.txt)")
+        return "Blocked by robots.txt"
+    wait = scheduler.try_reserve(host, delay)
+    if wait > 0:
+        raise HostBusy(host, wait)
+    page = fetch_page(row)
+    save_page_and_links(page)
+    print(f"Mark as processed for {url}{_describe_result(page)}")
+    return page.error_message
+
+
+def _result_label(page):
+    """scrape_pages_total の result ラベル"""
+    if is_not_modified(page):
+        return "not_modified"
+    return "ok" if page.error_message is None else "error"
+
+
+def _describe_result(page):
+    if page.error_message is not None:
+        return f" ({page.error_message})"
+    if is_not_modified(page):
+        return " (not modified)"
+    if not (page.content and page.content.strip()):
+        return " (empty content)"
+    return ""
+
+
+class _WorkerState:
+    """ワーカー間で共有する処理中件数"""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.active = 0
+
+
+def _crawl_batch(worker_id, rows, user_agent):
+    """確保したバッチを処理し、まとめて処理済みにする
+
+    1ページの失敗でバッチ全体やワーカーを止めない。
+    crawl-delay 待ちのホストより、すぐに取得できるホストの行を先に処理する。
+    待たなければ取得できない行は処理せずに手放し、次の確保で取り直す。
+    """
+    keys = []
+    errors = []
+    released = []
+    pending = list(rows)
+    scheduler = get_host_scheduler()
+    try:
+        while pending:
+            row = scheduler.pick(pending)
+            try:
+                error = crawl_claimed_page(row, user_agent)
+            except HostBusy:
+                released.append(row.get("id") or row["url"])
+                continue
+            except Exception as e:
+                print(f"[ERROR] {worker_id}: {row['url']} の処理に失敗: {e}")
+                error = str(e)
+            keys.append(row.get("id") or row["url"])
+            errors.append(error)
+    finally:
+        if keys:
+            mark_pages_as_processed(keys, errors)
+        if released:
+            release_pages(released)
+
+
+def worker_loop(worker_id, user_agent, state=None, batch_size=None):
+    """ページをバッチ単位で確保して処理するワーカーのループ
+
+    キューが空でも他のワーカーが処理中なら、新しいリンクが追加される
+    可能性があるため少し待ってから再確保を試みる。
+    """
+    state = state or _WorkerState()
+    batch_size = batch_size or CRAWLER_CONFIG["batch_size"]
+    scheduler = get_host_scheduler()
     while True:
-        row = get_unprocessed_page()
-        url = row["url"] if row else None
-        if not url:
-            break
-        process_single_page(row, user_agent)
+        # 確保を試みている間も処理中として数え、他ワーカーの早期終了を防ぐ
+        with state.lock:
+            state.active += 1
+        rows = []
+        # crawl-delay 待ちのホストの行は確保しない（他のホストの行を先に処理する）
+        busy = scheduler.busy_hosts()
+        try:
+            rows = get_unprocessed_pages(
+                batch_size,
+                worker_id,
+                CRAWLER_CONFIG["claim_timeout"],
+                skip_hosts=busy,
+            )
+            if rows:
+                _crawl_batch(worker_id, rows, user_agent)
+        finally:
+            with state.lock:
+                state.active -= 1
+                # crawl-delay 待ちのホストの行が残っているかもしれないので、その間は
+                # 終了しない（robots.txt を確認できないホストの行は未処理のまま残す）
+                waiting = set(busy) - scheduler.postponed_hosts()
+                finished = not rows and not waiting and state.active == 0
+        if finished:
+            return
+        if not rows:
+            wait = min((scheduler.wait_time(host) for host in busy), default=None)
+            idle_wait = CRAWLER_CONFIG["idle_wait"]
+            time.sleep(idle_wait if wait is None else min(wait, idle_wait))
+
+
+def process_pages(user_agent="MyScraperBot", workers=1):
+    """未処理ページを確保しながら処理（workers > 1 で並列処理）"""
+    workers = max(1, int(workers))
+    base_id = f"{socket.gethostname()}:{os.getpid()}"
+    if workers == 1:
+        worker_loop(f"{base_id}:0", user_agent)
+        return
+
+    # robots.txt の確認中に取得処理が接続をもう1本使うため2倍確保する
+    pool = get_pool()
+    if pool.pool_size < workers * 2:
+        pool.resize(workers * 2)
+    state = _WorkerState()
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        futures = [
+            executor.submit(worker_loop, f"{base_id}:{n}", user_agent, state)
+            for n in range(workers)
+        ]
+        for future in futures:
+            future.result()
 
 
 def main():
@@ -224,6 +516,36 @@ def main():
         "--method", choices=["GET", "POST"], default="GET", help="HTTP method to use"
     )
     parser.add_argument("--payload", type=str, help="POST payload as JSON string")
+    parser.add_argument(
+        "--workers",
+        type=int,
+        default=CRAWLER_CONFIG["workers"],
+        help="並列に処理するワーカー数",
+    )
+    parser.add_argument(
+        "--engine",
+        choices=["sync", "async"],
+        default="sync",
+        help="sync: スレッドワーカー / async: asyncioで多数のページを並行取得",
+    )
+    parser.add_argument(
+        "--concurrency",
+        type=int,
+        default=CRAWLER_CONFIG["async_concurrency"],
+        help="asyncエンジンの全体の同時取得数",
+    )
+    parser.add_argument(
+        "--per-host",
+        type=int,
+        default=CRAWLER_CONFIG["async_per_host"],
+        help="asyncエンジンのホストごとの同時取得数",
+    )
+    parser.add_argument(
+        "--metrics-port",
+        type=int,
+        default=METRICS_CONFIG["port"],
+        help="/metrics（Prometheus のテキスト形式）を返すポート",
+    )
     parser.add_argument(
         "--reset",
         action="store_true",
@@ -233,6 +555,9 @@ def main():
     args = parser.parse_args()
 
     print(f"Starting scraper with User-Agent: {args.user_agent}")
+    if args.metrics_port is not None:
+        port = metrics.start_metrics_server(args.metrics_port)
+        print(f"メトリクス: http://{METRICS_CONFIG['host']}:{port}/metrics")
 
     if args.reset:
         from models import reset_all_processed
@@ -246,19 +571,49 @@ def main():
 
     processed_before = processed_count
 
-    if args.url:
-        payload_dict = json.loads(args.payload) if args.payload else {}
-        row = {
-            "url": args.url,
-            "referrer": args.referrer,
-            "method": args.method,
-            "payload": payload_dict,
-        }
-        process_single_page(row, user_agent=args.user_agent)
-        # 最初のURL処理後に未処理ページも続けて処理
-        process_pages(user_agent=args.user_agent)
-    else:
-        process_pages(user_agent=args.user_agent)
+    # 既出URLフィルタを用意（保存ファイル + 前回以降の追加分をDBから取り込み）
+    init_seen_filter()
+    try:
+        if args.url:
+            payload_dict = json.loads(args.payload) if args.payload else {}
+            row = {
+                "url": args.url,
+                "referrer": args.referrer,
+                "method": args.method,
+                "payload": payload_dict,
+            }
+            process_single_page(row, user_agent=args.user_agent)
+
+        # 指定URLの処理後も未処理ページを続けて処理
+        if args.engine == "async":
+            from async_engine import run_async_crawl
+
+            run_async_crawl(
+                user_agent=args.user_agent,
+                concurrency=args.concurrency,
+                per_host=args.per_host,
+            )
+        else:
+            process_pages(user_agent=args.user_agent, workers=args.workers)
+    finally:
+        save_seen_filter()
+        close_browser_pool()
+
+    stats = http_client.get_stats()
+    if stats["requests"]:
+        print(
+            f"HTTP: {stats['requests']} リクエスト, 新規接続 {stats['connections']} 件"
+            f" (1ページあたりのハンドシェイク {stats['handshakes_per_page']:.3f})"
+        )
+    stored = content_store.get_stats()
+    if stored["pages"]:
+        print(
+            f"本文: {stored['pages']} 件中 新規保存 {stored['stored_pages']} 件"
+            f" ({stored['bytes']} バイト中 {stored['stored_bytes']} バイト,"
+            f" 重複排除率 {stored['dedup_ratio']:.1%},"
+            f" 書き込み {stored['written_bytes']} バイト"
+            f" 圧縮率 {stored['compression_ratio']:.1f}倍)"
+        )
 
     # 実行後の件数表示
     unprocessed_after, processed_after = get_page_counts()
@@ -0,0 +1,50 @@
+import pytest
+import browser_pool
+import cdx_index
+import content_store
+import db
+import robots_handler
+import warc_store
+
+
+@pytest.fixture(autouse=True)
+def reset_db_pool():
+    """テスト間でプール内の（モック）接続を持ち越さない"""
+    db.close_pool()
+    yield
+    db.close_pool()
+
+
+@pytest.fixture(autouse=True)
+def reset_browser_pool():
+    """テスト間で（モックの）ブラウザを持ち越さない"""
+    browser_pool.close_browser_pool()
+    yield
+    browser_pool.close_browser_pool()
+
+
+@pytest.fixture(autouse=True)
+def reset_robots_cache():
+    """テスト間で robots.txt のルールのキャッシュを持ち越さない"""
+    robots_handler.clear_robots_cache()
+    yield
+    robots_handler.clear_robots_cache()
+
+
+@pytest.fixture(autouse=True)
+def reset_content_store():
+    """テスト間で保存済みの本文のハッシュと集計を持ち越さない"""
+    content_store.forget_stored()
+    content_store.reset_stats()
+    yield
+    content_store.forget_stored()
+
+
+@pytest.fixture(autouse=True)
+def reset_warc_writer():
+    """テスト間で WARC ファイルの書き込み先・読み出し用の map を持ち越さない"""
+    warc_store.close_warc_writer()
+    yield
+    warc_store.close_warc_writer()
+    warc_store.close_archive_reader()
+    cdx_index.close_archive_index()
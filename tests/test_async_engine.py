@@ -0,0 +1,374 @@
+import asyncio
+import threading
+import time
+from urllib.parse import urlparse
+
+import aiohttp
+from aiohttp import web
+
+import async_engine
+import warc_store
+from async_engine import AsyncCrawler, decode_body
+from models import ScrapedPage
+from robots_handler import RobotsUnreachable
+
+
+def run_with_server(routes, coro_factory):
+    """ローカルの aiohttp サーバーを起動して coro_factory(base_url) を実行"""
+
+    async def main():
+        app = web.Application()
+        app.add_routes(routes)
+        runner = web.AppRunner(app)
+        await runner.setup()
+        site = web.TCPSite(runner, "127.0.0.1", 0)
+        await site.start()
+        port = site._server.sockets[0].getsockname()[1]
+        try:
+            return await coro_factory(f"http://127.0.0.1:{port}")
+        finally:
+            await runner.cleanup()
+
+    return asyncio.run(main())
+
+
+def test_decode_body_japanese():
+    text = "<html><title>日本語のページ</title><body>こんにちは世界</body></html>"
+    assert decode_body(text.encode("shift_jis")) == text
+
+
+def test_fetch_get_builds_scraped_page():
+    async def handler(request):
+        assert request.headers.get("Referer") == "http://ref"
+        return web.Response(
+            body=b"<html><head><title>Hello</title></head><body>x</body></html>",
+            content_type="text/html",
+        )
+
+    async def scenario(base):
+        async with aiohttp.ClientSession() as session:
+            row = {"url": f"{base}/page", "referrer": "http://ref"}
+            return await AsyncCrawler().fetch(session, row)
+
+    page = run_with_server([web.get("/page", handler)], scenario)
+    assert isinstance(page, ScrapedPage)
+    assert page.error_message is None
+    assert page.title == "Hello"
+    assert page.status_code == 200
+    assert page.hash is not None
+
+
+def test_fetch_post_and_http_error():
+    async def post_handler(request):
+        data = await request.post()
+        return web.Response(
+            text=f"<html><title>{data['q']}</title></html>", content_type="text/html"
+        )
+
+    async def missing(request):
+        return web.Response(status=404, text="nope")
+
+    async def not_modified(request):
+        return web.Response(status=304)
+
+    async def scenario(base):
+        crawler = AsyncCrawler()
+        async with aiohttp.ClientSession() as session:
+            post = await crawler.fetch(
+                session,
+                {"url": f"{base}/form", "method": "POST", "payload": {"q": "abc"}},
+            )
+            error = await crawler.fetch(session, {"url": f"{base}/missing"})
+            cached = await crawler.fetch(
+                session,
+                {"url": f"{base}/cached", "method": "POST", "etag": '"v1"'},
+            )
+        return post, error, cached
+
+    post, error, cached = run_with_server(
+        [
+            web.post("/form", post_handler),
+            web.get("/missing", missing),
+            web.post("/cached", not_modified),
+        ],
+        scenario,
+    )
+    # POST に 304 が返っても NameError にならず、保存済みの ETag を引き継ぐ
+    assert cached.error_message is None
+    assert cached.status_code == 304 and cached.etag == '"v1"'
+    assert post.title == "abc"
+    assert post.method == "POST"
+    assert error.error_message is not None and "404" in error.error_message
+    assert error.status_code is None
+
+
+def test_run_crawls_all_claimed_rows(monkeypatch):
+    in_flight = {"now": 0, "max": 0}
+
+    async def handler(request):
+        in_flight["now"] += 1
+        in_flight["max"] = max(in_flight["max"], in_flight["now"])
+        await asyncio.sleep(0.02)
+        in_flight["now"] -= 1
+        return web.Response(
+            text="<html><title>p</title></html>", content_type="text/html"
+        )
+
+    lock = threading.Lock()
+    stored = []
+    completed = {}
+    claim_sizes = []
+
+    async def scenario(base):
+        pending = [f"{base}/p/{i}" for i in range(20)] + [f"{base}/private"]
+
+        def claim(limit, worker_id, claim_timeout, skip_hosts=()):
+            with lock:
+                claim_sizes.append(limit)
+                batch = pending[:limit]
+                del pending[:limit]
+                return [{"url": url, "referrer": None} for url in batch]
+
+        def robots(url, user_agent):
+            return (not url.endswith("/private"), 0)
+
+        def store(page):
+            with lock:
+                stored.append(page.url)
+
+        def mark(keys, errors):
+            with lock:
+                completed.update(zip(keys, errors))
+
+        monkeypatch.setattr(async_engine, "get_unprocessed_pages", claim)
+        monkeypatch.setattr(async_engine, "check_robots_rules", robots)
+        monkeypatch.setattr(async_engine.scraper, "save_page_and_links", store)
+        monkeypatch.setattr(async_engine, "mark_pages_as_processed", mark)
+        crawler = AsyncCrawler(concurrency=10, per_host=4, db_threads=2, batch_size=5)
+        await crawler.run()
+
+    run_with_server([web.get("/p/{n}", handler)], scenario)
+
+    assert len(stored) == 20
+    assert len(completed) == 21
+    errors = {url: e for url, e in completed.items() if e}
+    assert list(errors.values()) == ["Blocked by robots.txt"]
+    assert next(iter(errors)).endswith("/private")
+    assert max(claim_sizes) <= 5
+    assert 1 < in_flight["max"] <= 4
+
+
+def test_run_releases_rows_when_robots_unreachable(monkeypatch):
+    urls = ["http://down.example/a", "http://down.example/b"]
+    pending = list(urls)
+    skipped = []
+    released = []
+    completed = {}
+
+    def claim(limit, worker_id, claim_timeout, skip_hosts=()):
+        skipped.append(list(skip_hosts))
+        batch = [url for url in pending if "down.example" not in skip_hosts]
+        batch = batch[:limit]
+        for url in batch:
+            pending.remove(url)
+        return [{"url": url} for url in batch]
+
+    def robots(url, user_agent):
+        raise RobotsUnreachable("HTTP 503", retry_after=60)
+
+    def release(keys):
+        released.extend(keys)
+        pending.extend(keys)
+
+    monkeypatch.setattr(async_engine, "get_unprocessed_pages", claim)
+    monkeypatch.setattr(async_engine, "check_robots_rules", robots)
+    monkeypatch.setattr(async_engine, "release_pages", release)
+    monkeypatch.setattr(
+        async_engine,
+        "mark_pages_as_processed",
+        lambda k, e: completed.update(zip(k, e)),
+    )
+    asyncio.run(AsyncCrawler(db_threads=1).run())
+
+    # 処理済みにせず手放し、再取得の時刻まではそのホストの行を確保しない
+    assert completed == {}
+    assert sorted(released) == urls
+    assert sorted(pending) == urls
+    assert skipped[-1] == ["down.example"]
+
+
+def test_run_releases_crawl_delayed_rows(monkeypatch):
+    urls = ["http://a.example/1", "http://a.example/2", "http://b.example/1"]
+    pending = list(urls)
+    fetched = {}
+    released = []
+    completed = {}
+
+    def claim(limit, worker_id, claim_timeout, skip_hosts=()):
+        batch = [url for url in pending if urlparse(url).netloc not in skip_hosts]
+        batch = batch[:limit]
+        for url in batch:
+            pending.remove(url)
+        return [{"url": url} for url in batch]
+
+    def release(keys):
+        released.extend(keys)
+        pending.extend(keys)
+
+    async def fetch(self, session, row):
+        fetched[row["url"]] = time.monotonic()
+        return ScrapedPage(url=row["url"], content="")
+
+    monkeypatch.setattr(async_engine, "get_unprocessed_pages", claim)
+    monkeypatch.setattr(async_engine, "check_robots_rules", lambda u, ua: (True, 0.1))
+    monkeypatch.setattr(async_engine, "release_pages", release)
+    monkeypatch.setattr(async_engine.scraper, "save_page_and_links", lambda p: None)
+    monkeypatch.setattr(
+        async_engine,
+        "mark_pages_as_processed",
+        lambda k, e: completed.update(zip(k, e)),
+    )
+    monkeypatch.setattr(AsyncCrawler, "fetch", fetch)
+    asyncio.run(AsyncCrawler(db_threads=1).run())
+
+    # 同じホストの2ページ目は待たずに手放し、crawl-delay の後に取り直す
+    assert sorted(completed) == sorted(urls)
+    assert len(released) == 1 and released[0].startswith("http://a.example/")
+    a1, a2 = sorted(fetched[url] for url in urls if "a.example" in url)
+    assert a2 - a1 >= 0.09
+
+
+def test_async_fetch_sends_validators():
+    async def handler(request):
+        if request.headers.get("If-None-Match") == '"v1"':
+            return web.Response(status=304)
+        return web.Response(
+            text="<html><title>p</title></html>",
+            content_type="text/html",
+            headers={"ETag": '"v1"'},
+        )
+
+    async def scenario(base):
+        crawler = AsyncCrawler()
+        async with aiohttp.ClientSession() as session:
+            first = await crawler.fetch(session, {"url": f"{base}/p"})
+            again = await crawler.fetch(
+                session, {"url": f"{base}/p", "etag": first.etag}
+            )
+        return first, again
+
+    first, again = run_with_server([web.get("/p", handler)], scenario)
+    assert first.status_code == 200 and first.etag == '"v1"'
+    assert again.status_code == 304 and again.content is None
+    assert again.hash is None and again.etag == '"v1"'
+
+
+def test_fetch_archives_to_warc(tmp_path, monkeypatch):
+    monkeypatch.setitem(warc_store.STORAGE_CONFIG, "backend", "warc")
+    monkeypatch.setitem(warc_store.STORAGE_CONFIG, "warc_dir", str(tmp_path))
+
+    async def handler(request):
+        return web.Response(
+            text="<html><title>p</title></html>", content_type="text/html"
+        )
+
+    async def scenario(base):
+        async with aiohttp.ClientSession() as session:
+            return await AsyncCrawler().fetch(session, {"url": f"{base}/p"})
+
+    page = run_with_server([web.get("/p", handler)], scenario)
+    name, offset, length = page.warc_location
+    _, status, headers, body = warc_store.read_record(
+        str(tmp_path / name), offset, length
+    )
+    assert (status, body) == (200, b"<html><title>p</title></html>")
+    assert headers["content-type"].startswith("text/html")
+
+
+def test_fetch_truncates_large_body(monkeypatch):
+    monkeypatch.setitem(async_engine.HTTP_CONFIG, "max_body_bytes", 1000)
+    monkeypatch.setitem(async_engine.HTTP_CONFIG, "chunk_size", 256)
+
+    async def handler(request):
+        return web.Response(
+            body=b"<html><title>big</title>" + b"x" * 100_000, content_type="text/html"
+        )
+
+    async def scenario(base):
+        async with aiohttp.ClientSession() as session:
+            return await AsyncCrawler().fetch(session, {"url": f"{base}/big"})
+
+    page = run_with_server([web.get("/big", handler)], scenario)
+    assert page.truncated and page.body_size == 1000
+    assert page.title == "big" and "切り詰め" in page.error_message
+
+
+def test_fetch_slow_drip_body_stops_at_deadline(monkeypatch):
+    monkeypatch.setitem(async_engine.HTTP_CONFIG, "max_download_seconds", 0.5)
+
+    async def handler(request):
+        response = web.StreamResponse(headers={"Content-Type": "text/html"})
+        response.content_length = 1000
+        await response.prepare(request)
+        for _ in range(100):
+            await response.write(b"x")
+            await asyncio.sleep(0.1)
+        return response
+
+    async def scenario(base):
+        async with aiohttp.ClientSession() as session:
+            return await AsyncCrawler().fetch(session, {"url": f"{base}/drip"})
+
+    started = time.monotonic()
+    page = run_with_server([web.get("/drip", handler)], scenario)
+    assert time.monotonic() - started < 5
+    assert page.content == "" and "0.5 秒" in page.error_message
+
+
+def test_client_timeout_follows_config(monkeypatch):
+    monkeypatch.setitem(async_engine.HTTP_CONFIG, "timeout", 3)
+    timeout = async_engine.client_timeout()
+    assert (timeout.total, timeout.sock_connect, timeout.sock_read) == (None, 3, 3)
+
+
+def test_fetch_decodes_and_parses_off_the_event_loop(monkeypatch):
+    threads = {}
+
+    def recorder(name, func):
+        def wrapper(*args):
+            threads[name] = threading.current_thread()
+            return func(*args)
+
+        return wrapper
+
+    monkeypatch.setattr(
+        async_engine, "decode_body", recorder("decode", async_engine.decode_body)
+    )
+    monkeypatch.setattr(
+        async_engine, "parse_document", recorder("parse", async_engine.parse_document)
+    )
+
+    async def handler(request):
+        return web.Response(body=b"<title>t</title>", content_type="text/html")
+
+    async def scenario(base):
+        threads["loop"] = threading.current_thread()
+        async with aiohttp.ClientSession() as session:
+            return await AsyncCrawler().fetch(session, {"url": f"{base}/p"})
+
+    page = run_with_server([web.get("/p", handler)], scenario)
+    assert page.title == "t"
+    assert threads["decode"] is not threads["loop"]
+    assert threads["parse"] is not threads["loop"]
+
+
+def test_async_fetch_skips_non_html():
+    async def handler(request):
+        return web.Response(body=b"\x89PNG" * 1000, content_type="image/png")
+
+    async def scenario(base):
+        async with aiohttp.ClientSession() as session:
+            return await AsyncCrawler().fetch(session, {"url": f"{base}/i"})
+
+    page = run_with_server([web.get("/i", handler)], scenario)
+    assert page.content == "" and "image/png" in page.error_message
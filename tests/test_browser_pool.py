@@ -0,0 +1,136 @@
+import threading
+import time
+import types
+
+import pytest
+
+import browser_pool
+from browser_pool import BrowserPool
+
+
+class FakeBrowser:
+    def __init__(self, tracker):
+        self.tracker = tracker
+        self.connected = True
+        self.closed = False
+
+    def is_connected(self):
+        return self.connected
+
+    def new_context(self, extra_http_headers=None):
+        return FakeContext(self, extra_http_headers or {})
+
+    def close(self):
+        self.closed = True
+
+
+class FakeContext:
+    def __init__(self, browser, headers):
+        self.browser = browser
+        self.headers = headers
+
+    def new_page(self):
+        return FakePage(self)
+
+    def close(self):
+        pass
+
+
+class FakePage:
+    def __init__(self, context):
+        self.context = context
+        self.url = None
+
+    def goto(self, url, wait_until=None):
+        tracker = self.context.browser.tracker
+        with tracker["lock"]:
+            tracker["now"] += 1
+            tracker["max"] = max(tracker["max"], tracker["now"])
+        try:
+            if url.endswith("/crash"):
+                self.context.browser.connected = False
+                raise RuntimeError("Target closed")
+            time.sleep(tracker["delay"])
+            self.url = url
+        finally:
+            with tracker["lock"]:
+                tracker["now"] -= 1
+
+    def content(self):
+        referer = self.context.headers.get("Referer", "")
+        return f"<html>{self.url}|{referer}</html>"
+
+    def title(self):
+        return "T"
+
+
+@pytest.fixture
+def tracker(monkeypatch):
+    state = {"lock": threading.Lock(), "now": 0, "max": 0, "delay": 0, "browsers": []}
+
+    def launch(headless=True):
+        browser = FakeBrowser(state)
+        state["browsers"].append(browser)
+        return browser
+
+    class FakePlaywright:
+        def __enter__(self):
+            return types.SimpleNamespace(chromium=types.SimpleNamespace(launch=launch))
+
+        def __exit__(self, *exc):
+            state["stopped"] = True
+
+    monkeypatch.setattr(browser_pool, "sync_playwright", FakePlaywright)
+    return state
+
+
+def test_browser_is_reused_and_recycled(tracker):
+    pool = BrowserPool(max_pages=1, pages_per_browser=3)
+    try:
+        results = [pool.render(f"http://x/{i}", "http://ref") for i in range(7)]
+    finally:
+        pool.close()
+
+    assert results[0] == ("<html>http://x/0|http://ref</html>", "T")
+    assert pool.rendered == 7
+    assert pool.launches == 3
+    assert all(b.closed for b in tracker["browsers"])
+    assert tracker["stopped"]
+
+
+def test_crashed_browser_is_relaunched(tracker):
+    pool = BrowserPool(max_pages=1, pages_per_browser=100)
+    try:
+        pool.render("http://x/1")
+        with pytest.raises(RuntimeError):
+            pool.render("http://x/crash")
+        assert pool.render("http://x/2")[0] == "<html>http://x/2|</html>"
+    finally:
+        pool.close()
+    assert pool.launches == 2
+    assert tracker["browsers"][0].closed
+
+
+def test_concurrent_pages_are_capped(tracker):
+    tracker["delay"] = 0.02
+    pool = BrowserPool(max_pages=2)
+    threads = [
+        threading.Thread(target=pool.render, args=(f"http://x/{i}",)) for i in range(8)
+    ]
+    try:
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+    finally:
+        pool.close()
+    assert pool.rendered == 8
+    assert tracker["max"] == 2
+    assert pool.launches == 2
+
+
+def test_render_after_close_raises(tracker):
+    pool = BrowserPool()
+    pool.close()
+    with pytest.raises(RuntimeError):
+        pool.render("http://x")
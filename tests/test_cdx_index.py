@@ -0,0 +1,126 @@
+import pytest
+
+import cdx_index
+import models
+import warc_store
+from cdx_index import CDX_HEADER, CdxIndex, build_index, surt_key
+from warc_store import WarcWriter
+
+
+@pytest.mark.parametrize(
+    "url, key",
+    [
+        ("https://www.Example.com/a?b=1", "com,example)/a?b=1"),
+        ("http://example.com", "com,example)/"),
+        ("http://sub.example.com:8080/x y", "com,example,sub:8080)/x%20y"),
+        ("https://example.com:443/Path", "com,example)/Path"),
+    ],
+)
+def test_surt_key(url, key):
+    assert surt_key(url) == key
+
+
+@pytest.fixture
+def archive(tmp_path, monkeypatch):
+    """3ファイルに分かれた WARC と索引を作る"""
+    monkeypatch.setitem(warc_store.STORAGE_CONFIG, "warc_dir", str(tmp_path))
+    monkeypatch.setitem(
+        warc_store.STORAGE_CONFIG, "cdx_path", str(tmp_path / "index.cdx")
+    )
+    writer = WarcWriter(str(tmp_path), prefix="t", max_bytes=600)
+    html = {"Content-Type": "text/html; charset=utf-8"}
+    pages = [
+        ("http://b.example/2", "<html>b2</html>"),
+        ("http://a.example/1", "<html>a1 old</html>"),
+        ("http://b.example/1", "<html>b1</html>"),
+        ("http://a.example/1", "<html>a1 new</html>"),
+        ("http://a.example/日本", "<html>日本語</html>"),
+    ]
+    for url, body in pages:
+        writer.write_response(url, 200, "OK", html, body.encode("utf-8"))
+    writer.close()
+    return tmp_path, build_index()
+
+
+def test_build_index_is_sorted(archive):
+    tmp_path, count = archive
+    data = (tmp_path / "index.cdx").read_bytes()
+    assert count == 5
+    assert data.startswith(CDX_HEADER)
+    lines = data.splitlines()[1:]
+    keys = [line.split(b" ")[0] for line in lines]
+    assert keys == sorted(keys)
+    # 複数のファイルにまたがっている
+    assert len({line.split(b" ")[-1] for line in lines}) > 1
+
+
+def test_lookup_reads_single_record(archive):
+    tmp_path, _ = archive
+    index = CdxIndex(str(tmp_path / "index.cdx"))
+    assert len(index.captures("http://a.example/1")) == 2
+    entry = index.lookup("http://a.example/1")
+    assert entry.mime == "text/html" and entry.status == 200
+    page = cdx_index.load_page(entry)
+    assert page["content"] == "<html>a1 new</html>"
+    assert index.lookup("http://a.example/2") is None
+    assert index.lookup("http://zzz.example/") is None
+    assert cdx_index.get_archived_page("http://a.example/日本")["content"] == (
+        "<html>日本語</html>"
+    )
+    index.close()
+
+
+def test_bulk_iteration(archive):
+    index = cdx_index.get_archive_index()
+    assert [e.url for e in index.iter_prefix("example,b)")] == [
+        "http://b.example/1",
+        "http://b.example/2",
+    ]
+    assert len(list(index)) == 5
+    contents = [p["content"] for p in cdx_index.iter_archived_pages("example,a)")]
+    assert contents[:2] == ["<html>a1 old</html>", "<html>a1 new</html>"]
+
+
+def test_get_page_by_url_from_archive_skips_db(archive, monkeypatch):
+    def no_db():
+        raise AssertionError("DBには接続しない")
+
+    monkeypatch.setattr(models, "get_connection", no_db)
+    page = models.get_page_by_url("http://www.b.example/2", from_archive=True)
+    assert page["content"] == "<html>b2</html>"
+    assert page["url"] == "http://b.example/2"
+
+
+def test_bisect_many_lines(tmp_path):
+    path = tmp_path / "big.cdx"
+    keys = sorted(f"com,example)/p{i:05d}" for i in range(0, 6000, 3))
+    lines = [f"{k} 20240101000000 u - 200 D 10 {i} f\n" for i, k in enumerate(keys)]
+    path.write_bytes(CDX_HEADER + "".join(lines).encode())
+    index = CdxIndex(str(path))
+    for i in (0, 1, 2, 999, 1998, 1999, 5997):
+        found = index.lookup(f"http://example.com/p{i:05d}")
+        assert (found is not None) == (i % 3 == 0)
+        if found:
+            assert found.offset == keys.index(found.urlkey)
+    index.close()
+
+
+def test_index_reopens_after_rebuild(archive, monkeypatch):
+    tmp_path, _ = archive
+    first = cdx_index.get_archive_index()
+    assert cdx_index.get_archive_index() is first
+    writer = WarcWriter(str(tmp_path), prefix="u")
+    writer.write_response("http://c.example/", 200, "OK", {}, b"c")
+    writer.close()
+    build_index()
+    assert cdx_index.get_archive_index() is not first
+    assert cdx_index.get_archived_page("http://c.example/")["content"] == "c"
+
+
+def test_missing_index_returns_none(tmp_path, monkeypatch):
+    monkeypatch.setitem(
+        warc_store.STORAGE_CONFIG, "cdx_path", str(tmp_path / "missing.cdx")
+    )
+    assert cdx_index.get_archive_index() is None
+    assert models.get_page_by_url("http://a.example/", from_archive=True) is None
+    assert list(cdx_index.iter_archived_pages()) == []
@@ -0,0 +1,81 @@
+import codecs
+
+import charset_resolver
+from charset_resolver import (
+    CharsetResolver,
+    decode_body,
+    normalize_encoding,
+    sniff_meta_charset,
+)
+
+JA_TEXT = (
+    "<html><body>" + "日本語のページです。こんにちは世界。" * 20 + "</body></html>"
+)
+
+
+def forbid_detection(monkeypatch):
+    def fail(body):
+        raise AssertionError("統計的な推定は呼ばれないはず")
+
+    monkeypatch.setattr(charset_resolver, "detect_charset", fail)
+
+
+def test_normalize_encoding():
+    assert normalize_encoding("Shift_JIS") == "cp932"
+    assert normalize_encoding("ISO-8859-1") == "cp1252"
+    assert normalize_encoding("EUC-JP") == "euc_jp"
+    assert normalize_encoding("UTF-8") == "utf_8"
+    assert normalize_encoding("x-unknown") is None
+    assert normalize_encoding(None) is None
+
+
+def test_content_type_wins(monkeypatch):
+    forbid_detection(monkeypatch)
+    body = '<meta charset="utf-8">'.encode() + JA_TEXT.encode("euc_jp")
+    resolver = CharsetResolver()
+    assert resolver.resolve(body, "text/html; charset=EUC-JP") == "euc_jp"
+
+
+def test_bom_and_meta(monkeypatch):
+    forbid_detection(monkeypatch)
+    resolver = CharsetResolver()
+    assert resolver.resolve(codecs.BOM_UTF8 + b"<html>", "text/html") == "utf-8-sig"
+    meta = b'<html><head><meta http-equiv="Content-Type"'
+    meta += b' content="text/html; charset=Shift_JIS"></head>'
+    assert resolver.resolve(meta + JA_TEXT.encode("cp932")) == "cp932"
+    assert sniff_meta_charset(b'<?xml version="1.0" encoding="EUC-JP"?>') == "euc_jp"
+    # 先頭から離れた位置の宣言は見ない
+    late = b" " * (charset_resolver.SNIFF_BYTES + 10) + b'<meta charset="euc-jp">'
+    assert sniff_meta_charset(late) is None
+
+
+def test_utf8_without_declaration_skips_detection(monkeypatch):
+    forbid_detection(monkeypatch)
+    assert decode_body(JA_TEXT.encode("utf-8"), "text/html") == JA_TEXT
+
+
+def test_detection_result_is_remembered_per_host(monkeypatch):
+    calls = []
+    original = charset_resolver.detect_charset
+
+    def counting(body):
+        calls.append(body)
+        return original(body)
+
+    monkeypatch.setattr(charset_resolver, "detect_charset", counting)
+    resolver = CharsetResolver()
+    body = JA_TEXT.encode("cp932")
+    assert resolver.resolve(body, "text/html", "a.example") == "cp932"
+    assert resolver.resolve(body, "text/html", "a.example") == "cp932"
+    assert len(calls) == 1
+    resolver.resolve(body, "text/html", "b.example")
+    assert len(calls) == 2
+
+
+def test_host_cache_is_bounded(monkeypatch):
+    monkeypatch.setattr(charset_resolver, "detect_charset", lambda body: "cp932")
+    resolver = CharsetResolver(host_cache_size=2)
+    body = JA_TEXT.encode("cp932")
+    for host in ("a", "b", "c"):
+        resolver.resolve(body, None, host)
+    assert list(resolver._hosts) == ["b", "c"]
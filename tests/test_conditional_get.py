@@ -0,0 +1,92 @@
+import models
+import scraper
+from models import ScrapedPage
+
+HTML = "<html><head><title>Static</title></head><body>x</body></html>"
+
+
+class MockResp:
+    def __init__(self, status_code, headers):
+        self.status_code = status_code
+        self.headers = headers
+        self.text = HTML if status_code == 200 else ""
+        self.content = self.text.encode("utf-8")
+
+    def raise_for_status(self):
+        return None
+
+    def iter_content(self, chunk_size):
+        yield self.content
+
+    def close(self):
+        pass
+
+
+def test_first_fetch_stores_validators(monkeypatch):
+    headers = {"ETag": '"v1"', "Last-Modified": "Mon, 01 Jan 2024 00:00:00 GMT"}
+    monkeypatch.setattr(
+        scraper.http_client, "get", lambda *a, **k: MockResp(200, headers)
+    )
+    page = scraper.scrape_page("https://x.com/")
+    assert (page.etag, page.last_modified) == ('"v1"', headers["Last-Modified"])
+    assert page.to_dict()["etag"] == '"v1"'
+
+
+def test_not_modified_skips_parse_and_hash(monkeypatch):
+    sent = {}
+
+    def get(url, headers=None, **kwargs):
+        sent.update(headers)
+        return MockResp(304, {})
+
+    def fail(*args):
+        raise AssertionError("304 では呼ばれない")
+
+    monkeypatch.setattr(scraper.http_client, "get", get)
+    monkeypatch.setattr(scraper, "parse_document", fail)
+    monkeypatch.setattr(scraper, "get_hash", fail)
+    row = {"url": "https://x.com/", "etag": '"v1"', "last_modified": "lm"}
+    page = scraper.fetch_page(row)
+
+    assert sent == {"If-None-Match": '"v1"', "If-Modified-Since": "lm"}
+    assert page.status_code == 304 and page.content is None
+    assert (page.etag, page.last_modified) == ('"v1"', "lm")
+    assert scraper.is_not_modified(page)
+
+
+def test_not_modified_only_touches_fetched_at(monkeypatch):
+    touched = []
+    monkeypatch.setattr(scraper, "touch_page", touched.append)
+    monkeypatch.setattr(scraper, "save_page_to_db", lambda p: 1 / 0)
+    monkeypatch.setattr(scraper, "extract_and_save_links", lambda p: 1 / 0)
+    page = ScrapedPage(url="https://x.com/", status_code=304)
+    scraper.save_page_and_links(page)
+    assert touched == ["https://x.com/"]
+    assert scraper._describe_result(page) == " (not modified)"
+
+
+def test_touch_page_updates_only_fetched_at(monkeypatch):
+    executed = []
+
+    class Cursor:
+        def execute(self, sql, params):
+            executed.append((sql, params))
+
+        def close(self):
+            pass
+
+    class Conn:
+        def cursor(self):
+            return Cursor()
+
+        def commit(self):
+            pass
+
+        def close(self):
+            pass
+
+    monkeypatch.setattr(models, "get_connection", Conn)
+    models.touch_page("https://x.com/")
+    ((sql, params),) = executed
+    assert sql == "UPDATE scraped_pages SET fetched_at = %s WHERE url_hash = %s"
+    assert params[1] == models.url_hash("https://x.com/")
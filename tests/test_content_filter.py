@@ -0,0 +1,85 @@
+import pytest
+
+import content_filter
+import scraper
+from link_extractor import parse_document
+
+
+class StreamResp:
+    def __init__(self, content_type, body=b"", status_code=200):
+        self.status_code = status_code
+        self.headers = {"Content-Type": content_type}
+        self.body = body
+        self.read = False
+        self.closed = False
+
+    def raise_for_status(self):
+        return None
+
+    def iter_content(self, chunk_size):
+        self.read = True
+        yield self.body
+
+    def close(self):
+        self.closed = True
+
+
+@pytest.fixture(autouse=True)
+def no_handlers():
+    yield
+    content_filter.unregister_handler("application/pdf")
+
+
+@pytest.mark.parametrize(
+    "content_type, markup",
+    [
+        ("text/html; charset=utf-8", True),
+        ("application/xhtml+xml", True),
+        ("application/rss+xml", True),
+        ("TEXT/XML", True),
+        (None, True),
+        ("application/pdf", False),
+        ("image/png", False),
+    ],
+)
+def test_is_markup(content_type, markup):
+    assert content_filter.is_markup(content_type) is markup
+
+
+def test_binary_links_are_not_enqueued():
+    html = (
+        "<a href='/a/page'>p</a><a href='/a/doc.PDF'>pdf</a>"
+        "<a href='/a/img.jpg?x=1'>img</a><a href='/a/feed.xml'>feed</a>"
+    )
+    links = [u for u, _ in parse_document(html, "http://h/a/").links]
+    assert links == ["http://h/a/page", "http://h/a/feed.xml"]
+
+    # ハンドラーを登録した種類は登録する
+    content_filter.register_handler("application/pdf", lambda *a: None)
+    links = [u for u, _ in parse_document(html, "http://h/a/").links]
+    assert "http://h/a/doc.PDF" in links
+
+
+def test_non_html_response_is_closed_unread(monkeypatch):
+    resp = StreamResp("application/octet-stream", b"\0" * 100)
+    monkeypatch.setattr(scraper.http_client, "get", lambda *a, **k: resp)
+    monkeypatch.setattr(scraper, "parse_document", lambda *a: 1 / 0)
+    page = scraper.scrape_page("http://h/file")
+    assert not resp.read and resp.closed
+    assert page.status_code == 200 and page.content == ""
+    assert "application/octet-stream" in page.error_message
+
+
+def test_handler_receives_body(monkeypatch):
+    resp = StreamResp("application/pdf", b"%PDF-1.4 text")
+    monkeypatch.setattr(scraper.http_client, "get", lambda *a, **k: resp)
+    calls = []
+
+    def handler(url, content_type, body):
+        calls.append((url, content_type, body))
+        return "extracted text"
+
+    content_filter.register_handler("application/pdf", handler)
+    page = scraper.scrape_page("http://h/doc.pdf")
+    assert calls == [("http://h/doc.pdf", "application/pdf", b"%PDF-1.4 text")]
+    assert page.content == "extracted text" and page.error_message is None
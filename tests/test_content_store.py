@@ -0,0 +1,85 @@
+import zlib
+
+import pytest
+
+import content_store
+import models
+from content_store import compress_content, decode_row, decompress_content
+
+HTML = "<html><body>" + "<p>こんにちは、世界</p>\n" * 500 + "</body></html>"
+
+
+def test_zlib_round_trip_and_level():
+    encoded = HTML.encode("utf-8")
+    fast = compress_content(encoded, "zlib", 1)
+    best = compress_content(encoded, "zlib", 9)
+    assert fast[:1] == b"z" and best[:1] == b"z"
+    assert len(best) <= len(fast) < len(encoded) / 5
+    assert decompress_content(best) == HTML
+    # DB からは bytearray で返ることがある
+    assert decompress_content(bytearray(fast)) == HTML
+
+
+def test_uncompressed_mode_and_markers():
+    assert compress_content(b"x", "", 6) is None
+    assert decompress_content(b"r" + HTML.encode("utf-8")) == HTML
+    with pytest.raises(ValueError):
+        decompress_content(b"?" + zlib.compress(b"x"))
+    with pytest.raises(ValueError):
+        compress_content(b"x", "lzma", None)
+
+
+def test_zstd_requires_zstandard(monkeypatch):
+    monkeypatch.setattr(content_store, "zstandard", None)
+    with pytest.raises(RuntimeError):
+        compress_content(b"x", "zstd", 3)
+    with pytest.raises(RuntimeError):
+        decompress_content(b"s\x28\xb5\x2f\xfd")
+
+
+def test_decode_row_keeps_legacy_rows():
+    legacy = {"url": "u", "content": "<html>old</html>", "content_body": None}
+    assert decode_row(legacy) == {"url": "u", "content": "<html>old</html>"}
+    body = compress_content(HTML.encode("utf-8"), "zlib", 6)
+    row = decode_row({"url": "u", "content": None, "content_body": body})
+    assert row == {"url": "u", "content": HTML}
+    assert decode_row(None) is None
+
+
+def test_get_page_by_id_decompresses(monkeypatch):
+    body = compress_content(HTML.encode("utf-8"), "zlib", 6)
+
+    class Cursor:
+        def execute(self, sql, params=None):
+            self.sql = sql
+
+        def fetchone(self):
+            return {"id": 1, "content": None, "content_body": body}
+
+        def close(self):
+            pass
+
+    class Conn:
+        def cursor(self, dictionary=False):
+            return Cursor()
+
+        def close(self):
+            pass
+
+    monkeypatch.setattr(models, "get_connection", Conn)
+    assert models.get_page_by_id(1) == {"id": 1, "content": HTML}
+
+
+def test_stats_report_compression(monkeypatch):
+    class Cursor:
+        rowcount = 1
+
+        def execute(self, sql, params):
+            self.params = params
+
+    monkeypatch.setitem(content_store.STORAGE_CONFIG, "compression", "zlib")
+    cursor = Cursor()
+    content_store.store_content(cursor, HTML)
+    stats = content_store.get_stats()
+    assert stats["written_bytes"] == len(cursor.params[2])
+    assert stats["compression_ratio"] > 5
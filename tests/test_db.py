@@ -0,0 +1,159 @@
+import threading
+from unittest.mock import MagicMock, patch
+
+import pytest
+from mysql.connector import errors
+
+import db
+import models
+
+
+def make_pool(**kwargs):
+    params = {
+        "pool_size": 2,
+        "timeout": 0.2,
+        "ping_interval": 60,
+        "reconnect_attempts": 2,
+        "reconnect_delay": 0,
+    }
+    params.update(kwargs)
+    return db.ConnectionPool({"host": "localhost"}, **params)
+
+
+@patch("db.mysql.connector.connect")
+def test_connection_is_reused(mock_connect):
+    mock_connect.side_effect = lambda **kw: MagicMock()
+    pool = make_pool()
+
+    conn = pool.get_connection()
+    raw = conn._raw
+    conn.close()
+    conn2 = pool.get_connection()
+
+    assert conn2._raw is raw
+    assert mock_connect.call_count == 1
+    raw.rollback.assert_called_once()
+    raw.close.assert_not_called()
+
+
+@patch("db.mysql.connector.connect")
+def test_release_skips_rollback_outside_transaction(mock_connect):
+    mock_connect.side_effect = lambda **kw: MagicMock(in_transaction=False)
+    pool = make_pool()
+    conn = pool.get_connection()
+    raw = conn._raw
+    conn.close()
+    raw.rollback.assert_not_called()
+    assert pool.get_connection()._raw is raw
+
+
+@patch("db.mysql.connector.connect")
+def test_close_twice_returns_once(mock_connect):
+    mock_connect.side_effect = lambda **kw: MagicMock()
+    pool = make_pool(pool_size=1)
+    conn = pool.get_connection()
+    conn.close()
+    conn.close()
+    assert len(pool._idle) == 1
+
+
+@patch("db.mysql.connector.connect")
+def test_pool_exhausted_raises(mock_connect):
+    mock_connect.side_effect = lambda **kw: MagicMock()
+    pool = make_pool(pool_size=1, timeout=0.05)
+    pool.get_connection()
+    with pytest.raises(errors.PoolError):
+        pool.get_connection()
+
+
+@patch("db.mysql.connector.connect")
+def test_waiter_gets_released_connection(mock_connect):
+    mock_connect.side_effect = lambda **kw: MagicMock()
+    pool = make_pool(pool_size=1, timeout=2)
+    conn = pool.get_connection()
+    raw = conn._raw
+    threading.Timer(0.05, conn.close).start()
+    conn2 = pool.get_connection()
+    assert conn2._raw is raw
+
+
+@patch("db.mysql.connector.connect")
+def test_broken_connection_is_discarded(mock_connect):
+    mock_connect.side_effect = lambda **kw: MagicMock()
+    pool = make_pool(pool_size=1)
+    conn = pool.get_connection()
+    raw = conn._raw
+    raw.rollback.side_effect = errors.OperationalError("lost")
+    conn.close()
+
+    raw.close.assert_called_once()
+    assert pool._size == 0
+    assert pool.get_connection()._raw is not raw
+
+
+@patch("db.mysql.connector.connect")
+def test_idle_connection_is_pinged(mock_connect):
+    mock_connect.side_effect = lambda **kw: MagicMock()
+    pool = make_pool(ping_interval=0)
+    conn = pool.get_connection()
+    raw = conn._raw
+    conn.close()
+    assert pool.get_connection()._raw is raw
+    raw.ping.assert_called_once_with(reconnect=True, attempts=2, delay=0)
+
+
+@patch("db.mysql.connector.connect")
+def test_dead_connection_is_replaced(mock_connect):
+    mock_connect.side_effect = lambda **kw: MagicMock()
+    pool = make_pool(ping_interval=0)
+    conn = pool.get_connection()
+    raw = conn._raw
+    raw.ping.side_effect = errors.InterfaceError("gone")
+    conn.close()
+
+    assert pool.get_connection()._raw is not raw
+    assert mock_connect.call_count == 2
+
+
+@patch("db.mysql.connector.connect")
+def test_connect_retries_then_succeeds(mock_connect):
+    good = MagicMock()
+    mock_connect.side_effect = [errors.InterfaceError("refused"), good]
+    pool = make_pool()
+    assert pool.get_connection()._raw is good
+
+
+@patch("db.mysql.connector.connect")
+def test_connect_failure_frees_slot(mock_connect):
+    mock_connect.side_effect = errors.InterfaceError("refused")
+    pool = make_pool(pool_size=1)
+    with pytest.raises(errors.InterfaceError):
+        pool.get_connection()
+    assert pool._size == 0
+
+
+@patch("mysql.connector.connect")
+def test_models_share_one_connection(mock_connect):
+    mock_conn = MagicMock()
+    mock_connect.return_value = mock_conn
+    mock_conn.cursor.return_value.fetchone.return_value = None
+
+    models.exists_in_db("https://example.com/a")
+    models.exists_in_db("https://example.com/b")
+    models.mark_page_as_processed("https://example.com/a")
+
+    assert mock_connect.call_count == 1
+
+
+@patch("db.mysql.connector.connect")
+def test_resize_shrinks_idle_connections(mock_connect):
+    mock_connect.side_effect = lambda **kw: MagicMock()
+    pool = make_pool(pool_size=3)
+    conns = [pool.get_connection() for _ in range(3)]
+    for conn in conns:
+        conn.close()
+
+    pool.resize(1)
+
+    assert pool._size == 1
+    assert len(pool._idle) == 1
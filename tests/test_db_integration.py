@@ -5,6 +5,7 @@ from models import (
     save_page_to_db,
     get_unprocessed_page,
     mark_page_as_processed,
+    url_hash,
 )
 
 
@@ -59,9 +60,10 @@ class TestDBIntegration(unittest.TestCase):
 
         mock_cursor.execute.assert_called_with(
             "UPDATE scraped_pages"
-            " SET processed = TRUE, error_message = %s"
-            " WHERE url = %s",
-            ("No error", "https://example.com"),
+            " SET processed = TRUE, error_message = %s,"
+            " claimed_by = NULL, claimed_at = NULL"
+            " WHERE url_hash = %s",
+            ("No error", url_hash("https://example.com")),
         )
         mock_conn.commit.assert_called()
 
@@ -3,55 +3,63 @@ from unittest.mock import patch, MagicMock
 from fetch_and_store_robots import fetch_and_store_robots, scrape
 import requests
 
+import robots_handler
+from robots_handler import RobotsResponse, RobotsUnreachable
+
 
 class TestFetchAndStoreRobots(unittest.TestCase):
 
-    @patch("fetch_and_store_robots.mysql.connector.connect")
-    @patch("fetch_and_store_robots.RobotFileParser")
-    def test_fetch_and_store_robots_success(self, mock_rfp_class, mock_connect):
-        # モックRobotFileParserの設定
-        mock_rfp = MagicMock()
-        mock_rfp.disallow_all = ["/private"]
-        mock_rfp.allow_all = ["/public"]
-        mock_rfp.crawl_delay.return_value = 10
-        mock_rfp_class.return_value = mock_rfp
-
-        # モックDB接続とカーソル
+    def test_delegates_to_robots_handler(self):
+        # 時間・サイズの上限や再取得間隔のない重複実装を使わない
+        self.assertIs(fetch_and_store_robots, robots_handler.fetch_and_store_robots)
+
+    @patch("robots_handler.mysql.connector.connect")
+    @patch("robots_handler.download_robots_txt")
+    def test_fetch_and_store_robots_success(self, mock_download, mock_connect):
+        mock_download.return_value = RobotsResponse(
+            200,
+            "User-agent: *\nDisallow: /private\nAllow: /public\nCrawl-delay: 10\n",
+            None,
+            None,
+            None,
+        )
         mock_conn = MagicMock()
         mock_cursor = MagicMock()
         mock_connect.return_value = mock_conn
         mock_conn.cursor.return_value = mock_cursor
+        mock_cursor.fetchone.return_value = None
 
-        # 関数呼び出し
         fetch_and_store_robots("example.com")
 
-        # RobotFileParserの呼び出し確認
-        mock_rfp.set_url.assert_called_once_with("https://example.com/robots.txt")
-        mock_rfp.read.assert_called_once()
-
-        # SQL実行確認
-        self.assertTrue(mock_cursor.execute.called)
+        mock_download.assert_called_once_with(
+            "https://example.com/robots.txt", None, None
+        )
+        params = mock_cursor.execute.call_args[0][1]
+        self.assertEqual(
+            params[:4], ("example.com", "MyScraperBot", "/private", "/public")
+        )
+        self.assertEqual(params[5], 10)
         self.assertTrue(mock_conn.commit.called)
-        self.assertTrue(mock_cursor.close.called)
-        self.assertTrue(mock_conn.close.called)
 
-    @patch("fetch_and_store_robots.mysql.connector.connect")
-    @patch("fetch_and_store_robots.RobotFileParser")
-    def test_fetch_and_store_robots_failure(self, mock_rfp_class, mock_connect):
-        # RobotFileParser.read() が例外を投げるケース
-        mock_rfp = MagicMock()
-        mock_rfp.read.side_effect = Exception("robots.txt unreachable")
-        mock_rfp_class.return_value = mock_rfp
-
-        # DB接続は呼ばれない想定
-        mock_connect.return_value = MagicMock()
+    @patch("robots_handler.mysql.connector.connect")
+    @patch(
+        "robots_handler.download_robots_txt",
+        side_effect=RobotsUnreachable("robots.txt unreachable"),
+    )
+    def test_fetch_and_store_robots_failure(self, mock_download, mock_connect):
+        mock_conn = MagicMock()
+        mock_cursor = MagicMock()
+        mock_connect.return_value = mock_conn
+        mock_conn.cursor.return_value = mock_cursor
+        mock_cursor.fetchone.return_value = None
 
-        # 標準出力の確認（必要なら capsys を使う）
         fetch_and_store_robots("invalid-domain.com")
 
-        # read() が例外を投げたことを確認
-        mock_rfp.read.assert_called_once()
-        mock_connect.assert_not_called()
+        # 以前のルールがないので全体を不許可として記録し、再取得を後回しにする
+        sql, params = mock_cursor.execute.call_args[0]
+        self.assertIn("'/'", sql)
+        self.assertEqual(params[:2], ("invalid-domain.com", "MyScraperBot"))
+        self.assertEqual(params[-1], 1)
 
     def dummy_get(self, url, headers=None):
         class DummyResponse:
@@ -0,0 +1,87 @@
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+import http_client
+
+
+class KeepAliveHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def _reply(self):
+        length = int(self.headers.get("Content-Length") or 0)
+        if length:
+            self.rfile.read(length)
+        body = b"<html><title>ok</title></html>"
+        self.send_response(200)
+        self.send_header("Content-Type", "text/html")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    do_GET = _reply
+    do_POST = _reply
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def server():
+    httpd = ThreadingHTTPServer(("127.0.0.1", 0), KeepAliveHandler)
+    thread = threading.Thread(target=httpd.serve_forever, daemon=True)
+    thread.start()
+    http_client.close()
+    http_client.reset_stats()
+    try:
+        yield f"http://127.0.0.1:{httpd.server_address[1]}"
+    finally:
+        http_client.close()
+        http_client.reset_stats()
+        httpd.shutdown()
+        httpd.server_close()
+
+
+def test_connection_is_reused_for_same_host(server):
+    for i in range(5):
+        assert http_client.get(f"{server}/p/{i}").status_code == 200
+    http_client.post(f"{server}/form", data={"q": "x"})
+
+    stats = http_client.get_stats()
+    assert stats["requests"] == 6
+    assert stats["connections"] == 1
+    assert stats["handshakes_per_page"] == pytest.approx(1 / 6)
+
+
+def test_threads_have_own_session_but_share_pool(server):
+    sessions = []
+
+    def work():
+        sessions.append(http_client.get_session())
+        for i in range(3):
+            http_client.get(f"{server}/t/{i}")
+
+    threads = [threading.Thread(target=work) for _ in range(4)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+
+    assert len({id(s) for s in sessions}) == 4
+    assert len({id(s.get_adapter(server)) for s in sessions}) == 1
+    stats = http_client.get_stats()
+    assert stats["requests"] == 12
+    assert 1 <= stats["connections"] <= 4
+
+
+def test_default_timeout_is_applied(monkeypatch):
+    captured = {}
+
+    class DummySession:
+        def get(self, url, **kwargs):
+            captured.update(kwargs)
+
+    monkeypatch.setattr(http_client, "get_session", lambda: DummySession())
+    http_client.get("http://x", headers={})
+    assert captured["timeout"] == http_client.HTTP_CONFIG["timeout"]
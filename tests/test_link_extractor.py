@@ -1,5 +1,5 @@
 from bs4 import BeautifulSoup
-from link_extractor import extract_links
+from link_extractor import extract_links, extract_title, parse_document
 
 
 def test_extract_links_basic():
@@ -65,3 +65,34 @@ def test_extract_links_relative_and_absolute():
 
     # 外部リンクは仕様上返らないことを確認
     assert all("other.com" not in url for url, _ in links)
+
+
+def test_parse_document_title_links_and_text():
+    html = """
+    <html><head><title>  Top Page  </title></head>
+    <body><p>Hello <b>world</b></p><a href="/a">A</a>
+    <a href="http://other.com/b">B</a></body></html>
+    """
+    document = parse_document(html, "http://example.com/")
+    assert document.title == "Top Page"
+    assert document.links == [("http://example.com/a", "A")]
+    assert document.text == "Top Page Hello world A B"
+    # 2回目以降は同じ結果を使い回す
+    assert document.links is document.links
+
+
+def test_parse_document_without_base_or_title():
+    document = parse_document("<html><body>x</body></html>")
+    assert document.title is None
+    assert document.links == []
+    assert parse_document(None).title is None
+
+
+def test_parse_document_xml():
+    xml = '<?xml version="1.0"?><rss><channel><title>Feed</title></channel></rss>'
+    assert parse_document(xml).title == "Feed"
+
+
+def test_extract_title():
+    assert extract_title("<title>T</title>") == "T"
+    assert extract_title("<p>no title</p>") is None
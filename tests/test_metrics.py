@@ -0,0 +1,190 @@
+import urllib.error
+import urllib.request
+
+import pytest
+
+import http_client
+import metrics
+import models
+from metrics import Counter, Gauge, Histogram, Registry
+
+
+@pytest.fixture
+def registry():
+    return Registry()
+
+
+def test_counter_and_gauge_exposition(registry):
+    pages = Counter("t_pages_total", "処理したページ数", ["result"], registry=registry)
+    pages.labels("ok").inc()
+    pages.labels("ok").inc(2)
+    pages.labels('e"rr').inc()
+    depth = Gauge("t_depth", "未処理", registry=registry)
+    depth.set(5)
+    depth.dec()
+    with pytest.raises(ValueError):
+        Counter("t_pages_total", "重複", registry=registry)
+    assert registry.expose() == (
+        "# HELP t_pages_total 処理したページ数\n"
+        "# TYPE t_pages_total counter\n"
+        't_pages_total{result="ok"} 3\n'
+        't_pages_total{result="e\\"rr"} 1\n'
+        "# HELP t_depth 未処理\n"
+        "# TYPE t_depth gauge\n"
+        "t_depth 4\n"
+    )
+
+
+def test_histogram_buckets_are_cumulative(registry):
+    latency = Histogram("t_seconds", "秒数", buckets=[0.1, 1], registry=registry)
+    for value in (0.05, 0.1, 0.5, 3):
+        latency.observe(value)
+    text = registry.expose()
+    assert 't_seconds_bucket{le="0.1"} 2\n' in text
+    assert 't_seconds_bucket{le="1"} 3\n' in text
+    assert 't_seconds_bucket{le="+Inf"} 4\n' in text
+    assert "t_seconds_sum 3.65\n" in text and "t_seconds_count 4\n" in text
+
+
+def test_label_sets_are_capped(registry, monkeypatch):
+    monkeypatch.setitem(metrics.METRICS_CONFIG, "max_label_sets", 2)
+    fetch = Histogram("t_fetch", "取得", ["host"], registry=registry)
+    for host in ("a", "b", "c", "d"):
+        fetch.labels(host).observe(0.01)
+    text = registry.expose()
+    assert 'host="c"' not in text
+    assert 't_fetch_count{host="other"} 2' in text
+
+
+def test_function_values(registry):
+    calls = []
+
+    def count():
+        calls.append(1)
+        return len(calls)
+
+    gauge = Gauge("t_frontier", "未処理", registry=registry)
+    gauge.set_function(metrics.cached(count, 60))
+    assert "t_frontier 1\n" in registry.expose()
+    assert "t_frontier 1\n" in registry.expose()  # 60秒は使い回す
+    gauge.set_function(lambda: 1 / 0)
+    assert "t_frontier NaN\n" in registry.expose()
+
+
+def test_models_functions_are_timed(monkeypatch):
+    class Cursor:
+        def execute(self, sql, params):
+            pass
+
+        def close(self):
+            pass
+
+    class Conn:
+        def cursor(self):
+            return Cursor()
+
+        def commit(self):
+            pass
+
+        def close(self):
+            pass
+
+    monkeypatch.setattr(models, "get_connection", Conn)
+    child = metrics.DB_SECONDS.labels("touch_page")
+    before = sum(child.counts)
+    models.touch_page("http://a/")
+    assert sum(child.counts) == before + 1
+    assert models.touch_page.__name__ == "touch_page"
+
+
+def test_frontier_gauge_is_not_timed(monkeypatch):
+    class Cursor:
+        def execute(self, sql):
+            self.sql = sql
+
+        def fetchone(self):
+            return (5,)
+
+        def close(self):
+            pass
+
+    class Conn:
+        def cursor(self):
+            return Cursor()
+
+        def close(self):
+            pass
+
+    monkeypatch.setattr(models, "get_connection", Conn)
+    before = sum(sum(c.counts) for c in metrics.DB_SECONDS._children.values())
+    # /metrics を読むたびのクエリはクロールの DB 時間に数えない
+    assert models._count_unprocessed() == 5
+    after = sum(sum(c.counts) for c in metrics.DB_SECONDS._children.values())
+    assert after == before
+
+
+def test_timed_generator_measures_iteration(registry, monkeypatch):
+    now = [0.0]
+    monkeypatch.setattr(metrics.time, "perf_counter", lambda: now[0])
+    scan = Histogram("t_scan", "走査", ["function"], registry=registry)
+
+    @metrics.timed(scan)
+    def rows():
+        now[0] += 1
+        yield 1
+        now[0] += 2
+        yield 2
+
+    child = scan.labels("rows")
+    generator = rows()
+    assert next(generator) == 1
+    now[0] += 100  # 利用側の処理時間は含めない
+    assert sum(child.counts) == 0
+    generator.close()
+    assert sum(child.counts) == 1 and child.sum == 1
+    assert list(rows()) == [1, 2] and child.sum == 4
+    assert models.get_all_urls.__name__ == "get_all_urls"
+
+
+def test_rate_uses_recent_window(monkeypatch):
+    now, total = [0.0], [0]
+    monkeypatch.setattr(metrics.time, "monotonic", lambda: now[0])
+    rate = metrics._Rate(lambda: total[0], 60)
+    now[0], total[0] = 1000, 1000
+    assert rate() == 1
+    now[0], total[0] = 1070, 1700
+    assert rate() == 10  # 直近の出力（70秒前）からの増え方
+    now[0], total[0] = 1080, 1700
+    assert rate() == 700 / 80  # 60秒以上さかのぼれる記録（1000秒）から
+
+
+def test_downloaded_bytes_are_counted():
+    child = metrics.DOWNLOADED_BYTES._children[()]
+    before = child.value
+    reader = http_client.BodyReader(max_bytes=0, max_seconds=0)
+    reader.feed(b"x" * 123)
+    reader.result()
+    assert child.value == before + 123
+
+
+def test_metrics_endpoint(monkeypatch):
+    monkeypatch.setattr(metrics.FRONTIER_PAGES, "_function", lambda: 7)
+    port = metrics.start_metrics_server(0, "127.0.0.1")
+    try:
+        assert metrics.start_metrics_server(0) == port
+        url = f"http://127.0.0.1:{port}"
+        with urllib.request.urlopen(f"{url}/metrics") as resp:
+            assert resp.headers["Content-Type"] == metrics.CONTENT_TYPE
+            text = resp.read().decode("utf-8")
+        assert "scrape_frontier_pages 7\n" in text
+        for name in (
+            "scrape_fetch_seconds",
+            "scrape_db_seconds",
+            "scrape_robots_cache_hit_ratio",
+            "scrape_pages_per_second",
+        ):
+            assert f"# TYPE {name} " in text
+        with pytest.raises(urllib.error.HTTPError):
+            urllib.request.urlopen(f"{url}/other")
+    finally:
+        metrics.stop_metrics_server()
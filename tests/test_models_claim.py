@@ -0,0 +1,169 @@
+import json
+import models
+
+
+class DummyCursor:
+    def __init__(self, fetch_all_result=None):
+        self.fetch_all_result = fetch_all_result or []
+        self.executed = []
+
+    def execute(self, sql, params=None):
+        self.executed.append((sql, params))
+
+    def fetchall(self):
+        return self.fetch_all_result
+
+    def close(self):
+        pass
+
+
+class DummyConn:
+    def __init__(self, cursor_obj):
+        self.cursor_obj = cursor_obj
+        self.committed = False
+        self.isolation_level = None
+
+    def cursor(self, dictionary=False):
+        return self.cursor_obj
+
+    def start_transaction(self, isolation_level=None):
+        self.isolation_level = isolation_level
+
+    def commit(self):
+        self.committed = True
+
+    def rollback(self):
+        pass
+
+    def close(self):
+        pass
+
+
+def patch_conn(monkeypatch, cursor):
+    conn = DummyConn(cursor)
+    monkeypatch.setattr(models.mysql.connector, "connect", lambda **kwargs: conn)
+    return conn
+
+
+def test_get_unprocessed_pages_claims_rows(monkeypatch):
+    row = {
+        "id": 7,
+        "url": "http://example.com/a",
+        "referrer": None,
+        "method": "post",
+        "payload": json.dumps({"q": 1}),
+        "etag": '"abc"',
+        "last_modified": None,
+    }
+    cursor = DummyCursor(fetch_all_result=[row])
+    conn = patch_conn(monkeypatch, cursor)
+
+    result = models.get_unprocessed_pages(1, "host:1:0", claim_timeout=30)
+
+    assert result == [
+        {
+            "id": 7,
+            "url": "http://example.com/a",
+            "referrer": None,
+            "method": "POST",
+            "payload": {"q": 1},
+            "etag": '"abc"',
+            "last_modified": None,
+        }
+    ]
+    select_sql, select_params = cursor.executed[0]
+    assert "FOR UPDATE SKIP LOCKED" in select_sql
+    assert select_params == (30, 1)
+    update_sql, update_params = cursor.executed[1]
+    assert "SET claimed_by = %s" in update_sql and "id IN (%s)" in update_sql
+    assert update_params == ("host:1:0", 7)
+    assert conn.committed
+    assert conn.isolation_level == "READ COMMITTED"
+
+
+def test_get_unprocessed_pages_empty(monkeypatch):
+    cursor = DummyCursor()
+    conn = patch_conn(monkeypatch, cursor)
+
+    assert models.get_unprocessed_pages(1, "host:1:0") == []
+    assert len(cursor.executed) == 1
+    assert conn.committed
+
+
+def test_get_unprocessed_pages_batch(monkeypatch):
+    rows = [
+        {"id": i, "url": f"http://example.com/{i}", "referrer": None} for i in (3, 4, 9)
+    ]
+    cursor = DummyCursor(fetch_all_result=rows)
+    patch_conn(monkeypatch, cursor)
+
+    result = models.get_unprocessed_pages(3, worker_id="w1")
+
+    assert [r["id"] for r in result] == [3, 4, 9]
+    assert all(r["method"] == "GET" and r["payload"] == {} for r in result)
+    assert len(cursor.executed) == 2
+    update_sql, update_params = cursor.executed[1]
+    assert "id IN (%s, %s, %s)" in update_sql
+    assert update_params == ("w1", 3, 4, 9)
+
+
+def test_get_unprocessed_pages_skips_hosts(monkeypatch):
+    cursor = DummyCursor()
+    patch_conn(monkeypatch, cursor)
+
+    models.get_unprocessed_pages(5, worker_id="w1", skip_hosts=["a.example", "b:8080"])
+
+    select_sql, select_params = cursor.executed[0]
+    assert "NOT IN (%s, %s)" in select_sql
+    assert select_params == (600, "a.example", "b:8080", 5)
+
+
+def test_release_pages_ids_and_urls(monkeypatch):
+    cursor = DummyCursor()
+    conn = patch_conn(monkeypatch, cursor)
+
+    models.release_pages([3, "http://example.com/x"])
+
+    assert conn.committed
+    id_sql, id_params = cursor.executed[0]
+    assert "claimed_by = NULL" in id_sql
+    assert "WHERE id IN (%s) AND processed = FALSE" in id_sql
+    assert id_params == (3,)
+    url_sql, url_params = cursor.executed[1]
+    assert "WHERE url_hash IN (%s) AND processed = FALSE" in url_sql
+    assert url_params == (models.url_hash("http://example.com/x"),)
+
+
+def test_mark_pages_as_processed_ids_and_urls(monkeypatch):
+    cursor = DummyCursor()
+    conn = patch_conn(monkeypatch, cursor)
+
+    models.mark_pages_as_processed([1, "http://example.com/x", 2], [None, "e1", "e2"])
+
+    assert conn.committed
+    assert len(cursor.executed) == 2
+    id_sql, id_params = cursor.executed[0]
+    assert "CASE id WHEN %s THEN %s WHEN %s THEN %s END" in id_sql
+    assert "claimed_by = NULL, claimed_at = NULL" in id_sql
+    assert "WHERE id IN (%s, %s)" in id_sql
+    assert id_params == (1, None, 2, "e2", 1, 2)
+    url_sql, url_params = cursor.executed[1]
+    assert "WHERE url_hash IN (%s)" in url_sql
+    key = models.url_hash("http://example.com/x")
+    assert url_params == (key, "e1", key)
+
+
+def test_mark_pages_as_processed_error_dict(monkeypatch):
+    cursor = DummyCursor()
+    patch_conn(monkeypatch, cursor)
+
+    models.mark_pages_as_processed([5, 6], {6: "timeout"})
+
+    assert cursor.executed[0][1] == (5, None, 6, "timeout", 5, 6)
+
+
+def test_mark_pages_as_processed_empty(monkeypatch):
+    cursor = DummyCursor()
+    patch_conn(monkeypatch, cursor)
+    models.mark_pages_as_processed([])
+    assert cursor.executed == []
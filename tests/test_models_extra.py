@@ -58,6 +58,8 @@ def test_reset_all_processed(monkeypatch):
     models.reset_all_processed()
     # UPDATE文が実行されていること
     assert any("UPDATE scraped_pages" in call[0] for call in cursor._execute_calls)
+    # 直前の実行の確保も解除する
+    assert any("claimed_by = NULL" in call[0] for call in cursor._execute_calls)
     assert conn.committed is True
 
 
@@ -80,14 +82,16 @@ def test_mark_page_as_processed(monkeypatch):
     models.mark_page_as_processed("http://example.com", error_message="Some error")
     # UPDATE文が実行されていること
     assert any("UPDATE scraped_pages" in call[0] for call in cursor._execute_calls)
+    # 直前の実行の確保も解除する
+    assert any("claimed_by = NULL" in call[0] for call in cursor._execute_calls)
     assert conn.committed is True
     # パラメータにURLとエラーメッセージが含まれていること
     last_params = cursor._execute_calls[-1][1]
-    assert last_params == ("Some error", "http://example.com")
+    assert last_params == ("Some error", models.url_hash("http://example.com"))
     # error_messageがNoneの場合もテスト
     models.mark_page_as_processed("http://example.com")
     last_params = cursor._execute_calls[-1][1]
-    assert last_params == (None, "http://example.com")
+    assert last_params == (None, models.url_hash("http://example.com"))
 
 
 def test_mark_page_as_processed_no_error(monkeypatch):
@@ -98,7 +102,17 @@ def test_mark_page_as_processed_no_error(monkeypatch):
     models.mark_page_as_processed("http://example.com")
     # UPDATE文が実行されていること
     assert any("UPDATE scraped_pages" in call[0] for call in cursor._execute_calls)
+    # 直前の実行の確保も解除する
+    assert any("claimed_by = NULL" in call[0] for call in cursor._execute_calls)
     assert conn.committed is True
     # パラメータにURLとNoneのエラーメッセージが含まれていること
     last_params = cursor._execute_calls[-1][1]
-    assert last_params == (None, "http://example.com")
+    assert last_params == (None, models.url_hash("http://example.com"))
+
+
+def test_url_hash_is_raw_sha256():
+    # UNHEX(SHA2('abc', 256)) と同じ32バイト
+    assert models.url_hash("abc") == bytes.fromhex(
+        "ba7816bf8f01cfea414140de5dae2223b00361a396177a9cb410ff61f20015ad"
+    )
+    assert len(models.url_hash("https://example.com/日本語")) == 32
@@ -49,3 +49,16 @@ def test_get_page_by_url(monkeypatch):
     assert result is not None, "Result should not be None"
     assert result["url"] == "http://example.com"
     assert result["payload"] == {"key": "value"}
+
+
+def test_get_page_by_url_reads_shared_content(monkeypatch):
+    """本文は page_contents から読み、なければ scraped_pages.content を使う"""
+    cursor = DummyCursor({"url": "http://example.com", "content": "Hello"})
+    monkeypatch.setattr(
+        models.mysql.connector, "connect", lambda **kwargs: DummyConn(cursor)
+    )
+
+    models.get_page_by_url("http://example.com")
+
+    assert "LEFT JOIN page_contents pc ON pc.`hash` = sp.content_hash" in cursor.sql
+    assert "COALESCE(pc.content, sp.content) AS content" in cursor.sql
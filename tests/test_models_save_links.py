@@ -0,0 +1,87 @@
+import models
+
+
+class DummyCursor:
+    def __init__(self):
+        self.executed = []
+        self.rowcount = 0
+
+    def execute(self, sql, params=None):
+        self.executed.append((sql, params))
+        # 重複を除いた行数が新規登録されたとみなす
+        self.rowcount = sql.count("(%s, %s, %s, %s, %s, %s, %s)")
+
+    def close(self):
+        pass
+
+
+class DummyConn:
+    def __init__(self, cursor_obj):
+        self.cursor_obj = cursor_obj
+        self.committed = False
+
+    def cursor(self, dictionary=False):
+        return self.cursor_obj
+
+    def commit(self):
+        self.committed = True
+
+    def close(self):
+        pass
+
+
+def patch_conn(monkeypatch, cursor):
+    conn = DummyConn(cursor)
+    monkeypatch.setattr(models.mysql.connector, "connect", lambda **kwargs: conn)
+    return conn
+
+
+def test_save_links_to_db_single_statement(monkeypatch):
+    cursor = DummyCursor()
+    conn = patch_conn(monkeypatch, cursor)
+    links = [
+        ("http://example.com/a", "A"),
+        ("http://example.com/b", "B"),
+        ("http://example.com/a", "A again"),
+    ]
+
+    inserted = models.save_links_to_db(links, referrer="http://example.com/")
+
+    assert inserted == 2
+    assert conn.committed
+    assert len(cursor.executed) == 1
+    sql, params = cursor.executed[0]
+    assert "ON DUPLICATE KEY UPDATE" in sql
+    assert params[0] == "http://example.com/a"
+    assert params[1] == "http://example.com/"
+    assert params[3] == "A"  # 最初のタイトルを残す
+    assert params[7] == "http://example.com/b"
+    assert len(params) == 14
+
+
+def test_save_links_to_db_chunks(monkeypatch):
+    cursor = DummyCursor()
+    patch_conn(monkeypatch, cursor)
+    links = [(f"http://example.com/{i}", "") for i in range(5)]
+
+    assert models.save_links_to_db(links, chunk_size=2) == 5
+    assert len(cursor.executed) == 3
+
+
+def test_save_links_to_db_empty(monkeypatch):
+    cursor = DummyCursor()
+    patch_conn(monkeypatch, cursor)
+    assert models.save_links_to_db([]) == 0
+    assert cursor.executed == []
+
+
+def test_find_existing_urls_checks_hashes(monkeypatch):
+    cursor = DummyCursor()
+    cursor.fetchall = lambda: [(bytearray(models.url_hash("http://a/1")),)]
+    patch_conn(monkeypatch, cursor)
+    assert models.find_existing_urls(["http://a/1", "http://a/2"]) == {"http://a/1"}
+    sql, params = cursor.executed[0]
+    assert "url_hash IN (%s, %s)" in sql
+    assert params == (models.url_hash("http://a/1"), models.url_hash("http://a/2"))
+    assert models.find_existing_urls([]) == set()
+    assert len(cursor.executed) == 1
@@ -9,6 +9,7 @@ class DummyCursor:
         self.fetch_all_result = fetch_all_result or []
         self.executed = []
         self.closed = False
+        self.rowcount = 1
 
     def execute(self, sql, params=None):
         self.executed.append((sql, params))
@@ -64,6 +65,10 @@ def test_update_page_content(monkeypatch):
     conn = patch_conn(monkeypatch, cursor)
     models.update_page_content("http://example.com", "new content", b"\x12\x34")
     assert conn.committed
+    # 本文は page_contents に保存し、scraped_pages にはハッシュだけを書く
+    (insert_sql, insert_params), (update_sql, update_params) = cursor.executed
+    assert "INSERT IGNORE INTO page_contents" in insert_sql
+    assert update_params[:3] == (None, insert_params[0], "1234")
 
 
 def test_clear_all_pages(monkeypatch):
@@ -112,6 +117,7 @@ def test_mark_all_as_unprocessed(monkeypatch):
     conn = patch_conn(monkeypatch, cursor)
     models.mark_all_as_unprocessed()
     assert conn.committed
+    assert "claimed_by = NULL" in cursor.executed[0][0]
 
 
 def test_update_error_message(monkeypatch):
@@ -0,0 +1,153 @@
+import scraper
+import politeness
+from politeness import HostScheduler
+from robots_handler import RobotsUnreachable
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+        self.slept = []
+
+    def __call__(self):
+        return self.now
+
+    def sleep(self, seconds):
+        self.slept.append(seconds)
+        self.now += seconds
+
+
+def test_reserve_spaces_only_same_host():
+    clock = FakeClock()
+    scheduler = HostScheduler(clock=clock)
+    assert scheduler.reserve("a", 2) == 0
+    assert scheduler.reserve("b", 2) == 0
+    assert scheduler.reserve("a", 2) == 2
+    assert scheduler.reserve("a", 2) == 4
+    assert scheduler.wait_time("a") == 6
+    assert scheduler.wait_time("c") == 0
+    clock.now = 10
+    assert scheduler.reserve("a", 2) == 0
+
+
+def test_pick_prefers_eligible_host():
+    clock = FakeClock()
+    scheduler = HostScheduler(clock=clock)
+    scheduler.reserve("a", 5)
+    scheduler.reserve("b", 1)
+    rows = [{"url": "http://a/1"}, {"url": "http://b/1"}, {"url": "http://c/1"}]
+    assert scheduler.pick(rows)["url"] == "http://c/1"
+    # 全ホストが待ちなら最も早く取得できるホストを選ぶ
+    assert scheduler.pick(rows)["url"] == "http://b/1"
+    assert rows == [{"url": "http://a/1"}]
+
+
+def test_try_reserve_does_not_queue():
+    clock = FakeClock()
+    scheduler = HostScheduler(clock=clock)
+    assert scheduler.try_reserve("a", 2) == 0
+    # 待ちが必要なら枠は確保せず、待ち時間だけ返す
+    assert scheduler.try_reserve("a", 2) == 2
+    assert scheduler.wait_time("a") == 2
+    scheduler.try_reserve("b", 5)
+    assert scheduler.busy_hosts() == ["b", "a"]
+    clock.now = 2
+    assert scheduler.busy_hosts() == ["b"]
+    for i in range(150):
+        scheduler.try_reserve(f"h{i}", 1)
+    assert len(scheduler.busy_hosts()) == 151
+    assert scheduler.try_reserve("a", 2) == 0
+
+
+class HostFrontier:
+    """skip_hosts と release に対応した get_unprocessed_pages の代わり"""
+
+    def __init__(self, urls):
+        self.pending = list(urls)
+        self.marked = []
+        self.released = []
+
+    def claim(self, limit, worker_id=None, claim_timeout=600, skip_hosts=()):
+        batch = [
+            url for url in self.pending if politeness.host_of(url) not in skip_hosts
+        ][:limit]
+        self.pending = [url for url in self.pending if url not in batch]
+        return [{"url": url} for url in batch]
+
+    def mark(self, keys, errors=None):
+        self.marked.extend(keys)
+
+    def release(self, keys):
+        self.released.extend(keys)
+        self.pending.extend(keys)
+
+
+def patch_crawl(monkeypatch, clock, frontier):
+    monkeypatch.setattr(politeness, "_scheduler", HostScheduler(clock=clock))
+    monkeypatch.setattr(politeness.time, "sleep", clock.sleep)
+    monkeypatch.setattr(scraper.time, "sleep", clock.sleep)
+    monkeypatch.setattr(scraper, "check_robots_rules", lambda url, ua: (True, 1))
+    monkeypatch.setattr(scraper, "save_page_and_links", lambda page: None)
+    monkeypatch.setattr(scraper, "get_unprocessed_pages", frontier.claim)
+    monkeypatch.setattr(scraper, "mark_pages_as_processed", frontier.mark)
+    monkeypatch.setattr(scraper, "release_pages", frontier.release)
+    fetched = []
+
+    def fetch(row):
+        fetched.append((clock.now, row["url"]))
+        return scraper.ScrapedPage(url=row["url"], content="")
+
+    monkeypatch.setattr(scraper, "fetch_page", fetch)
+    return fetched
+
+
+def test_batch_releases_rows_instead_of_sleeping(monkeypatch):
+    clock = FakeClock()
+    urls = [f"http://h{i % 4}/p{i}" for i in range(12)]
+    frontier = HostFrontier([])
+    fetched = patch_crawl(monkeypatch, clock, frontier)
+
+    scraper._crawl_batch("w", [{"url": url} for url in urls], "UA")
+
+    # 各ホスト1ページずつ取得し、残りは確保を手放す（待たない）
+    assert clock.now == 0
+    assert len(fetched) == 4
+    assert sorted(frontier.marked) == sorted(url for _, url in fetched)
+    assert len(frontier.released) == 8
+
+
+def test_worker_throughput_scales_with_hosts(monkeypatch):
+    clock = FakeClock()
+    frontier = HostFrontier([f"http://h{i % 4}/p{i}" for i in range(12)])
+    fetched = patch_crawl(monkeypatch, clock, frontier)
+
+    scraper.worker_loop("w", "UA", batch_size=12)
+
+    assert len(fetched) == 12
+    assert not frontier.pending
+    # 4ホスト x crawl-delay 1秒: 12ページを (12 / 4 - 1) 秒で取得できる
+    assert max(t for t, _ in fetched) == 2
+    for host in range(4):
+        times = [t for t, url in fetched if url.startswith(f"http://h{host}/")]
+        assert times == [0, 1, 2]
+
+
+def test_worker_leaves_unreachable_robots_host_unprocessed(monkeypatch):
+    clock = FakeClock()
+    frontier = HostFrontier([f"http://h{i % 2}/p{i}" for i in range(4)])
+    fetched = patch_crawl(monkeypatch, clock, frontier)
+
+    def robots(url, user_agent):
+        if url.startswith("http://h0/"):
+            raise RobotsUnreachable("HTTP 503", retry_after=600)
+        return True, 0
+
+    monkeypatch.setattr(scraper, "check_robots_rules", robots)
+    scraper.worker_loop("w", "UA", batch_size=4)
+
+    # h0 の行は処理済みにせず手放し、再取得の時刻を待たずにワーカーは終了する
+    assert sorted(url for _, url in fetched) == ["http://h1/p1", "http://h1/p3"]
+    assert sorted(frontier.marked) == ["http://h1/p1", "http://h1/p3"]
+    assert sorted(frontier.pending) == ["http://h0/p0", "http://h0/p2"]
+    assert clock.now < 600
+    assert politeness.get_host_scheduler().postponed_hosts() == {"h0"}
@@ -0,0 +1,120 @@
+from unittest.mock import MagicMock, patch
+
+import pytest
+
+import robots_handler
+from robots_handler import RobotsCache, RobotsUnreachable, check_robots_rules
+
+RULES = {"disallow": "/private", "allow": "", "crawl_delay": 2, "ttl_seconds": 3600}
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+def make_connect(rows):
+    """fetchone が rows を順に返すモック接続を作る"""
+    conn = MagicMock()
+    conn.cursor.return_value.fetchone.side_effect = rows
+    return MagicMock(return_value=conn)
+
+
+def queries(connect):
+    return connect.return_value.cursor.return_value.execute.call_count
+
+
+def test_steady_state_needs_no_db_round_trip():
+    connect = make_connect([dict(RULES)])
+    with patch("robots_handler.mysql.connector.connect", connect):
+        assert check_robots_rules("https://a.com/x", "Bot") == (True, 2)
+        for _ in range(100):
+            assert check_robots_rules("https://a.com/private/y", "Bot") == (False, 0)
+    assert queries(connect) == 1
+    cache = robots_handler.get_robots_cache()
+    assert cache.hits == 100 and cache.misses == 1
+
+
+def test_cache_is_keyed_by_user_agent():
+    connect = make_connect([dict(RULES), dict(RULES)])
+    with patch("robots_handler.mysql.connector.connect", connect):
+        check_robots_rules("https://a.com/x", "Bot1")
+        check_robots_rules("https://a.com/x", "Bot2")
+        check_robots_rules("https://a.com/x", "Bot1")
+    assert queries(connect) == 2
+
+
+def test_unreadable_rules_are_deferred_not_allowed():
+    # 取得後に読み直してもルールがない: 許可とはみなさず negative_ttl の間は後回し
+    connect = make_connect([None, None])
+    with patch("robots_handler.mysql.connector.connect", connect), patch(
+        "robots_handler.fetch_and_store_robots"
+    ) as fetch:
+        for path in ("/", "/a"):
+            with pytest.raises(RobotsUnreachable) as excinfo:
+                check_robots_rules(f"https://down.com{path}", "Bot")
+            assert 0 < excinfo.value.retry_after <= 600
+    fetch.assert_called_once_with("down.com", "Bot")
+    assert queries(connect) == 2  # 初回の SELECT と取得後の再 SELECT だけ
+
+
+def test_reread_after_fetch_uses_a_fresh_connection():
+    # 取得の前に接続を返却して読み取りのトランザクションを終え、
+    # 保存された行は新しいスナップショットで読み直す
+    conn = MagicMock()
+    conn.in_transaction = True
+    conn.cursor.return_value.fetchone.side_effect = [None, dict(RULES)]
+    connect = MagicMock(return_value=conn)
+    rollbacks = []
+
+    def fetch(domain, user_agent):
+        rollbacks.append(conn.rollback.call_count)
+
+    with patch("robots_handler.mysql.connector.connect", connect), patch(
+        "robots_handler.fetch_and_store_robots", fetch
+    ):
+        assert check_robots_rules("https://new.com/x", "Bot") == (True, 2)
+        assert check_robots_rules("https://new.com/private", "Bot") == (False, 0)
+    assert rollbacks == [1]
+    assert queries(connect) == 2
+
+
+def test_never_fetched_domain_is_deferred():
+    # 取得失敗の記録だけがある行（全体不許可）は、処理済みにせず後回しにさせる
+    row = {
+        "disallow": "/",
+        "allow": "",
+        "crawl_delay": None,
+        "rule_groups": None,
+        "fail_count": 1,
+        "ttl_seconds": 60,
+    }
+    connect = make_connect([row])
+    with patch("robots_handler.mysql.connector.connect", connect):
+        for _ in range(2):
+            with pytest.raises(RobotsUnreachable) as excinfo:
+                check_robots_rules("https://down.com/a", "Bot")
+            assert 0 < excinfo.value.retry_after <= 60
+    assert queries(connect) == 1
+
+
+def test_entries_expire_and_are_evicted():
+    clock = FakeClock()
+    cache = RobotsCache(max_entries=2, negative_ttl=5, clock=clock)
+    cache.put("a", {"x": 1}, 10)
+    cache.put("b", None, cache.negative_ttl)
+    assert cache.get("a") == (True, {"x": 1})
+    assert cache.get("b") == (True, None)
+    clock.now = 6
+    assert cache.get("b") == (False, None)
+    assert cache.get("a") == (True, {"x": 1})
+    cache.put("c", {}, 10)
+    cache.put("d", {}, 10)
+    # 最も長く使われていない a が追い出される
+    assert cache.get("a") == (False, None)
+    assert cache.get("d") == (True, {})
+    clock.now = 20
+    assert cache.get("d") == (False, None)
@@ -0,0 +1,158 @@
+import datetime
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+import http_client
+import robots_handler
+from robots_handler import (
+    RobotsResponse,
+    RobotsUnreachable,
+    download_robots_txt,
+    fetch_and_store_robots,
+)
+
+ROBOTS_TXT = b"User-agent: *\nDisallow: /private\n"
+
+
+class RobotsHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def do_GET(self):
+        if self.path == "/slow/robots.txt":
+            time.sleep(0.5)
+        if self.path == "/error/robots.txt":
+            return self._send(503, b"")
+        if self.path == "/missing/robots.txt":
+            return self._send(404, b"not found")
+        if self.path == "/huge/robots.txt":
+            return self._send(200, b"Disallow: /aaaaaaaaaa\n" * 1000)
+        if self.headers.get("If-None-Match") == '"v1"':
+            return self._send(304, b"")
+        self._send(
+            200,
+            ROBOTS_TXT,
+            {"ETag": '"v1"', "Cache-Control": "public, max-age=600"},
+        )
+
+    def _send(self, status, body, headers=None):
+        self.send_response(status)
+        for key, value in (headers or {}).items():
+            self.send_header(key, value)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def server():
+    httpd = ThreadingHTTPServer(("127.0.0.1", 0), RobotsHandler)
+    thread = threading.Thread(target=httpd.serve_forever, daemon=True)
+    thread.start()
+    try:
+        yield f"http://127.0.0.1:{httpd.server_address[1]}"
+    finally:
+        http_client.close()
+        httpd.shutdown()
+        httpd.server_close()
+
+
+def test_download_and_revalidate(server):
+    first = download_robots_txt(f"{server}/robots.txt")
+    assert first == RobotsResponse(200, ROBOTS_TXT.decode(), '"v1"', None, 600)
+    again = download_robots_txt(f"{server}/robots.txt", etag='"v1"')
+    assert again.status == 304 and again.text is None
+
+
+def test_download_error_statuses(server):
+    missing = download_robots_txt(f"{server}/missing/robots.txt")
+    assert (missing.status, missing.text) == (404, "")
+    with pytest.raises(RobotsUnreachable):
+        download_robots_txt(f"{server}/error/robots.txt")
+
+
+def test_download_is_bounded(server, monkeypatch):
+    monkeypatch.setitem(robots_handler.ROBOTS_CONFIG, "max_bytes", 50)
+    huge = download_robots_txt(f"{server}/huge/robots.txt")
+    # 上限内の完全な行だけを読む
+    assert huge.text == "Disallow: /aaaaaaaaaa\n" * 2
+
+    monkeypatch.setitem(robots_handler.ROBOTS_CONFIG, "timeout", 0.1)
+    with pytest.raises(RobotsUnreachable):
+        download_robots_txt(f"{server}/slow/robots.txt")
+
+
+@pytest.fixture
+def store(monkeypatch):
+    executed = []
+    stored = {}
+    monkeypatch.setattr(
+        robots_handler, "_execute", lambda sql, params: executed.append((sql, params))
+    )
+    monkeypatch.setattr(robots_handler, "_get_stored_robots", lambda d, ua: stored)
+    return executed, stored
+
+
+def seconds_until(expires):
+    return (expires - datetime.datetime.now(datetime.UTC)).total_seconds()
+
+
+def test_not_modified_only_extends_expiry(store, monkeypatch):
+    executed, stored = store
+    stored.update(etag='"v1"', last_modified="Mon, 01 Jan 2024 00:00:00 GMT")
+    calls = []
+
+    def download(url, etag, last_modified):
+        calls.append((etag, last_modified))
+        return RobotsResponse(304, None, etag, last_modified, 7200)
+
+    monkeypatch.setattr(robots_handler, "download_robots_txt", download)
+    fetch_and_store_robots("example.com", "Bot")
+
+    assert calls == [('"v1"', "Mon, 01 Jan 2024 00:00:00 GMT")]
+    ((sql, params),) = executed
+    assert sql.strip().startswith("UPDATE robots_rules SET expires_at")
+    assert params[1:] == ("example.com", "Bot")
+    assert 7190 < seconds_until(params[0]) <= 7200
+
+
+def test_max_age_is_clamped(store, monkeypatch):
+    executed, _ = store
+    monkeypatch.setattr(
+        robots_handler,
+        "download_robots_txt",
+        lambda url, etag, lm: RobotsResponse(200, "", '"e"', None, 5),
+    )
+    fetch_and_store_robots("example.com", "Bot")
+    params = executed[0][1]
+    assert params[6] == '"e"'
+    min_ttl = robots_handler.ROBOTS_CONFIG["min_ttl"]
+    assert min_ttl - 10 < seconds_until(params[-1]) <= min_ttl
+
+
+def test_unreachable_backs_off_exponentially(store, monkeypatch):
+    executed, stored = store
+
+    def fail(url, etag, lm):
+        raise RobotsUnreachable("HTTP 503")
+
+    monkeypatch.setattr(robots_handler, "download_robots_txt", fail)
+    base = robots_handler.ROBOTS_CONFIG["backoff_base"]
+
+    fetch_and_store_robots("example.com", "Bot")
+    stored["fail_count"] = 3
+    fetch_and_store_robots("example.com", "Bot")
+
+    first, second = [params for _, params in executed]
+    assert first[-1] == 1 and second[-1] == 4
+    # 以前のルールがなければ全体を不許可として記録する（既存のルールは上書きしない）
+    sql = executed[0][0]
+    assert "VALUES (%s, %s, '/', ''" in sql
+    assert "disallow = VALUES" not in sql
+    assert base - 10 < seconds_until(first[-2]) <= base
+    assert base * 8 - 10 < seconds_until(second[-2]) <= base * 8
@@ -1,23 +1,20 @@
 import unittest
 from unittest.mock import patch, MagicMock
-from robots_handler import fetch_and_store_robots, check_robots_rules
+from robots_handler import RobotsResponse, fetch_and_store_robots, check_robots_rules
+from robots_parser import parse_robots_txt, select_group
 import mysql.connector
 
 
-class DummyRobotFileParser:
-    def __init__(self):
-        self.disallow_all = ["/private"]
-        self.allow_all = ["/public"]
-        self.delay = 5
-
-    def set_url(self, url):
-        self.url = url
+ROBOTS_TXT = """
+User-agent: *
+Disallow: /private
+Allow: /public
+Crawl-delay: 5
+"""
 
-    def read(self):
-        pass
 
-    def crawl_delay(self, user_agent):
-        return self.delay
+def dummy_download(robots_url, etag=None, last_modified=None):
+    return RobotsResponse(200, ROBOTS_TXT, None, None, None)
 
 
 class DummyCursor:
@@ -27,6 +24,9 @@ class DummyCursor:
     def execute(self, sql, params):
         self.executed.append((sql, params))
 
+    def fetchone(self):
+        return None
+
     def close(self):
         pass
 
@@ -35,7 +35,7 @@ class DummyConnection:
     def __init__(self):
         self.cursor_obj = DummyCursor()
 
-    def cursor(self):
+    def cursor(self, dictionary=False):
         return self.cursor_obj
 
     def commit(self):
@@ -47,25 +47,26 @@ class DummyConnection:
 
 class TestRobotsHandler(unittest.TestCase):
     @patch("robots_handler.mysql.connector.connect")
-    @patch("robots_handler.RobotFileParser")
-    def test_fetch_and_store_robots(self, mock_rfp_class, mock_connect):
-        mock_rfp = MagicMock()
-        mock_rfp.read.return_value = None
-        mock_rfp.crawl_delay.return_value = 5
-        mock_rfp.disallow_all = ["/private"]
-        mock_rfp.allow_all = ["/public"]
-        mock_rfp_class.return_value = mock_rfp
-
+    @patch("robots_handler.download_robots_txt", side_effect=dummy_download)
+    def test_fetch_and_store_robots(self, mock_download, mock_connect):
         mock_conn = MagicMock()
         mock_cursor = MagicMock()
         mock_connect.return_value = mock_conn
         mock_conn.cursor.return_value = mock_cursor
+        mock_cursor.fetchone.return_value = None
 
         fetch_and_store_robots("example.com", "MyScraperBot")
 
-        mock_rfp.read.assert_called()
+        mock_download.assert_called_once_with(
+            "https://example.com/robots.txt", None, None
+        )
         mock_cursor.execute.assert_called()
         mock_conn.commit.assert_called()
+        params = mock_cursor.execute.call_args[0][1]
+        self.assertEqual(
+            params[:4], ("example.com", "MyScraperBot", "/private", "/public")
+        )
+        self.assertEqual(params[5], 5.0)
 
     @patch("robots_handler.mysql.connector.connect")
     @patch("robots_handler.fetch_and_store_robots")
@@ -86,10 +87,8 @@ class TestRobotsHandler(unittest.TestCase):
         self.assertEqual(delay, 3)
 
     def test_fetch_and_store_robots_monkeypatch(self):
-        # Monkey patch RobotFileParser using unittest.mock.patch
-        with patch(
-            "robots_handler.RobotFileParser", new=lambda: DummyRobotFileParser()
-        ):
+        # Monkey patch download_robots_txt using unittest.mock.patch
+        with patch("robots_handler.download_robots_txt", new=dummy_download):
             # Monkey patch mysql.connector.connect using unittest.mock.patch
             with patch(
                 "mysql.connector.connect", new=lambda **kwargs: DummyConnection()
@@ -101,16 +100,13 @@ class TestRobotsHandler(unittest.TestCase):
                 # Instantiate new connection to verify dummy behavior
                 conn = mysql.connector.connect()
                 cursor = conn.cursor()
-                # Use the dummy RobotFileParser to check crawl_delay functionality
-                rp = DummyRobotFileParser()
-                rp.read()  # No-op for dummy
-                delay = rp.crawl_delay("MyScraperBot")
+                # Use the dummy download to check the parsed crawl-delay
+                groups = parse_robots_txt(dummy_download(None).text)
+                delay = select_group(groups, "MyScraperBot")["crawl_delay"]
                 self.assertEqual(delay, 5)
-        # Monkey patch RobotFileParser and mysql.connector.connect
+        # Monkey patch download_robots_txt and mysql.connector.connect
         #  using unittest.mock.patch
-        with patch(
-            "robots_handler.RobotFileParser", new=lambda: DummyRobotFileParser()
-        ):
+        with patch("robots_handler.download_robots_txt", new=dummy_download):
             with patch(
                 "mysql.connector.connect", new=lambda **kwargs: DummyConnection()
             ):
@@ -125,10 +121,9 @@ class TestRobotsHandler(unittest.TestCase):
                 cursor.execute("SELECT ...", ())
                 # Since the function uses its own connection instance,
                 #  we cannot retrieve that here directly,
-                # so instead, we test that our dummy RobotFileParser works as expected
-                rp = DummyRobotFileParser()
-                rp.read()
-                delay = rp.crawl_delay("MyScraperBot")
+                # so instead, we test that our dummy robots.txt parses as expected
+                groups = parse_robots_txt(dummy_download(None).text)
+                delay = select_group(groups, "MyScraperBot")["crawl_delay"]
                 self.assertEqual(delay, 5)
 
     def dummy_connect_fail(*args, **kwargs):
@@ -137,10 +132,10 @@ class TestRobotsHandler(unittest.TestCase):
     def test_fetch_and_store_robots_db_error(self):
         from unittest.mock import patch
 
-        # Use dummy RobotFileParser for consistency
-        with patch(
-            "robots_handler.RobotFileParser", new=lambda: DummyRobotFileParser()
-        ), patch("mysql.connector.connect", side_effect=self.dummy_connect_fail):
+        # Use dummy download for consistency
+        with patch("robots_handler.download_robots_txt", new=dummy_download), patch(
+            "mysql.connector.connect", side_effect=self.dummy_connect_fail
+        ):
             with self.assertRaises(Exception) as context:
                 fetch_and_store_robots("example.com")
         self.assertIn("Database connection failed", str(context.exception))
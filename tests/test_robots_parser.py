@@ -0,0 +1,113 @@
+import pytest
+
+from robots_parser import (
+    RobotsMatcher,
+    normalize_path,
+    parse_robots_txt,
+    product_token,
+    select_group,
+)
+
+ROBOTS_TXT = """
+Disallow: /ignored-before-any-group
+# コメント行
+User-agent: MyScraperBot
+User-agent: OtherBot
+Disallow: /tmp/ # 行末コメント
+Allow: /tmp/public
+Crawl-delay: 1.5
+
+User-agent: *
+Disallow: /
+Disallow:
+
+Sitemap: https://example.com/sitemap.xml
+
+user-agent: myscraperbot
+disallow: /*.php$
+"""
+
+
+def matcher(*rules):
+    return RobotsMatcher(rules)
+
+
+def test_parse_groups():
+    groups = parse_robots_txt(ROBOTS_TXT)
+    assert [g["user_agents"] for g in groups] == [
+        ["myscraperbot", "otherbot"],
+        ["*"],
+        ["myscraperbot"],
+    ]
+    assert groups[0]["rules"] == [["disallow", "/tmp/"], ["allow", "/tmp/public"]]
+    assert groups[0]["crawl_delay"] == 1.5
+    assert groups[1]["rules"] == [["disallow", "/"]]
+
+
+def test_select_group_merges_matching_groups():
+    groups = parse_robots_txt(ROBOTS_TXT)
+    group = select_group(groups, "MyScraperBot/2.0 (+https://example.com)")
+    assert group["rules"] == [
+        ["disallow", "/tmp/"],
+        ["allow", "/tmp/public"],
+        ["disallow", "/*.php$"],
+    ]
+    assert group["crawl_delay"] == 1.5
+    assert select_group(groups, "UnknownBot")["rules"] == [["disallow", "/"]]
+    assert select_group([], "Bot") == {"rules": [], "crawl_delay": None}
+    assert product_token("MyScraperBot/1.0") == "myscraperbot"
+
+
+@pytest.mark.parametrize(
+    "rules, path, expected",
+    [
+        # 最も長いパターンのルールを採用する
+        ((("allow", "/p"), ("disallow", "/")), "/page", True),
+        ((("allow", "/p"), ("disallow", "/")), "/other", False),
+        # 同じ長さなら Allow を優先
+        ((("allow", "/folder"), ("disallow", "/folder")), "/folder/page", True),
+        # ワイルドカードのほうが長ければそちらを優先
+        ((("allow", "/page"), ("disallow", "/*.htm")), "/page.htm", False),
+        ((("allow", "/$"), ("disallow", "/")), "/", True),
+        ((("allow", "/$"), ("disallow", "/")), "/page", False),
+        ((("disallow", "/*.php$"),), "/index.php", False),
+        ((("disallow", "/*.php$"),), "/index.php5", True),
+        ((("disallow", "/*.php$"),), "/index.php?x=1", True),
+        ((("disallow", "/fish*"),), "/fish.html", False),
+        ((("disallow", "/fish"),), "/Fish", True),
+        ((("disallow", "/*?"),), "/search?q=1", False),
+        ((("disallow", "*"),), "/anything", False),
+        ((("disallow", "/"),), "/robots.txt", True),
+        ((), "/anything", True),
+    ],
+)
+def test_longest_match(rules, path, expected):
+    assert matcher(*rules).allowed(path) is expected
+
+
+def test_percent_encoding_is_normalized():
+    m = matcher(("disallow", "/ä"), ("disallow", "/a%2fb"))
+    assert m.allowed("/ä") is False
+    assert m.allowed("/%c3%a4") is False
+    assert m.allowed("/a%2Fb") is False
+    assert m.allowed("/a/b") is True
+    assert normalize_path("/日本") == "/%E6%97%A5%E6%9C%AC"
+
+
+def test_from_columns_and_url():
+    m = RobotsMatcher.from_columns("/private\n/*.pdf$\n", "/private/ok")
+    assert m.allowed_url("https://example.com/private/x") is False
+    assert m.allowed_url("https://example.com/private/ok/x") is True
+    assert m.allowed_url("https://example.com/docs/a.pdf") is False
+    assert m.allowed_url("https://example.com/docs/a.pdf?dl=1") is True
+    assert m.allowed_url("https://example.com") is True
+    assert RobotsMatcher.from_columns(None, None).allowed("/x") is True
+
+
+def test_many_literal_rules_use_the_trie():
+    rules = [("disallow", f"/section/{i}/") for i in range(5000)]
+    m = matcher(*rules, ("allow", "/section/42/open"))
+    assert m._wildcards == []
+    assert m.allowed("/section/4999/page") is False
+    assert m.allowed("/section/42/open/page") is True
+    assert m.allowed("/section/x/page") is True
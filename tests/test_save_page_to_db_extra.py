@@ -1,4 +1,7 @@
 # tests/test_save_page_to_db_extra.py
+import hashlib
+
+import content_store
 import models
 from models import ScrapedPage
 
@@ -8,10 +11,13 @@ class DummyCursor:
         self.executed_sql = None
         self.executed_params = None
         self.closed = False
+        self.executed = []
+        self.rowcount = 1
 
     def execute(self, sql, params=None):
         self.executed_sql = sql
         self.executed_params = params
+        self.executed.append((sql, params))
 
     def close(self):
         self.closed = True
@@ -59,11 +65,51 @@ def test_save_page_to_db_with_content_and_bytes_hash(monkeypatch):
     assert "INSERT INTO scraped_pages" in cursor.executed_sql  # type: ignore
     # hashがhex文字列に変換されていること
     assert cursor.executed_params["hash"] == "123456"  # type: ignore
-    # contentのバイト数が計算されているので0ではない
-    assert len(cursor.executed_params["content"].encode("utf-8")) > 0  # type: ignore
+    # 本文は page_contents に保存し、scraped_pages からはハッシュで参照する
+    key = hashlib.sha256(b"Hello World").digest()
+    insert_sql, insert_params = cursor.executed[0]
+    assert "INSERT IGNORE INTO page_contents" in insert_sql
+    # 本文は圧縮して body に書き込み、content 列は使わない
+    assert insert_params[:2] == (key, None)
+    assert content_store.decompress_content(insert_params[2]) == "Hello World"
+    assert insert_params[3] == 11
+    assert cursor.executed_params["content"] is None  # type: ignore
+    assert cursor.executed_params["content_hash"] == key  # type: ignore
     assert conn.committed is True
 
 
+def test_identical_content_is_stored_once(monkeypatch):
+    """同じ本文の2ページ目以降は page_contents に書き込まない"""
+    cursor = DummyCursor()
+    conn = DummyConn(cursor)
+    monkeypatch.setattr(models.mysql.connector, "connect", lambda **kwargs: conn)
+
+    for path in ("a", "b", "print/a"):
+        page = ScrapedPage(
+            url=f"http://example.com/{path}", content="<html>same</html>"
+        )
+        models.save_page_to_db(page)
+
+    inserts = [sql for sql, _ in cursor.executed if "page_contents" in sql]
+    assert len(inserts) == 1
+    stats = content_store.get_stats()
+    assert (stats["pages"], stats["stored_pages"]) == (3, 1)
+    assert abs(stats["dedup_ratio"] - 2 / 3) < 1e-9
+
+
+def test_dedup_can_be_disabled(monkeypatch):
+    cursor = DummyCursor()
+    conn = DummyConn(cursor)
+    monkeypatch.setattr(models.mysql.connector, "connect", lambda **kwargs: conn)
+    monkeypatch.setitem(content_store.STORAGE_CONFIG, "dedup", False)
+
+    models.save_page_to_db(ScrapedPage(url="http://example.com", content="Hello"))
+
+    assert len(cursor.executed) == 1
+    assert cursor.executed_params["content"] == "Hello"  # type: ignore
+    assert cursor.executed_params["content_hash"] is None  # type: ignore
+
+
 def test_save_page_to_db_without_content_and_str_hash(monkeypatch):
     """contentなし + hashがstr型の場合の分岐をカバー"""
     cursor = DummyCursor()
@@ -9,6 +9,7 @@ from scraper import (
     fetch_post_content,
 )
 from models import ScrapedPage, DB_CONFIG
+from politeness import HostScheduler
 import requests
 from scrape import scrape
 import scraper
@@ -66,12 +67,19 @@ def test_scrape_page_success_http(monkeypatch):
     class MockResp:
         status_code = 200
         text = "<html><head><title>Test Page</title></head><body>OK</body></html>"
-        apparent_encoding = "utf-8"
+        content = text.encode("utf-8")
+        headers = {"Content-Type": "text/html"}
 
         def raise_for_status(self):
             return None
 
-    monkeypatch.setattr(scraper.requests, "get", lambda *a, **k: MockResp())
+        def iter_content(self, chunk_size):
+            yield self.content
+
+        def close(self):
+            pass
+
+    monkeypatch.setattr(scraper.http_client, "get", lambda *a, **k: MockResp())
     result = scrape_page("https://x.com")
     assert result.url == "https://x.com"
     assert result.error_message is None
@@ -90,7 +98,7 @@ def test_scrape_failure_http(monkeypatch):
     def raise_exc(*a, **k):
         raise Exception("Failed to fetch")
 
-    monkeypatch.setattr(scraper.requests, "get", raise_exc)
+    monkeypatch.setattr(scraper.http_client, "get", raise_exc)
     result = scrape_page("https://x.com")
     assert result.url == "https://x.com"
     assert result.status_code is None
@@ -98,7 +106,7 @@ def test_scrape_failure_http(monkeypatch):
     assert result.error_message == "Failed to fetch"
 
 
-@patch("scraper.requests.get")
+@patch("scraper.http_client.get")
 @patch("mysql.connector.connect")
 def test_scrape_success_db(mock_connect, mock_get):
     mock_get.return_value.status_code = 200
@@ -129,8 +137,13 @@ def test_should_scrape_blocked(mock_mark, mock_check):
 @patch("time.sleep")
 def test_should_scrape_allowed_with_delay(mock_sleep, mock_check):
     mock_check.return_value = (True, 2)
-    result = should_scrape("http://example.com", "TestBot")
-    assert result is True
+    # 時刻を固定し、同じホストへの2回目だけ crawl-delay 分待つことを確認
+    with patch("politeness._scheduler", HostScheduler(clock=lambda: 100.0)):
+        assert should_scrape("http://example.com/a", "TestBot") is True
+        mock_sleep.assert_not_called()
+        assert should_scrape("http://other.com/a", "TestBot") is True
+        mock_sleep.assert_not_called()
+        assert should_scrape("http://example.com/b", "TestBot") is True
     mock_sleep.assert_called_once_with(2)
 
 
@@ -142,16 +155,19 @@ def test_should_scrape_allowed_no_delay(mock_check):
     mock_check.assert_called_once()
 
 
-@patch("scraper.exists_in_db", return_value=False)
-@patch("scraper.extract_links")
-@patch("scraper.save_page_to_db")
-def test_extract_and_save_links(mock_save, mock_extract, mock_exists):
-    mock_extract.return_value = [("http://example.com/link", "Link Title")]
+@patch("scraper.parse_document")
+@patch("scraper.save_links_to_db")
+def test_extract_and_save_links(mock_save, mock_parse):
     page = MagicMock()
     page.content = "<html><a href='http://example.com/link'>Link</a></html>"
     page.url = "http://example.com"
+    # 取得時に解析済みの文書があれば再解析しない
+    page.document.links = [("http://example.com/link", "Link Title")]
     extract_and_save_links(page)
-    mock_save.assert_called_once()
+    mock_parse.assert_not_called()
+    mock_save.assert_called_once_with(
+        [("http://example.com/link", "Link Title")], referrer="http://example.com"
+    )
 
 
 @patch("scraper.should_scrape", return_value=True)
@@ -178,7 +194,10 @@ def test_fetch_post_content_success():
     mock_response = Mock()
     mock_response.status_code = 200
     mock_response.text = "<html><title>Test Page</title><body>Hello</body></html>"
-    with patch("scraper.requests.post", return_value=mock_response):
+    mock_response.content = mock_response.text.encode("utf-8")
+    mock_response.headers = {"Content-Type": "text/html; charset=utf-8"}
+    mock_response.iter_content.return_value = [mock_response.content]
+    with patch("scraper.http_client.post", return_value=mock_response):
         page = fetch_post_content(
             "http://example.com", data={"key": "value"}, referrer="http://referrer.com"
         )
@@ -189,7 +208,7 @@ def test_fetch_post_content_success():
 
 
 # POSTリクエスト失敗の異常系
-@patch("scraper.requests.post", side_effect=Exception("POST failed"))
+@patch("scraper.http_client.post", side_effect=Exception("POST failed"))
 def test_fetch_post_content_error(mock_post):
     page = fetch_post_content("http://example.com", data={"x": 1}, referrer=None)
     assert page.error_message == "POST failed"
@@ -26,6 +26,9 @@ class DummyBrowser:
     def new_page(self):
         return DummyPage()
 
+    def new_context(self, extra_http_headers=None):
+        return self
+
     def close(self):
         pass
 
@@ -64,6 +67,9 @@ def mock_playwright(monkeypatch):
         def new_page(self):
             return MockPage()
 
+        def new_context(self, extra_http_headers=None):
+            return self
+
         def close(self):
             pass
 
@@ -82,12 +88,12 @@ def mock_playwright(monkeypatch):
 
         return Context()
 
-    monkeypatch.setattr("scraper.sync_playwright", mock_sync_playwright)
+    monkeypatch.setattr("browser_pool.sync_playwright", mock_sync_playwright)
 
 
 def test_scrape_page_with_playwright(monkeypatch):
     monkeypatch.setattr(config, "USE_PLAYWRIGHT_PATTERNS", ["amus.biz"])
-    monkeypatch.setattr("scraper.sync_playwright", lambda: DummyPlaywright())
+    monkeypatch.setattr("browser_pool.sync_playwright", lambda: DummyPlaywright())
 
     page = scrape_page("https://amus.biz")
     assert isinstance(page, ScrapedPage)
@@ -1,5 +1,6 @@
 # tests/test_scraper_uncovered.py
 import types
+import browser_pool
 import scraper
 import config
 import models
@@ -27,6 +28,9 @@ class DummyBrowser:
     def new_page(self):
         return DummyPage()
 
+    def new_context(self, extra_http_headers=None):
+        return self
+
     def close(self):
         pass
 
@@ -63,7 +67,7 @@ def test_should_scrape_with_delay(monkeypatch):
 
 
 def test_scrape_page_playwright(monkeypatch):
-    monkeypatch.setattr(scraper, "sync_playwright", lambda: DummyPlaywright())
+    monkeypatch.setattr(browser_pool, "sync_playwright", lambda: DummyPlaywright())
     monkeypatch.setattr(scraper, "get_hash", lambda t: "hash")
     page = scraper.scrape_page("http://example.com/playwright")
     assert page.content == "<html><title>T</title></html>"
@@ -74,9 +78,9 @@ def test_scrape_page_exception(monkeypatch):
     # Playwright分岐を回避（空リストにする）
     monkeypatch.setattr(config, "USE_PLAYWRIGHT_PATTERNS", [])
 
-    # requests.get を例外発生にモック
+    # http_client.get を例外発生にモック
     monkeypatch.setattr(
-        scraper.requests,
+        scraper.http_client,
         "get",
         lambda *a, **k: (_ for _ in ()).throw(Exception("getFail")),
     )
@@ -88,7 +92,7 @@ def test_scrape_page_exception(monkeypatch):
 
 def test_fetch_post_content_exception(monkeypatch):
     monkeypatch.setattr(
-        scraper.requests,
+        scraper.http_client,
         "post",
         lambda *a, **k: (_ for _ in ()).throw(Exception("postFail")),
     )
@@ -96,18 +100,22 @@ def test_fetch_post_content_exception(monkeypatch):
     assert page.error_message is not None and "postFail" in page.error_message
 
 
-def test_extract_and_save_links_existing(monkeypatch):
+def test_extract_and_save_links_single_bulk_call(monkeypatch):
     page = types.SimpleNamespace(content="<html></html>", url="http://base")
+    links = [("http://link", "title"), ("http://link", "dup"), ("http://b", "")]
     monkeypatch.setattr(
-        scraper, "extract_links", lambda s, u: [("http://link", "title")]
+        scraper, "parse_document", lambda c, u: types.SimpleNamespace(links=links)
     )
-    monkeypatch.setattr(scraper, "exists_in_db", lambda u: True)  # 既存URL
-    called = {}
+    calls = []
+    monkeypatch.setattr(
+        scraper, "save_links_to_db", lambda ls, referrer=None: calls.append(ls)
+    )
+    # 1件ずつの存在確認・保存は行わない
     monkeypatch.setattr(
-        scraper, "save_page_to_db", lambda p: called.setdefault("saved", True)
+        scraper, "save_page_to_db", lambda p: (_ for _ in ()).throw(AssertionError)
     )
     scraper.extract_and_save_links(page)
-    assert "saved" not in called  # 保存されない
+    assert calls == [links]
 
 
 def test_process_single_page_blocked(monkeypatch):
@@ -144,6 +152,9 @@ def test_main_with_reset_and_url(monkeypatch):
         method="GET",
         payload=None,
         reset=True,
+        workers=1,
+        engine="sync",
+        metrics_port=None,
     )
     # argparse のモック
     monkeypatch.setattr(
@@ -157,8 +168,12 @@ def test_main_with_reset_and_url(monkeypatch):
     monkeypatch.setattr(models, "reset_all_processed", lambda: None)
     # 他の依存関数もモック
     monkeypatch.setattr(scraper, "get_page_counts", lambda: (0, 0))
+    monkeypatch.setattr(scraper, "init_seen_filter", lambda: None)
+    monkeypatch.setattr(scraper, "save_seen_filter", lambda: None)
     monkeypatch.setattr(scraper, "process_single_page", lambda r, user_agent=None: None)
-    monkeypatch.setattr(scraper, "process_pages", lambda user_agent=None: None)
+    monkeypatch.setattr(
+        scraper, "process_pages", lambda user_agent=None, workers=1: None
+    )
 
     scraper.main()
 
@@ -171,6 +186,9 @@ def test_main_without_url(monkeypatch):
         method="GET",
         payload=None,
         reset=False,
+        workers=1,
+        engine="sync",
+        metrics_port=None,
     )
     monkeypatch.setattr(
         scraper.argparse,
@@ -180,5 +198,9 @@ def test_main_without_url(monkeypatch):
         ),
     )
     monkeypatch.setattr(scraper, "get_page_counts", lambda: (0, 0))
-    monkeypatch.setattr(scraper, "process_pages", lambda user_agent=None: None)
+    monkeypatch.setattr(scraper, "init_seen_filter", lambda: None)
+    monkeypatch.setattr(scraper, "save_seen_filter", lambda: None)
+    monkeypatch.setattr(
+        scraper, "process_pages", lambda user_agent=None, workers=1: None
+    )
     scraper.main()
@@ -0,0 +1,136 @@
+import threading
+import time
+
+import scraper
+
+
+class FakeFrontier:
+    """get_unprocessed_pages / mark_pages_as_processed の代わりに使うキュー"""
+
+    def __init__(self, urls):
+        self.lock = threading.Lock()
+        self.pending = list(urls)
+        self.claims = []
+        self.completed = {}
+        self.mark_calls = 0
+
+    def claim(self, limit, worker_id=None, claim_timeout=600, skip_hosts=()):
+        with self.lock:
+            batch, self.pending = self.pending[:limit], self.pending[limit:]
+            self.claims.extend((worker_id, url) for url in batch)
+            return [
+                {"url": url, "referrer": None, "method": "GET", "payload": {}}
+                for url in batch
+            ]
+
+    def mark(self, keys, errors=None):
+        with self.lock:
+            self.mark_calls += 1
+            self.completed.update(zip(keys, errors or [None] * len(keys)))
+
+    def add(self, url):
+        with self.lock:
+            self.pending.append(url)
+
+
+def patch_frontier(monkeypatch, frontier, crawl):
+    monkeypatch.setattr(scraper, "get_unprocessed_pages", frontier.claim)
+    monkeypatch.setattr(scraper, "mark_pages_as_processed", frontier.mark)
+    monkeypatch.setattr(scraper, "crawl_claimed_page", crawl)
+    monkeypatch.setitem(scraper.CRAWLER_CONFIG, "idle_wait", 0.01)
+
+
+def test_process_pages_workers_no_duplicates(monkeypatch):
+    urls = [f"http://example.com/{i}" for i in range(40)]
+    frontier = FakeFrontier(urls)
+    processed = []
+    lock = threading.Lock()
+
+    def fake_crawl(row, user_agent):
+        time.sleep(0.005)
+        with lock:
+            processed.append(row["url"])
+
+    patch_frontier(monkeypatch, frontier, fake_crawl)
+    monkeypatch.setitem(scraper.CRAWLER_CONFIG, "batch_size", 3)
+
+    scraper.process_pages("UA", workers=4)
+
+    assert sorted(processed) == sorted(urls)
+    assert sorted(frontier.completed) == sorted(urls)
+    assert len({worker for worker, _ in frontier.claims}) > 1
+
+
+def test_batches_are_completed_in_one_call(monkeypatch):
+    urls = [f"http://example.com/{i}" for i in range(10)]
+    frontier = FakeFrontier(urls)
+    patch_frontier(monkeypatch, frontier, lambda row, user_agent: None)
+
+    scraper.worker_loop("w", "UA", batch_size=5)
+
+    assert frontier.mark_calls == 2
+    assert len(frontier.completed) == 10
+
+
+def test_worker_waits_for_links_from_other_workers(monkeypatch):
+    frontier = FakeFrontier(["http://example.com/seed"])
+    processed = []
+
+    def fake_crawl(row, user_agent):
+        # 先頭ページの処理が遅く、その間に他ワーカーはキューが空になる
+        if row["url"].endswith("seed"):
+            time.sleep(0.05)
+            for i in range(3):
+                frontier.add(f"http://example.com/child{i}")
+        processed.append(row["url"])
+
+    patch_frontier(monkeypatch, frontier, fake_crawl)
+
+    scraper.process_pages("UA", workers=3)
+
+    assert len(processed) == 4
+
+
+def test_worker_records_error_and_continues(monkeypatch):
+    frontier = FakeFrontier(["http://example.com/bad", "http://example.com/ok"])
+
+    def fake_crawl(row, user_agent):
+        if row["url"].endswith("bad"):
+            raise RuntimeError("boom")
+        return None
+
+    patch_frontier(monkeypatch, frontier, fake_crawl)
+
+    scraper.process_pages("UA", workers=1)
+
+    assert frontier.completed == {
+        "http://example.com/bad": "boom",
+        "http://example.com/ok": None,
+    }
+
+
+def test_crawl_claimed_page_blocked(monkeypatch):
+    monkeypatch.setattr(scraper, "check_robots_rules", lambda u, ua: (False, 0))
+    monkeypatch.setattr(
+        scraper, "fetch_page", lambda row: (_ for _ in ()).throw(AssertionError)
+    )
+    row = {"id": 1, "url": "http://example.com/private"}
+    assert scraper.crawl_claimed_page(row, "UA") == "Blocked by robots.txt"
+
+
+def test_crawl_claimed_page_saves_without_marking(monkeypatch):
+    page = scraper.ScrapedPage(
+        url="http://example.com", content="<html></html>", error_message="oops"
+    )
+    saved = []
+    monkeypatch.setattr(scraper, "check_robots_rules", lambda u, ua: (True, 0))
+    monkeypatch.setattr(scraper, "fetch_page", lambda row: page)
+    monkeypatch.setattr(scraper, "save_page_to_db", saved.append)
+    monkeypatch.setattr(
+        scraper,
+        "mark_page_as_processed",
+        lambda *a: (_ for _ in ()).throw(AssertionError),
+    )
+
+    assert scraper.crawl_claimed_page({"url": "http://example.com"}, "UA") == "oops"
+    assert saved == [page]
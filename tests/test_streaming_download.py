@@ -0,0 +1,168 @@
+import gzip
+import hashlib
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+import http_client
+import robots_handler
+import scraper
+from http_client import BodyReader, DownloadLimitExceeded
+
+HEAD = b"<html><head><title>big</title></head><body><a href='/next'>next</a>"
+FILLER = b"<p>" + b"x" * 1000 + b"</p>\n"
+
+
+class LargeBodyHandler(BaseHTTPRequestHandler):
+    """Content-Length なしで 1MB 余りの本文を少しずつ返す（/gzip は展開後 8MB）"""
+
+    def do_GET(self):
+        self.send_response(200)
+        self.send_header("Content-Type", "text/html; charset=utf-8")
+        if self.path == "/gzip":
+            body = gzip.compress(HEAD + b"\0" * (8 * 1024 * 1024))
+            self.send_header("Content-Encoding", "gzip")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+            return
+        self.end_headers()
+        try:
+            self.wfile.write(HEAD)
+            for _ in range(1000):
+                self.wfile.write(FILLER)
+        except OSError:
+            pass  # 打ち切られた
+
+    def log_message(self, *args):
+        pass
+
+
+class DripHandler(BaseHTTPRequestHandler):
+    """Content-Length を大きく宣言し、本文を 0.1 秒ごとに1バイトずつ返す"""
+
+    def do_GET(self):
+        self.send_response(200)
+        self.send_header("Content-Type", "text/plain")
+        self.send_header("Content-Length", "1000")
+        self.end_headers()
+        try:
+            for _ in range(100):
+                self.wfile.write(b"x")
+                self.wfile.flush()
+                time.sleep(0.1)
+        except OSError:
+            pass
+
+    def log_message(self, *args):
+        pass
+
+
+def serve(handler):
+    httpd = ThreadingHTTPServer(("127.0.0.1", 0), handler)
+    thread = threading.Thread(target=httpd.serve_forever, daemon=True)
+    thread.start()
+    http_client.close()
+    try:
+        yield f"http://127.0.0.1:{httpd.server_address[1]}"
+    finally:
+        http_client.close()
+        httpd.shutdown()
+        httpd.server_close()
+
+
+@pytest.fixture
+def server():
+    yield from serve(LargeBodyHandler)
+
+
+@pytest.fixture
+def drip_server():
+    yield from serve(DripHandler)
+
+
+def test_reader_truncates_and_hashes_incrementally():
+    reader = BodyReader(max_bytes=10, max_seconds=0, on_oversize="truncate")
+    assert reader.feed(b"abcd") is True
+    assert reader.feed(b"efghijkl") is False
+    body = reader.result()
+    assert body.content == b"abcdefghij" and body.truncated
+    assert body.sha256 == hashlib.sha256(b"abcdefghij").hexdigest()
+
+
+def test_reader_abort_and_content_length():
+    reader = BodyReader(max_bytes=10, max_seconds=0, on_oversize="abort")
+    reader.feed(b"0123456789")
+    with pytest.raises(DownloadLimitExceeded):
+        reader.feed(b"!")
+    # Content-Length で上限超えが分かれば読み始めない
+    with pytest.raises(DownloadLimitExceeded):
+        BodyReader(max_bytes=10, on_oversize="abort", content_length="11")
+
+
+def test_reader_deadline(monkeypatch):
+    now = [100.0]
+    monkeypatch.setattr(http_client.time, "monotonic", lambda: now[0])
+    reader = BodyReader(max_bytes=0, max_seconds=5)
+    reader.feed(b"a")
+    now[0] = 106.0
+    with pytest.raises(DownloadLimitExceeded, match="5 秒"):
+        reader.feed(b"b")
+
+
+def test_scrape_page_truncates_large_body(server, monkeypatch):
+    monkeypatch.setitem(http_client.HTTP_CONFIG, "max_body_bytes", 100_000)
+    page = scraper.scrape_page(f"{server}/")
+    assert page.truncated and page.body_size == 100_000
+    assert "切り詰め" in page.error_message
+    assert page.title == "big"
+    assert page.document.links[0][0] == f"{server}/next"
+    expected = (HEAD + FILLER * 100)[:100_000]
+    assert page.hash == hashlib.sha256(expected).hexdigest()
+
+
+def test_scrape_page_aborts_large_body(server, monkeypatch):
+    monkeypatch.setitem(http_client.HTTP_CONFIG, "max_body_bytes", 100_000)
+    monkeypatch.setitem(http_client.HTTP_CONFIG, "on_oversize", "abort")
+    page = scraper.scrape_page(f"{server}/big")
+    assert page.content == "" and page.status_code is None
+    assert "100000 バイトを超えました" in page.error_message
+
+
+def test_compressed_body_is_capped_after_decoding(server, monkeypatch):
+    monkeypatch.setitem(http_client.HTTP_CONFIG, "max_body_bytes", 100_000)
+    page = scraper.scrape_page(f"{server}/gzip")
+    assert page.truncated and page.body_size == 100_000
+
+
+def test_truncated_page_still_registers_links(monkeypatch):
+    saved, extracted = [], []
+    monkeypatch.setattr(scraper, "save_page_to_db", saved.append)
+    monkeypatch.setattr(scraper, "extract_and_save_links", extracted.append)
+    page = scraper.ScrapedPage(
+        url="http://a/", content="<a href='/b'>b</a>", error_message="切り詰め"
+    )
+    scraper.save_page_and_links(page)
+    assert extracted == []
+    page.truncated = True
+    scraper.save_page_and_links(page)
+    assert extracted == [page] and len(saved) == 2
+
+
+def test_slow_drip_body_stops_at_deadline(drip_server):
+    response = http_client.get(f"{drip_server}/", stream=True)
+    started = time.monotonic()
+    with pytest.raises(DownloadLimitExceeded, match="0.5 秒"):
+        http_client.read_body(response, max_bytes=0, max_seconds=0.5)
+    response.close()
+    assert time.monotonic() - started < 2
+
+
+def test_slow_drip_robots_txt_stops_at_deadline(drip_server, monkeypatch):
+    monkeypatch.setitem(robots_handler.ROBOTS_CONFIG, "timeout", 0.5)
+    started = time.monotonic()
+    with pytest.raises(robots_handler.RobotsUnreachable, match="時間切れ"):
+        robots_handler.download_robots_txt(f"{drip_server}/robots.txt")
+    assert time.monotonic() - started < 2
@@ -0,0 +1,177 @@
+import types
+
+import pytest
+
+import scraper
+import url_filter
+from url_filter import BloomFilter
+
+
+def test_added_urls_are_always_found():
+    bloom = BloomFilter(capacity=1000, error_rate=0.01)
+    urls = [f"https://example.com/page/{i}" for i in range(1000)]
+    for url in urls:
+        bloom.add(url)
+    assert all(url in bloom for url in urls)
+    assert bloom.count <= 1000
+
+
+def test_false_positive_rate_within_bound():
+    bloom = BloomFilter(capacity=5000, error_rate=0.01)
+    for i in range(5000):
+        bloom.add(f"https://example.com/known/{i}")
+    false_positives = sum(
+        f"https://example.com/unknown/{i}" in bloom for i in range(20000)
+    )
+    assert false_positives / 20000 < 0.02
+
+
+def test_add_reports_new_url():
+    bloom = BloomFilter(capacity=100, error_rate=0.001)
+    assert bloom.add("https://example.com/a") is True
+    assert bloom.add("https://example.com/a") is False
+
+
+def test_size_per_million():
+    bloom = BloomFilter(capacity=1_000_000, error_rate=0.001)
+    # 1件あたり約14.4ビット → 100万件で約1.7MiB
+    assert 1.6 * 1024 * 1024 < bloom.memory_bytes < 1.8 * 1024 * 1024
+    assert bloom.num_hashes == 10
+
+
+def test_invalid_parameters():
+    with pytest.raises(ValueError):
+        BloomFilter(capacity=0)
+    with pytest.raises(ValueError):
+        BloomFilter(error_rate=1.5)
+
+
+def test_save_and_load_roundtrip(tmp_path):
+    bloom = BloomFilter(capacity=1000, error_rate=0.01)
+    bloom.add("https://example.com/a")
+    bloom.max_id = 42
+    path = tmp_path / "seen.bloom"
+    bloom.save(str(path))
+
+    loaded = BloomFilter.load(str(path))
+    assert "https://example.com/a" in loaded
+    assert loaded.max_id == 42
+    assert loaded.count == 1
+    assert loaded.num_bits == bloom.num_bits
+    assert loaded.error_rate == 0.01
+
+
+def test_load_rejects_broken_file(tmp_path):
+    path = tmp_path / "broken.bloom"
+    path.write_bytes(b"nope")
+    with pytest.raises(ValueError):
+        BloomFilter.load(str(path))
+
+
+def test_init_seen_filter_resumes_from_saved_id(monkeypatch, tmp_path):
+    path = tmp_path / "seen.bloom"
+    config = {"enabled": True, "capacity": 1000, "error_rate": 0.01, "path": str(path)}
+    requested = []
+
+    def fake_stream(min_id=0, batch_size=10000):
+        requested.append(min_id)
+        rows = [(1, "https://example.com/1"), (2, "https://example.com/2")]
+        return [row for row in rows if row[0] > min_id]
+
+    monkeypatch.setattr(url_filter, "stream_urls", fake_stream)
+    monkeypatch.setattr(url_filter, "get_max_page_id", lambda: 2)
+
+    first = url_filter.init_seen_filter(config)
+    assert "https://example.com/2" in first
+    url_filter.save_seen_filter(config)
+
+    second = url_filter.init_seen_filter(config)
+    assert requested == [0, 2]  # 2回目は保存時以降の行だけを読む
+    assert "https://example.com/1" in second
+    monkeypatch.setattr(url_filter, "_seen_filter", None)
+
+
+def test_init_seen_filter_rebuilds_when_table_shrinks(monkeypatch, tmp_path):
+    path = tmp_path / "seen.bloom"
+    stale = BloomFilter(capacity=1000, error_rate=0.01)
+    stale.add("https://example.com/deleted")
+    stale.max_id = 100
+    stale.save(str(path))
+    config = {"enabled": True, "capacity": 1000, "error_rate": 0.01, "path": str(path)}
+
+    monkeypatch.setattr(url_filter, "get_max_page_id", lambda: 0)
+    monkeypatch.setattr(url_filter, "stream_urls", lambda min_id=0, batch_size=0: [])
+
+    bloom = url_filter.init_seen_filter(config)
+    assert "https://example.com/deleted" not in bloom
+    monkeypatch.setattr(url_filter, "_seen_filter", None)
+
+
+def test_init_seen_filter_disabled():
+    assert url_filter.init_seen_filter({"enabled": False}) is None
+    assert url_filter.get_seen_filter() is None
+
+
+def test_extract_and_save_links_skips_seen_urls(monkeypatch):
+    bloom = BloomFilter(capacity=100, error_rate=0.001)
+    bloom.add("https://example.com/old")
+    links = [("https://example.com/old", "old"), ("https://example.com/new", "new")]
+    saved, checked = [], []
+    registered = {"https://example.com/old"}
+    monkeypatch.setattr(scraper, "get_seen_filter", lambda: bloom)
+
+    def save_links_to_db(links, referrer=None):
+        saved.append(links)
+        registered.update(url for url, _ in links)
+
+    def find_existing_urls(urls):
+        checked.append(urls)
+        return registered & set(urls)
+
+    monkeypatch.setattr(scraper, "save_links_to_db", save_links_to_db)
+
+    monkeypatch.setattr(scraper, "find_existing_urls", find_existing_urls)
+    page = scraper.ScrapedPage(
+        url="https://example.com/",
+        content="<html></html>",
+        document=types.SimpleNamespace(links=links),
+    )
+
+    scraper.extract_and_save_links(page)
+    # 既出と判定されたURLだけをDBで確かめる
+    assert checked == [["https://example.com/old"]]
+    assert saved == [[("https://example.com/new", "new")]]
+    assert "https://example.com/new" in bloom
+
+    # 全リンクが登録済みなら INSERT しない
+    checked.clear()
+    scraper.extract_and_save_links(page)
+    assert len(checked) == 1 and len(saved) == 1
+
+
+def test_extract_and_save_links_keeps_false_positives(monkeypatch):
+    bloom = BloomFilter(capacity=100, error_rate=0.001)
+    bloom.add("https://example.com/a")
+    saved, checked = [], []
+    monkeypatch.setattr(scraper, "get_seen_filter", lambda: bloom)
+    monkeypatch.setattr(
+        scraper, "save_links_to_db", lambda ls, referrer=None: saved.append(ls)
+    )
+    monkeypatch.setattr(
+        scraper, "find_existing_urls", lambda urls: checked.append(urls) or set()
+    )
+    page = scraper.ScrapedPage(
+        url="https://example.com/",
+        content="<html></html>",
+        document=types.SimpleNamespace(links=[("https://example.com/a", "a")]),
+    )
+
+    # フィルタの誤判定（DBにはない）でも登録する
+    scraper.extract_and_save_links(page)
+    assert saved == [[("https://example.com/a", "a")]]
+
+    # すべて「未登録」ならDBに問い合わせない
+    page.document.links = [("https://example.com/b", "b")]
+    checked.clear()
+    scraper.extract_and_save_links(page)
+    assert checked == [] and saved[-1] == [("https://example.com/b", "b")]
@@ -0,0 +1,137 @@
+import gzip
+
+import models
+import scraper
+import warc_store
+from models import ScrapedPage
+from warc_store import ArchiveReader, WarcWriter, read_record
+
+HTML = "<html><head><title>日本語</title></head><body>本文</body></html>"
+
+
+def test_records_are_independent_gzip_members(tmp_path):
+    writer = WarcWriter(str(tmp_path), prefix="t")
+    headers = {"Content-Type": "text/html; charset=utf-8", "Content-Encoding": "gzip"}
+    body = HTML.encode("utf-8")
+    first = writer.write_response("http://a/1", 200, "OK", headers, body)
+    second = writer.write_response("http://a/2", 404, "Not Found", {}, b"nope")
+    writer.close()
+
+    name, offset, length = second
+    assert first[0] == name and first[1] + first[2] == offset
+    data = (tmp_path / name).read_bytes()
+    # 先頭は warcinfo レコード、各レコードは単独で展開できる
+    assert gzip.decompress(data[: first[1]]).startswith(
+        b"WARC/1.1\r\nWARC-Type: warcinfo"
+    )
+    assert offset + length == len(data)
+
+    warc_headers, status, http_headers, payload = read_record(
+        str(tmp_path / name), *first[1:]
+    )
+    assert warc_headers["warc-target-uri"] == "http://a/1"
+    assert warc_headers["warc-payload-digest"] == warc_store.payload_digest(body)
+    assert status == 200 and payload == body
+    # 展開済みの本文を保存するので Content-Encoding は残さない
+    assert "content-encoding" not in http_headers
+    assert http_headers["content-length"] == str(len(body))
+    assert read_record(str(tmp_path / name), offset, length)[1:] == (
+        404,
+        {"content-length": "4"},
+        b"nope",
+    )
+
+
+def test_files_rotate_at_max_bytes(tmp_path):
+    writer = WarcWriter(str(tmp_path), prefix="t", max_bytes=1)
+    names = {
+        writer.write_response(f"http://a/{i}", 200, "OK", {}, b"x")[0] for i in range(3)
+    }
+    writer.close()
+    assert len(names) == 3
+    assert sorted(p.name for p in tmp_path.iterdir()) == sorted(names)
+
+
+def test_scraped_page_is_archived_and_read_back(tmp_path, monkeypatch):
+    monkeypatch.setitem(warc_store.STORAGE_CONFIG, "backend", "warc")
+    monkeypatch.setitem(warc_store.STORAGE_CONFIG, "warc_dir", str(tmp_path))
+
+    class MockResp:
+        status_code = 200
+        reason = "OK"
+        content = HTML.encode("cp932")
+        headers = {"Content-Type": "text/html; charset=Shift_JIS"}
+        encoding = None
+
+        @property
+        def text(self):
+            return self.content.decode(self.encoding)
+
+        def raise_for_status(self):
+            return None
+
+        def iter_content(self, chunk_size):
+            yield self.content
+
+        def close(self):
+            pass
+
+    monkeypatch.setattr(scraper.http_client, "get", lambda *a, **k: MockResp())
+    page = scraper.scrape_page("http://jp.example/")
+    assert page.title == "日本語"
+    name, offset, length = page.warc_location
+
+    saved = {}
+
+    class Cursor:
+        rowcount = 1
+
+        def execute(self, sql, params):
+            saved.update(params)
+
+        def close(self):
+            pass
+
+    class Conn:
+        def cursor(self):
+            return Cursor()
+
+        def commit(self):
+            pass
+
+        def close(self):
+            pass
+
+    monkeypatch.setattr(models, "get_connection", Conn)
+    models.save_page_to_db(page)
+    # DB には本文を書かず、WARC 内の位置だけを保存する
+    assert saved["content"] is None and saved["content_hash"] is None
+    assert (saved["warc_file"], saved["warc_offset"], saved["warc_length"]) == (
+        name,
+        offset,
+        length,
+    )
+
+    row = {"url": page.url, "content": None, "content_body": None, **saved}
+    assert models.content_store.decode_row(row)["content"] == HTML
+
+
+def test_disabled_backend_writes_nothing(tmp_path, monkeypatch):
+    monkeypatch.setitem(warc_store.STORAGE_CONFIG, "warc_dir", str(tmp_path / "w"))
+    page = ScrapedPage(url="http://a/", content=HTML)
+    assert warc_store.archive_response("http://a/", 200, "OK", {}, b"") is None
+    assert page.to_dict()["warc_file"] is None
+    assert not (tmp_path / "w").exists()
+
+
+def test_reader_follows_growing_file(tmp_path):
+    writer = WarcWriter(str(tmp_path), prefix="t")
+    name, offset, length = writer.write_response("http://a/1", 200, "OK", {}, b"1")
+    reader = ArchiveReader(str(tmp_path))
+    assert reader.read_record(name, offset, length)[3] == b"1"
+    # map した後に追記されたレコードも iter_records で読める
+    writer.write_response("http://a/2", 200, "OK", {}, b"2")
+    bodies = [record[3] for _, _, record in reader.iter_records(name)]
+    assert bodies[1:] == [b"1", b"2"]
+    writer.close()
+    reader.close()
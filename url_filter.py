@@ -0,0 +1,172 @@
+import hashlib
+import math
+import os
+import struct
+import threading
+
+from config import URL_FILTER_CONFIG
+from models import get_max_page_id, stream_urls
+
+_MAGIC = b"SCRBLM01"
+# magic, ビット数, ハッシュ関数の数, 登録件数, 想定件数, 誤判定率, 取り込み済みの最大ID
+_HEADER = struct.Struct("<8sQIQQdQ")
+
+
+class BloomFilter:
+    """既出URLを判定するブルームフィルタ
+
+    「含まれない」は確実、「含まれる」は error_rate の確率で誤判定する。
+    capacity 件までなら誤判定率が error_rate 以下になるようにビット数と
+    ハッシュ関数の数を決める（1件あたり -ln(p) / ln(2)^2 ビット）。
+    """
+
+    def __init__(self, capacity=10_000_000, error_rate=0.001):
+        if capacity < 1:
+            raise ValueError("capacity は1以上を指定してください")
+        if not 0 < error_rate < 1:
+            raise ValueError("error_rate は 0 より大きく 1 未満を指定してください")
+        self.capacity = int(capacity)
+        self.error_rate = float(error_rate)
+        self.num_bits = max(
+            8, math.ceil(-self.capacity * math.log(error_rate) / math.log(2) ** 2)
+        )
+        self.num_hashes = max(1, round(self.num_bits / self.capacity * math.log(2)))
+        self.bits = bytearray((self.num_bits + 7) // 8)
+        self.count = 0
+        self.max_id = 0  # DBから取り込み済みの最大 id
+        self._lock = threading.Lock()
+
+    @property
+    def memory_bytes(self) -> int:
+        return len(self.bits)
+
+    def _positions(self, url: str):
+        digest = hashlib.blake2b(url.encode("utf-8"), digest_size=16).digest()
+        h1, h2 = struct.unpack("<QQ", digest)
+        h2 |= 1  # 0 だと全位置が同じになるため奇数にする
+        return [(h1 + i * h2) % self.num_bits for i in range(self.num_hashes)]
+
+    def __contains__(self, url: str) -> bool:
+        bits = self.bits
+        return all(bits[p >> 3] & (1 << (p & 7)) for p in self._positions(url))
+
+    def add(self, url: str) -> bool:
+        """URLを登録し、未登録だった（新規の）場合は True を返す"""
+        positions = self._positions(url)
+        with self._lock:
+            bits = self.bits
+            added = False
+            for p in positions:
+                mask = 1 << (p & 7)
+                if not bits[p >> 3] & mask:
+                    bits[p >> 3] |= mask
+                    added = True
+            if added:
+                self.count += 1
+            return added
+
+    def save(self, path: str):
+        """ファイルに保存（一時ファイルに書いてから置き換える）"""
+        tmp_path = f"{path}.tmp"
+        with self._lock, open(tmp_path, "wb") as f:
+            f.write(
+                _HEADER.pack(
+                    _MAGIC,
+                    self.num_bits,
+                    self.num_hashes,
+                    self.count,
+                    self.capacity,
+                    self.error_rate,
+                    self.max_id,
+                )
+            )
+            f.write(self.bits)
+        os.replace(tmp_path, path)
+
+    @classmethod
+    def load(cls, path: str) -> "BloomFilter":
+        """save() で保存したファイルから復元"""
+        with open(path, "rb") as f:
+            header = f.read(_HEADER.size)
+            if len(header) != _HEADER.size:
+                raise ValueError(f"ブルームフィルタのファイルが壊れています: {path}")
+            magic, num_bits, num_hashes, count, capacity, error_rate, max_id = (
+                _HEADER.unpack(header)
+            )
+            if magic != _MAGIC:
+                raise ValueError(f"ブルームフィルタのファイルではありません: {path}")
+            bits = bytearray(f.read())
+        if len(bits) != (num_bits + 7) // 8:
+            raise ValueError(f"ブルームフィルタのファイルが壊れています: {path}")
+        bloom = cls.__new__(cls)
+        bloom.capacity = capacity
+        bloom.error_rate = error_rate
+        bloom.num_bits = num_bits
+        bloom.num_hashes = num_hashes
+        bloom.bits = bits
+        bloom.count = count
+        bloom.max_id = max_id
+        bloom._lock = threading.Lock()
+        return bloom
+
+    def warm_from_db(self, batch_size=10000) -> int:
+        """max_id より後に登録された scraped_pages の url を取り込み、件数を返す"""
+        loaded = 0
+        for page_id, url in stream_urls(min_id=self.max_id, batch_size=batch_size):
+            self.add(url)
+            self.max_id = max(self.max_id, page_id)
+            loaded += 1
+        return loaded
+
+
+_seen_filter = None
+
+
+def get_seen_filter():
+    """初期化済みの既出URLフィルタを返す（未初期化なら None）"""
+    return _seen_filter
+
+
+def init_seen_filter(config=None):
+    """既出URLフィルタを用意する
+
+    保存ファイルがあれば読み込んで、その後に追加された行だけをDBから取り込む。
+    ファイルがない・壊れている場合は url カラム全体を読み込んで作り直す。
+    """
+    global _seen_filter
+    config = config or URL_FILTER_CONFIG
+    if not config.get("enabled"):
+        _seen_filter = None
+        return None
+
+    path = config.get("path")
+    bloom = None
+    if path and os.path.exists(path):
+        try:
+            bloom = BloomFilter.load(path)
+        except (OSError, ValueError) as e:
+            print(f"[WARN] ブルームフィルタを読み込めないため作り直します: {e}")
+    if bloom is not None and get_max_page_id() < bloom.max_id:
+        # テーブルが作り直された・行が削除された場合は保存済みの内容を使わない
+        print("[WARN] DBの内容が保存時より減っているためブルームフィルタを作り直します")
+        bloom = None
+    if bloom is None:
+        bloom = BloomFilter(config["capacity"], config["error_rate"])
+    loaded = bloom.warm_from_db()
+    print(
+        f"既出URLフィルタ: {bloom.count} 件（DBから {loaded} 件取り込み）,"
+        f" {bloom.memory_bytes / 1024 / 1024:.1f} MiB"
+    )
+    if bloom.count > bloom.capacity:
+        print("[WARN] 想定件数を超えたため誤判定率が上がっています")
+    _seen_filter = bloom
+    return bloom
+
+
+def save_seen_filter(config=None):
+    """既出URLフィルタを設定のパスに保存"""
+    config = config or URL_FILTER_CONFIG
+    if _seen_filter is not None and config.get("path"):
+        # 実行中に登録したURLはフィルタに追加済みなので、次回はこの続きから取り込む
+        _seen_filter.max_id = max(_seen_filter.max_id, get_max_page_id())
+        _seen_filter.save(config["path"])
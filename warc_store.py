@@ -0,0 +1,287 @@
+import base64
+import gzip
+import hashlib
+import mmap
+import os
+import threading
+import uuid
+import zlib
+from datetime import datetime, timezone
+from urllib.parse import urlparse
+
+from charset_resolver import decode_body
+from config import STORAGE_CONFIG
+
+# 本文をデコード済みで受け取るため、保存するHTTPヘッダーから除く（Content-Length は付け直す）
+_DROP_HEADERS = {"content-encoding", "transfer-encoding", "content-length"}
+
+
+def enabled() -> bool:
+    """本文を WARC ファイルに保存する設定か"""
+    return STORAGE_CONFIG.get("backend") == "warc"
+
+
+def payload_digest(body: bytes) -> str:
+    """WARC-Payload-Digest の値（SHA-1 の Base32。CDX の digest と同じ形式）"""
+    return "sha1:" + base64.b32encode(hashlib.sha1(body).digest()).decode("ascii")
+
+
+def _warc_date():
+    return datetime.now(timezone.utc).strftime("%Y-%m-%dT%H:%M:%SZ")
+
+
+def _record(warc_type, headers, block: bytes) -> bytes:
+    """WARC/1.1 のレコード1件をバイト列にする"""
+    lines = [
+        "WARC/1.1",
+        f"WARC-Type: {warc_type}",
+        f"WARC-Record-ID: <urn:uuid:{uuid.uuid4()}>",
+        f"WARC-Date: {_warc_date()}",
+    ]
+    lines += [f"{key}: {value}" for key, value in headers]
+    lines.append(f"Content-Length: {len(block)}")
+    head = ("\r\n".join(lines) + "\r\n\r\n").encode("utf-8")
+    return head + block + b"\r\n\r\n"
+
+
+def http_response_block(status, reason, headers, body: bytes, version="HTTP/1.1"):
+    """WARC の response レコードに入れるHTTPレスポンス（ステータス行・ヘッダー・本文）"""
+    lines = [f"{version} {status} {reason or ''}".rstrip()]
+    for key, value in headers.items():
+        if key.lower() not in _DROP_HEADERS:
+            lines.append(f"{key}: {value}")
+    lines.append(f"Content-Length: {len(body)}")
+    return ("\r\n".join(lines) + "\r\n\r\n").encode("latin-1", errors="replace") + body
+
+
+class WarcWriter:
+    """レスポンスを gzip 圧縮の WARC ファイルに追記する
+
+    1レコードを1つの gzip メンバーとして書くので、(ファイル名, オフセット, 長さ) から
+    そのレコードだけを読み出して展開できる。ファイルが max_bytes を超えたら
+    次のファイルに切り替える。ファイル名にプロセスIDを含め、複数プロセスでも
+    同じファイルに書かない。書き込みはスレッド間でロックする。
+    """
+
+    def __init__(self, directory="warc", prefix="scrape", max_bytes=1024**3):
+        self.directory = directory
+        self.prefix = prefix
+        self.max_bytes = max(1, int(max_bytes))
+        self._lock = threading.Lock()
+        self._file = None
+        self._name = None
+        self._serial = 0
+        os.makedirs(directory, exist_ok=True)
+
+    def _open_next(self):
+        if self._file is not None:
+            self._file.close()
+        self._serial += 1
+        stamp = datetime.now().strftime("%Y%m%d%H%M%S")
+        self._name = f"{self.prefix}-{stamp}-{os.getpid()}-{self._serial:05d}.warc.gz"
+        self._file = open(os.path.join(self.directory, self._name), "ab")
+        info = b"software: Scrape\r\nformat: WARC File Format 1.1\r\n"
+        self._append(
+            _record(
+                "warcinfo",
+                [
+                    ("WARC-Filename", self._name),
+                    ("Content-Type", "application/warc-fields"),
+                ],
+                info,
+            )
+        )
+
+    def _append(self, record: bytes):
+        offset = self._file.tell()
+        member = gzip.compress(record)
+        self._file.write(member)
+        self._file.flush()
+        return offset, len(member)
+
+    def write_response(
+        self, url, status, reason, headers, body: bytes, version="HTTP/1.1"
+    ):
+        """response レコードを追記し、(ファイル名, オフセット, 長さ) を返す"""
+        block = http_response_block(status, reason, headers, body, version)
+        record = _record(
+            "response",
+            [
+                ("WARC-Target-URI", url),
+                ("WARC-Payload-Digest", payload_digest(body)),
+                ("Content-Type", "application/http;msgtype=response"),
+            ],
+            block,
+        )
+        with self._lock:
+            if self._file is None or self._file.tell() >= self.max_bytes:
+                self._open_next()
+            offset, length = self._append(record)
+            return self._name, offset, length
+
+    def close(self):
+        with self._lock:
+            if self._file is not None:
+                self._file.close()
+                self._file = None
+
+
+def read_record(path, offset, length):
+    """1レコードを読み出し (WARCヘッダー, HTTPステータス, HTTPヘッダー, 本文) を返す
+
+    ヘッダーのキーは小文字にそろえる。
+    """
+    with open(path, "rb") as f:
+        f.seek(offset)
+        data = f.read(length)
+    return parse_record(gzip.decompress(data))
+
+
+class ArchiveReader:
+    """WARC ファイルを mmap して、位置と長さを指定したレコードだけを展開する
+
+    ファイルごとの mmap を使い回すので、1件の読み出しはシークと1メンバーの
+    展開だけで済む。追記中のファイルで範囲が map より先にあれば map し直す。
+    """
+
+    def __init__(self, directory):
+        self.directory = directory
+        self._lock = threading.Lock()
+        self._maps = {}
+
+    def _read(self, name, start, end):
+        """ファイルの start から end までのバイト列を返す
+
+        map し直すと古い mmap は閉じるので、別のスレッドが閉じた mmap を読まない
+        よう、切り出しまでロックの中で行う。
+        """
+        with self._lock:
+            mm = self._maps.get(name)
+            if mm is None or len(mm) < end:
+                if mm is not None:
+                    mm.close()
+                with open(os.path.join(self.directory, name), "rb") as f:
+                    mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+                self._maps[name] = mm
+            return mm[start:end]
+
+    def read_record(self, name, offset, length):
+        """(WARCヘッダー, HTTPステータス, HTTPヘッダー, 本文) を返す"""
+        data = self._read(name, offset, offset + length)
+        return parse_record(zlib.decompress(data, wbits=31))
+
+    def iter_records(self, name, chunk_size=1 << 16):
+        """ファイル内の全レコードを先頭から (オフセット, 長さ, レコード) で返す
+
+        レコード = (WARCヘッダー, HTTPステータス, HTTPヘッダー, 本文)。
+        gzip メンバーの境界は展開しながら求めるので、索引がなくても使える。
+        追記中のファイルは呼び出した時点の大きさまで読む。
+        """
+        size = os.path.getsize(os.path.join(self.directory, name))
+        offset = 0
+        while offset < size:
+            inflater = zlib.decompressobj(wbits=31)
+            chunks = []
+            pos = offset
+            while not inflater.eof and pos < size:
+                end = min(pos + chunk_size, size)
+                chunks.append(inflater.decompress(self._read(name, pos, end)))
+                pos = end
+            if not inflater.eof:
+                break  # 書き込み途中のメンバー
+            length = pos - len(inflater.unused_data) - offset
+            yield offset, length, parse_record(b"".join(chunks))
+            offset += length
+
+    def close(self):
+        with self._lock:
+            for mm in self._maps.values():
+                mm.close()
+            self._maps.clear()
+
+
+def _parse_headers(lines):
+    headers = {}
+    for line in lines:
+        key, _, value = line.partition(":")
+        headers[key.strip().lower()] = value.strip()
+    return headers
+
+
+def parse_record(record: bytes):
+    """展開済みのレコードを (WARCヘッダー, HTTPステータス, HTTPヘッダー, 本文) に分ける"""
+    head, _, rest = record.partition(b"\r\n\r\n")
+    warc_headers = _parse_headers(head.decode("utf-8").split("\r\n")[1:])
+    block = rest[: int(warc_headers["content-length"])]
+    if warc_headers.get("warc-type") != "response":
+        return warc_headers, None, {}, block
+    http_head, _, body = block.partition(b"\r\n\r\n")
+    status_line, *header_lines = http_head.decode("latin-1").split("\r\n")
+    status = int(status_line.split(" ")[1])
+    return warc_headers, status, _parse_headers(header_lines), body
+
+
+def decode_record(record) -> str:
+    """response レコードの本文を Content-Type などから文字列にする"""
+    warc_headers, _, http_headers, body = record
+    host = urlparse(warc_headers.get("warc-target-uri", "")).netloc
+    return decode_body(body, http_headers.get("content-type"), host)
+
+
+def read_content(name, offset, length) -> str:
+    """WARC に保存したページの本文を文字列で返す"""
+    return decode_record(get_archive_reader().read_record(name, offset, length))
+
+
+_writer = None
+_writer_lock = threading.Lock()
+_reader = None
+
+
+def get_warc_writer() -> WarcWriter:
+    """モジュール共有の WarcWriter を返す（初回呼び出し時に生成）"""
+    global _writer
+    with _writer_lock:
+        if _writer is None:
+            _writer = WarcWriter(
+                STORAGE_CONFIG["warc_dir"],
+                STORAGE_CONFIG["warc_prefix"],
+                STORAGE_CONFIG["warc_max_bytes"],
+            )
+        return _writer
+
+
+def close_warc_writer():
+    """共有の WarcWriter を閉じる（次回の get_warc_writer で新しいファイルに書く）"""
+    global _writer
+    with _writer_lock:
+        writer, _writer = _writer, None
+    if writer is not None:
+        writer.close()
+
+
+def archive_response(url, status, reason, headers, body, version="HTTP/1.1"):
+    """WARC バックエンドが有効ならレスポンスを追記して保存先を返す（無効なら None）"""
+    if not enabled():
+        return None
+    return get_warc_writer().write_response(url, status, reason, headers, body, version)
+
+
+def get_archive_reader() -> ArchiveReader:
+    """warc_dir を読むモジュール共有の ArchiveReader を返す"""
+    global _reader
+    with _writer_lock:
+        if _reader is not None and _reader.directory != STORAGE_CONFIG["warc_dir"]:
+            _reader.close()
+            _reader = None
+        if _reader is None:
+            _reader = ArchiveReader(STORAGE_CONFIG["warc_dir"])
+        return _reader
+
+
+def close_archive_reader():
+    global _reader
+    with _writer_lock:
+        reader, _reader = _reader, None
+    if reader is not None:
+        reader.close()